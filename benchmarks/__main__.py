@@ -0,0 +1,43 @@
+'''
+Command line entry point: `python -m benchmarks --help`.
+'''
+
+import argparse
+import sys
+
+from . import harness, suites
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the library benchmarks.')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='benchmarks to run (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=int, metavar='N', help='input sizes overriding the defaults')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest default size')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per measurement (default: 5)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per timing round (default: 0.2)')
+    parser.add_argument('--output', metavar='FILE', help='write results as JSON to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against results previously written with --output')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed fractional slowdown before a regression (default: 0.1)')
+    parser.add_argument('--memory-threshold', type=float, default=0.1, help='allowed fractional peak memory growth before a regression (default: 0.1)')
+    parser.add_argument('--list', action='store_true', help='list the registered benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, sizes, _) in sorted(harness.BENCHMARKS.items()):
+            print('{}  {}'.format(name, ' '.join(map(str, sizes))))
+        return 0
+
+    def progress(name, size, m):
+        print('{} [{}]: {:.6g} s'.format(name, size, m['time']), file=sys.stderr)
+
+    results = harness.run(args.only, args.sizes, args.repeat, args.min_time, args.quick, progress)
+    if args.output:
+        harness.save(results, args.output)
+    if args.baseline is None:
+        print(harness.results_table(results))
+        return 0
+    rows = harness.compare(results, harness.load(args.baseline), args.threshold, args.memory_threshold)
+    print(harness.comparison_table(rows))
+    return 1 if any(row[-1] == 'regression' for row in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
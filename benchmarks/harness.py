@@ -0,0 +1,210 @@
+'''
+Timing, memory measurement and baseline comparison for benchmarks.
+
+A benchmark is a setup function registered with `benchmark`: given an input
+size it builds the inputs and returns a zero-argument callable that runs the
+code under test. `run` times that callable with `timeit` (using
+`time.perf_counter_ns`) and measures its peak allocation with `tracemalloc`.
+'''
+
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from time import perf_counter_ns
+
+BENCHMARKS = {}
+'''Registered benchmarks: name \\(\\mapsto\\) (setup function, default sizes, throughput function or `None`)'''
+
+def benchmark(name, sizes, throughput=None):
+    '''Decorator registering a setup function as benchmark `name`, run at each of `sizes` by default
+
+    If given, `throughput(size)` is the number of bytes one call processes,
+    and measurements also report MB/s.'''
+    def register(setup):
+        if name in BENCHMARKS:
+            raise ValueError('duplicate benchmark name {!r}'.format(name))
+        BENCHMARKS[name] = (setup, tuple(sizes), throughput)
+        return setup
+    return register
+
+def measure(fn, repeat=5, min_time=0.2):
+    '''Time and peak memory of calling `fn()`
+
+    Input:
+
+     - `fn`: zero-argument callable
+     - `repeat`: number of timing rounds. Defaults to `5`
+     - `min_time`: each round calls `fn` often enough to take at least this many seconds. Defaults to `0.2`
+
+    Output: a dictionary with
+
+     - `time`: best seconds per call over all rounds
+     - `mean`: mean seconds per call over all rounds
+     - `number`: calls per round
+     - `peak_memory`: peak bytes allocated during one call, per `tracemalloc`
+    '''
+    timer = timeit.Timer(fn, timer=perf_counter_ns)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time * 1e9 or number >= 1 << 20:
+            break
+        number *= 2 if elapsed * 4 >= min_time * 1e9 else 10
+    rounds = [elapsed] + timer.repeat(repeat - 1, number) if repeat > 1 else [elapsed]
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'time': min(rounds) / number / 1e9,
+        'mean': sum(rounds) / len(rounds) / number / 1e9,
+        'number': number,
+        'peak_memory': peak,
+    }
+
+def run(names=None, sizes=None, repeat=5, min_time=0.2, quick=False, progress=None):
+    '''Run registered benchmarks and collect their measurements
+
+    Input:
+
+     - `names`: benchmark names to run. Defaults to all
+     - `sizes`: input sizes overriding each benchmark's defaults
+     - `repeat`, `min_time`: passed to `measure`
+     - `quick`: only run each benchmark at its smallest default size
+     - `progress`: optional callable `(name, size, measurement)` called after each measurement
+
+    Output: a JSON-serializable dictionary `{'meta': ..., 'results': {name: {size: measurement}}}`,
+    where measurements of benchmarks with a throughput function also have `throughput` in MB/s
+    '''
+    if names is None:
+        names = sorted(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError('unknown benchmarks {}, expected some of {}'.format(unknown, sorted(BENCHMARKS)))
+    results = {}
+    for name in names:
+        setup, default_sizes, throughput = BENCHMARKS[name]
+        run_sizes = sizes or (default_sizes[:1] if quick else default_sizes)
+        results[name] = {}
+        for size in run_sizes:
+            m = measure(setup(size), repeat, min_time)
+            if throughput is not None:
+                m['throughput'] = throughput(size) / m['time'] / 1e6
+            results[name][str(size)] = m
+            if progress is not None:
+                progress(name, size, m)
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def save(results, path):
+    '''Write `results` from `run` to the JSON file `path`'''
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def load(path):
+    '''Read results written by `save`'''
+    with open(path) as f:
+        return json.load(f)
+
+def compare(results, baseline, threshold=0.1, memory_threshold=0.1):
+    '''Compare `results` against `baseline` (both as returned by `run`)
+
+    A measurement is a `'regression'` if its time exceeds the baseline time by
+    more than a fraction `threshold`, or its peak memory exceeds the baseline
+    by more than a fraction `memory_threshold`; it is an `'improvement'` if its
+    time is below the baseline by more than `threshold`, and `'ok'` otherwise.
+    Measurements missing from the baseline are `'new'`.
+
+    Output: a list of rows `(name, size, baseline time, time, time ratio, baseline peak, peak, status)`
+    '''
+    rows = []
+    base = baseline['results']
+    for name, by_size in results['results'].items():
+        for size, m in by_size.items():
+            b = base.get(name, {}).get(size)
+            if b is None:
+                rows.append((name, size, None, m['time'], None, None, m['peak_memory'], 'new'))
+                continue
+            ratio = m['time'] / b['time'] if b['time'] else float('inf')
+            if ratio > 1 + threshold or m['peak_memory'] > b['peak_memory'] * (1 + memory_threshold):
+                status = 'regression'
+            elif ratio < 1 - threshold:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append((name, size, b['time'], m['time'], ratio, b['peak_memory'], m['peak_memory'], status))
+    return rows
+
+def _format_time(t):
+    if t is None: return '-'
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if t >= scale:
+            return '{:.3f} {}'.format(t / scale, unit)
+    return '{:.1f} ns'.format(t / 1e-9)
+
+def _format_bytes(b):
+    if b is None: return '-'
+    for unit, scale in (('GiB', 1 << 30), ('MiB', 1 << 20), ('KiB', 1 << 10)):
+        if b >= scale:
+            return '{:.1f} {}'.format(b / scale, unit)
+    return '{} B'.format(b)
+
+def format_table(rows, headers):
+    '''Plain-text table of `rows` under `headers`, with columns padded to fit'''
+    cells = [list(map(str, headers))] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip() for row in cells]
+    lines.insert(1, '  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
+
+def results_table(results):
+    '''Readable table of the measurements in `results` from `run`'''
+    rows = []
+    for name, by_size in results['results'].items():
+        for size, m in by_size.items():
+            rate = '-' if 'throughput' not in m else '{:.2f}'.format(m['throughput'])
+            rows.append((name, size, _format_time(m['time']), _format_time(m['mean']), _format_bytes(m['peak_memory']), rate))
+    return format_table(rows, ('benchmark', 'size', 'best', 'mean', 'peak memory', 'MB/s'))
+
+def comparison_table(rows):
+    '''Readable table of the rows returned by `compare`'''
+    return format_table([
+        (name, size, _format_time(bt), _format_time(t), '-' if r is None else '{:.2f}x'.format(r), _format_bytes(bp), _format_bytes(p), status)
+        for name, size, bt, t, r, bp, p, status in rows
+    ], ('benchmark', 'size', 'baseline', 'time', 'ratio', 'baseline peak', 'peak', 'status'))
+
+if __name__ == '__main__':
+    # test measure
+    m = measure(lambda: [0] * 10000, repeat=2, min_time=0.01)
+    assert m['time'] > 0 and m['number'] >= 1 and m['peak_memory'] >= 8 * 10000, 'Failed test: measure'
+
+    # test compare
+    baseline = {'results': {'a': {'10': {'time': 1.0, 'peak_memory': 100}, '20': {'time': 2.0, 'peak_memory': 100}}}}
+    results = {'results': {
+        'a': {'10': {'time': 1.5, 'peak_memory': 100}, '20': {'time': 1.0, 'peak_memory': 100}},
+        'b': {'10': {'time': 1.0, 'peak_memory': 100}},
+    }}
+    statuses = [row[-1] for row in compare(results, baseline, threshold=0.2)]
+    assert statuses == ['regression', 'improvement', 'new'], 'Failed test: compare'
+    results['results']['a']['10'] = {'time': 1.0, 'peak_memory': 200}
+    assert compare(results, baseline, memory_threshold=0.5)[0][-1] == 'regression', 'Failed test: compare (memory)'
+
+    # test results_table
+    table = results_table({'results': {'a': {'10': {'time': 0.5, 'mean': 0.5, 'peak_memory': 1, 'throughput': 2.0}}}})
+    assert table.splitlines()[-1].split()[-1] == '2.00', 'Failed test: results_table'
+
+    # test format_table
+    assert format_table([('x', 1)], ('name', 'n')) == 'name  n\n----  -\nx     1', 'Failed test: format_table'
+
+    print('Passed all tests.')
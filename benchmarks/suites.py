@@ -0,0 +1,327 @@
+'''
+Benchmark definitions for the library.
+
+Each setup function builds its inputs from a fixed random seed, so
+measurements are comparable between runs.
+'''
+
+import re
+from random import Random
+from copy import deepcopy
+
+from .harness import benchmark
+
+from mathematics.linalg import matrix, vector, plu_decomposition, plu_decomposition_utils
+from graph import bfs, connected_components, csr, dag, dfs, shortest_path, max_flow, min_cost_flow, mst
+from strings import aho_corasick, dfa, tokenize, trie
+
+def _random_matrix(n, m, seed=0, integers=False):
+    rng = Random(seed)
+    if integers:
+        return [[rng.randint(-9, 9) for _ in range(m)] for _ in range(n)]
+    return [[rng.random() for _ in range(m)] for _ in range(n)]
+
+@benchmark('matmul', sizes=(32, 64, 128, 256))
+def bench_matmul(n):
+    A, B = _random_matrix(n, n, 1), _random_matrix(n, n, 2)
+    return lambda: matrix.matmul(A, B)
+
+@benchmark('matmul_rows', sizes=(64, 128, 256))
+def bench_matmul_rows(n):
+    A, B = _random_matrix(n, n, 1), _random_matrix(n, n, 2)
+    return lambda: matrix.matmul(A, B, method='rows')
+
+@benchmark('matmul_strassen', sizes=(128, 256))
+def bench_matmul_strassen(n):
+    A, B = _random_matrix(n, n, 1), _random_matrix(n, n, 2)
+    return lambda: matrix.matmul(A, B, method='strassen', cutoff=64)
+
+@benchmark('matpow', sizes=(16, 32, 64))
+def bench_matpow(n):
+    A = _random_matrix(n, n, 3, integers=True)
+    return lambda: matrix.matpow(A, 20)
+
+@benchmark('matpow_mod', sizes=(2, 3, 16, 64))
+def bench_matpow_mod(n):
+    A = _random_matrix(n, n, 3, integers=True)
+    return lambda: matrix.matpow(A, 10**18, mod=10**9 + 7)
+
+# the size of the `.workers` benchmarks is the number of worker processes, at a
+# fixed dimension above `matrix.PARALLEL_MIN_WORK`; 1 runs the serial kernel
+WORKERS_DIMENSION = 256
+
+@benchmark('matmul.workers', sizes=(1, 2, 4, 8))
+def bench_matmul_workers(workers):
+    n = WORKERS_DIMENSION
+    A, B = _random_matrix(n, n, 1), _random_matrix(n, n, 2)
+    return lambda: matrix.matmul(A, B, method='rows', workers=workers)
+
+@benchmark('matpow.workers', sizes=(1, 2, 4, 8))
+def bench_matpow_workers(workers):
+    n = WORKERS_DIMENSION
+    A = _random_matrix(n, n, 3, integers=True)
+    return lambda: matrix.matpow(A, 4, method='rows', workers=workers)
+
+@benchmark('LUPDecompose', sizes=(50, 100, 200))
+def bench_lup_decompose(n):
+    A = _random_matrix(n, n, 4)
+    return lambda: plu_decomposition_utils.LUPDecompose(deepcopy(A), n, 1e-9)
+
+@benchmark('LUPDecomposeBlocked', sizes=(100, 200, 300))
+def bench_lup_decompose_blocked(n):
+    A = _random_matrix(n, n, 4)
+    return lambda: plu_decomposition_utils.LUPDecomposeBlocked(deepcopy(A), n, 1e-9)
+
+@benchmark('PLUSolve', sizes=(50, 100, 200))
+def bench_plu_solve(n):
+    A = _random_matrix(n, n, 5)
+    b = _random_matrix(1, n, 6)[0]
+    return lambda: plu_decomposition.PLUSolve(A, b)
+
+@benchmark('PLUInvert', sizes=(50, 100))
+def bench_plu_invert(n):
+    A = _random_matrix(n, n, 5)
+    return lambda: plu_decomposition.PLUInvert(A)
+
+@benchmark('LUFactorization.solve_many', sizes=(50, 100, 200))
+def bench_lu_solve_many(n):
+    F = plu_decomposition.LUFactorization(_random_matrix(n, n, 5))
+    B = _random_matrix(n, 16, 6)
+    return lambda: F.solve_many(B)
+
+@benchmark('vector.dot', sizes=(1000, 10000, 100000))
+def bench_dot(n):
+    U, V = _random_matrix(n, 3, 7), _random_matrix(n, 3, 8)
+    dot = vector.dot
+    return lambda: [dot(u, v) for u, v in zip(U, V)]
+
+@benchmark('vector.batch_dot', sizes=(1000, 10000, 100000))
+def bench_batch_dot(n):
+    U = vector.VectorBatch.from_vectors(_random_matrix(n, 3, 7))
+    V = vector.VectorBatch.from_vectors(_random_matrix(n, 3, 8))
+    return lambda: vector.batch_dot(U, V)
+
+@benchmark('vector.cross', sizes=(1000, 10000, 100000))
+def bench_cross(n):
+    U, V = _random_matrix(n, 3, 7), _random_matrix(n, 3, 8)
+    cross = vector.cross
+    return lambda: [cross(u, v) for u, v in zip(U, V)]
+
+@benchmark('vector.batch_cross', sizes=(1000, 10000, 100000))
+def bench_batch_cross(n):
+    U = vector.VectorBatch.from_vectors(_random_matrix(n, 3, 7))
+    V = vector.VectorBatch.from_vectors(_random_matrix(n, 3, 8))
+    out = vector.VectorBatch.zeroes(n, 3)
+    return lambda: vector.batch_cross(U, V, out=out)
+
+def _random_edges(n, m, seed=9):
+    rng = Random(seed)
+    return [(rng.randrange(n), rng.randrange(n)) for _ in range(m)]
+
+@benchmark('connected_components', sizes=(1000, 10000, 100000))
+def bench_connected_components(n):
+    edges = _random_edges(n, n)
+    return lambda: connected_components.connected_components(edges)
+
+@benchmark('connected_components_dense', sizes=(1000, 10000, 100000))
+def bench_connected_components_dense(n):
+    edges = _random_edges(n, n)
+    return lambda: connected_components.connected_components(edges, n=n)
+
+@benchmark('connected_components_parallel', sizes=(100000, 1000000))
+def bench_connected_components_parallel(n):
+    edges = _random_edges(n, n)
+    return lambda: connected_components.connected_components(edges, n=n, workers=2)
+
+def _random_adjacency_matrix(n, degree, seed=10):
+    rng = Random(seed)
+    inf = float('inf')
+    return [[rng.randint(1, 99) if rng.random() < degree / n else inf for _ in range(n)] for _ in range(n)]
+
+@benchmark('all_pairs_shortest_path.floyd_warshall', sizes=(50, 100, 200))
+def bench_floyd_warshall(n):
+    A = _random_adjacency_matrix(n, 10)
+    return lambda: shortest_path.all_pairs_shortest_path(A, method='floyd_warshall')
+
+@benchmark('all_pairs_shortest_path.johnson', sizes=(50, 100, 200))
+def bench_johnson(n):
+    A = _random_adjacency_matrix(n, 10)
+    return lambda: shortest_path.all_pairs_shortest_path(A, method='johnson')
+
+def _bipartite_network(n, degree=3, seed=11):
+    rng = Random(seed)
+    network = max_flow.FlowNetwork(2 * n + 2)
+    s, t = 2 * n, 2 * n + 1
+    network.add_edges([(s, i, 1) for i in range(n)] + [(n + j, t, 1) for j in range(n)])
+    network.add_edges((i, n + rng.randrange(n), 1) for i in range(n) for _ in range(degree))
+    return network, s, t
+
+@benchmark('max_flow.dinic', sizes=(1000, 10000))
+def bench_dinic(n):
+    network, s, t = _bipartite_network(n)
+    def run():
+        network.reset()
+        network.max_flow(s, t, 'dinic')
+    return run
+
+@benchmark('max_flow.push_relabel', sizes=(1000, 10000))
+def bench_push_relabel(n):
+    network, s, t = _bipartite_network(n)
+    def run():
+        network.reset()
+        network.max_flow(s, t, 'push_relabel')
+    return run
+
+def _assignment_network(C):
+    n = len(C)
+    network = min_cost_flow.MinCostFlow(2 * n + 2)
+    network.add_edges([(2 * n, i, 1, 0) for i in range(n)] + [(n + j, 2 * n + 1, 1, 0) for j in range(n)])
+    network.add_edges((i, n + j, 1, C[i][j]) for i in range(n) for j in range(n))
+    return network
+
+@benchmark('min_cost_flow.ssp', sizes=(50, 100))
+def bench_min_cost_flow_ssp(n):
+    network = _assignment_network(_random_matrix(n, n, 12, integers=True))
+    return lambda: network.solve(2 * n, 2 * n + 1, method='ssp')
+
+@benchmark('min_cost_flow.cost_scaling', sizes=(50, 100))
+def bench_min_cost_flow_cost_scaling(n):
+    network = _assignment_network(_random_matrix(n, n, 12, integers=True))
+    return lambda: network.solve(2 * n, 2 * n + 1, method='cost_scaling')
+
+@benchmark('hungarian', sizes=(50, 100, 300))
+def bench_hungarian(n):
+    C = _random_matrix(n, n, 12, integers=True)
+    return lambda: min_cost_flow.hungarian(C)
+
+def _random_weighted_edges(n, m, seed=13):
+    rng = Random(seed)
+    return [(rng.randrange(n), rng.randrange(n), rng.randint(1, 999)) for _ in range(m)]
+
+@benchmark('mst.kruskal', sizes=(1000, 10000, 100000))
+def bench_kruskal(n):
+    edges = _random_weighted_edges(n, 4 * n)
+    return lambda: mst.kruskal(edges, n=n)
+
+@benchmark('mst.kruskal_external', sizes=(10000, 100000))
+def bench_kruskal_external(n):
+    edges = _random_weighted_edges(n, 4 * n)
+    return lambda: mst.kruskal(edges, n=n, chunk_size=n)
+
+@benchmark('mst.prim', sizes=(1000, 10000, 100000))
+def bench_prim(n):
+    graph = csr.CSRGraph.from_edges(_random_weighted_edges(n, 4 * n), n=n, directed=False)
+    return lambda: mst.prim(graph)
+
+@benchmark('mst.boruvka', sizes=(1000, 10000, 100000))
+def bench_boruvka(n):
+    edges = _random_weighted_edges(n, 4 * n)
+    return lambda: mst.boruvka(edges, n)
+
+@benchmark('bfs.top_down', sizes=(10000, 100000))
+def bench_bfs_top_down(n):
+    graph = csr.CSRGraph.from_edges(_random_edges(n, 16 * n), n=n, directed=False)
+    return lambda: bfs.bfs_distances(graph, [0])
+
+@benchmark('bfs.optimizing', sizes=(10000, 100000))
+def bench_bfs_optimizing(n):
+    graph = csr.CSRGraph.from_edges(_random_edges(n, 16 * n), n=n, directed=False)
+    return lambda: bfs.bfs_distances(graph, [0], 'optimizing', reverse=graph)
+
+@benchmark('dfs.strongly_connected_components', sizes=(10000, 100000, 1000000))
+def bench_strongly_connected_components(n):
+    graph = csr.CSRGraph.from_edges(_random_edges(n, 2 * n), n=n)
+    return lambda: dfs.strongly_connected_components(graph)
+
+def _random_dag_edges(n, m, seed=14):
+    rng = Random(seed)
+    order = list(range(n))
+    rng.shuffle(order)
+    edges = []
+    for _ in range(m):
+        a, b = sorted(rng.sample(range(n), 2))
+        edges.append((order[a], order[b]))
+    return edges
+
+@benchmark('dag.topological_sort', sizes=(10000, 100000))
+def bench_topological_sort(n):
+    graph = csr.CSRGraph.from_edges(_random_dag_edges(n, 4 * n), n=n)
+    return lambda: dag.topological_sort(graph)
+
+@benchmark('dag.TopologicalOrder.add_edges', sizes=(10000, 100000))
+def bench_incremental_topological_order(n):
+    edges = _random_dag_edges(n, 4 * n)
+    return lambda: dag.TopologicalOrder(n).add_edges(edges)
+
+def _random_words(n, seed=15):
+    rng = Random(seed)
+    return sorted({''.join(rng.choice('abcdefghijklmnop') for _ in range(rng.randrange(3, 15))) for _ in range(n)})
+
+@benchmark('DoubleArrayTrie.build', sizes=(1000, 10000, 100000))
+def bench_trie_build(n):
+    words = _random_words(n)
+    return lambda: trie.DoubleArrayTrie.build(words)
+
+@benchmark('DoubleArrayTrie.get', sizes=(1000, 10000, 100000))
+def bench_trie_get(n):
+    words = _random_words(n)
+    t = trie.DoubleArrayTrie.build(words)
+    return lambda: [t.get(w) for w in words]
+
+@benchmark('AhoCorasick.finditer', sizes=(100, 1000, 10000), throughput=lambda n: 1 << 18)
+def bench_aho_corasick(n):
+    rng = Random(16)
+    patterns = list({bytes(rng.choice(b'abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randrange(5, 12))) for _ in range(n)})
+    text = bytes(rng.choice(b'abcdefghijklmnopqrstuvwxyz ') for _ in range(1 << 18))
+    automaton = aho_corasick.AhoCorasick(patterns)
+    return lambda: sum(1 for _ in automaton.finditer(text))
+
+_EMAIL_PATTERN = '[a-z0-9._]+@[a-z0-9]+(\\.[a-z]{2,4})+'
+
+def _email_like(n, seed=17):
+    rng = Random(seed)
+    return [''.join(rng.choice('abcxyz019._@') for _ in range(rng.randrange(5, 40))) if i % 2 else 'user.{}@example.com'.format(i) for i in range(n)]
+
+@benchmark('DFA.match_many', sizes=(1000, 10000, 100000))
+def bench_dfa_match_many(n):
+    inputs = _email_like(n)
+    automaton = dfa.DFA.from_pattern(_EMAIL_PATTERN)
+    return lambda: automaton.match_many(inputs)
+
+@benchmark('LazyDFA.match_many', sizes=(1000, 10000, 100000))
+def bench_lazy_dfa_match_many(n):
+    inputs = _email_like(n)
+    return lambda: dfa.LazyDFA(_EMAIL_PATTERN).match_many(inputs)
+
+_TOKEN_SPEC = {'number': r'\d+(\.\d+)?', 'name': r'[A-Za-z_]\w*', 'op': r'[-+*/=(),]', 'space': r'\s+'}
+
+def _source_text(n, seed=18):
+    rng = Random(seed)
+    words = ['x', 'total', 'count_1', '42', '3.14', '=', '+', '(', ')', ',', ' ', '\n']
+    text = ''.join(rng.choice(words) + ' ' for _ in range(n // 3))
+    return text[:n].rstrip() + ' ' * (n - len(text[:n].rstrip()))
+
+@benchmark('Tokenizer.scan', sizes=(1 << 16, 1 << 20), throughput=lambda n: n)
+def bench_tokenizer_scan(n):
+    text = _source_text(n)
+    tokenizer = tokenize.Tokenizer(_TOKEN_SPEC, skip=['space'])
+    return lambda: sum(1 for _ in tokenizer.scan(text))
+
+@benchmark('Tokenizer.stream', sizes=(1 << 16, 1 << 20), throughput=lambda n: n)
+def bench_tokenizer_stream(n):
+    text = _source_text(n)
+    chunks = [text[i:i + tokenize.CHUNK_SIZE] for i in range(0, n, tokenize.CHUNK_SIZE)]
+    tokenizer = tokenize.Tokenizer(_TOKEN_SPEC, skip=['space'])
+    return lambda: sum(1 for _ in tokenizer.stream(chunks))
+
+@benchmark('Tokenizer.scan.bytes', sizes=(1 << 16, 1 << 20), throughput=lambda n: n)
+def bench_tokenizer_scan_bytes(n):
+    data = _source_text(n).encode()
+    tokenizer = tokenize.Tokenizer({name: regex.encode() for name, regex in _TOKEN_SPEC.items()}, skip=['space'])
+    return lambda: sum(1 for _ in tokenizer.scan(data))
+
+@benchmark('re.finditer', sizes=(1 << 16, 1 << 20), throughput=lambda n: n)
+def bench_re_finditer(n):
+    text = _source_text(n)
+    pattern = re.compile('|'.join('({})'.format(regex) for regex in _TOKEN_SPEC.values()))
+    return lambda: sum(1 for m in pattern.finditer(text) if m.lastindex != 4)
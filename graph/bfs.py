@@ -1,3 +1,133 @@
 '''
-Utilities for doing a breadth-first search (DFS) on a graph.
-'''
\ No newline at end of file
+Utilities for doing a breadth-first search (BFS) on a graph.
+
+Graphs are adjacency lists or dictionaries, or `CSRGraph`s (see
+`csr.as_csr`). Visited nodes are tracked in a `bytearray`.
+'''
+
+from array import array
+
+from .csr import as_csr
+
+ALPHA = 14
+'''Direction-optimizing BFS switches to bottom-up when the frontier's out-edges exceed the unvisited nodes' edges divided by this'''
+
+BETA = 24
+'''Direction-optimizing BFS switches back to top-down when the frontier has fewer than \\(n\\) divided by this nodes'''
+
+def _top_down(offsets, targets, visited, frontier):
+    '''Next frontier: unvisited out-neighbors of `frontier`, marked visited'''
+    out = []
+    for u in frontier:
+        for i in range(offsets[u], offsets[u + 1]):
+            v = targets[i]
+            if not visited[v]:
+                visited[v] = 1
+                out.append(v)
+    return out
+
+def _bottom_up(offsets, sources, visited, frontier):
+    '''Next frontier: unvisited nodes with an in-neighbor (from the reverse graph's arrays) in `frontier`, marked visited'''
+    n = len(visited)
+    current = bytearray(n)
+    for u in frontier:
+        current[u] = 1
+    out = []
+    v = visited.find(0)
+    while v >= 0:
+        for i in range(offsets[v], offsets[v + 1]):
+            if current[sources[i]]:
+                out.append(v)
+                break
+        v = visited.find(0, v + 1)
+    for v in out:
+        visited[v] = 1
+    return out
+
+def bfs_levels(graph, sources, direction='top_down', reverse=None):
+    '''Generator over the levels of a BFS of `graph` from every node in `sources` at once
+
+    Input:
+
+     - `graph`: adjacency list or dictionary, or `CSRGraph`
+     - `sources`: iterable of start nodes, which make up level 0
+     - `direction`: `'top_down'` expands the frontier along out-edges;
+       `'optimizing'` switches to bottom-up steps (every unvisited node looks
+       for a parent in the frontier) while the frontier is large, which does
+       much less work on low-diameter graphs
+     - `reverse`: the reverse of `graph` as a `CSRGraph`, used by bottom-up
+       steps. Defaults to `graph.reverse()`; pass `graph` itself if undirected
+
+    Output: yields the list of nodes at distance 0, 1, 2, ... in turn
+    '''
+    if direction not in ('top_down', 'optimizing'):
+        raise ValueError('unknown direction {}'.format(direction))
+    graph = as_csr(graph)
+    n = len(graph)
+    offsets, targets, label = graph.offsets, graph.targets, graph.label
+    visited = bytearray(n)
+    frontier = []
+    for s in sources:
+        u = graph.node_id(s)
+        if not visited[u]:
+            visited[u] = 1
+            frontier.append(u)
+    if direction == 'optimizing' and reverse is None:
+        reverse = graph.reverse()
+    unexplored = graph.m
+    bottom_up = False
+    while frontier:
+        yield frontier if graph.labels is None else [label(u) for u in frontier]
+        if direction == 'optimizing':
+            frontier_edges = sum(offsets[u + 1] - offsets[u] for u in frontier)
+            unexplored -= frontier_edges
+            if not bottom_up and frontier_edges > unexplored / ALPHA:
+                bottom_up = True
+            elif bottom_up and len(frontier) < n / BETA:
+                bottom_up = False
+        if bottom_up:
+            frontier = _bottom_up(reverse.offsets, reverse.targets, visited, frontier)
+        else:
+            frontier = _top_down(offsets, targets, visited, frontier)
+
+def bfs_distances(graph, sources, direction='top_down', reverse=None):
+    '''Number of edges on a shortest path to every node from the nearest of `sources`
+
+    Input: as for `bfs_levels`
+
+    Output: `array('q')` indexed by integer node (see `CSRGraph.node_id`), with -1 for unreachable nodes
+    '''
+    graph = as_csr(graph)
+    dist = array('q', [-1]) * len(graph)
+    for d, level in enumerate(bfs_levels(graph, sources, direction, reverse)):
+        for u in level:
+            dist[graph.node_id(u)] = d
+    return dist
+
+if __name__ == '__main__':
+    from random import Random
+    from .csr import CSRGraph
+
+    # test bfs_levels
+    adj = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': ['e'], 'e': [], 'f': ['a']}
+    assert list(bfs_levels(adj, ['a'])) == [['a'], ['b', 'c'], ['d'], ['e']], 'Failed test: bfs_levels'
+    assert list(bfs_levels(adj, ['a', 'd'])) == [['a', 'd'], ['b', 'c', 'e']], 'Failed test: bfs_levels (multi-source)'
+    assert list(bfs_levels(adj, ['a'], 'optimizing')) == [['a'], ['b', 'c'], ['d'], ['e']], 'Failed test: bfs_levels (optimizing)'
+
+    # test bfs_distances
+    assert list(bfs_distances([[1], [2], [], [0]], [0])) == [0, 1, 2, -1], 'Failed test: bfs_distances'
+
+    # test direction-optimizing against top-down on a random graph
+    rng = Random(3)
+    n = 2000
+    G = CSRGraph.from_edges(((rng.randrange(n), rng.randrange(n)) for _ in range(20 * n)), n=n)
+    expected = [sorted(level) for level in bfs_levels(G, [0, 1])]
+    assert [sorted(level) for level in bfs_levels(G, [0, 1], 'optimizing')] == expected, 'Failed test: bfs_levels (optimizing, random)'
+    U = CSRGraph.from_edges(((rng.randrange(n), rng.randrange(n)) for _ in range(10 * n)), n=n, directed=False)
+    assert bfs_distances(U, [5], 'optimizing', reverse=U) == bfs_distances(U, [5]), 'Failed test: bfs_distances (undirected)'
+
+    # test a long chain
+    chain = CSRGraph.from_edges(((i, i + 1) for i in range(10 ** 5)), n=10 ** 5 + 1)
+    assert bfs_distances(chain, [0])[-1] == 10 ** 5, 'Failed test: bfs_distances (chain)'
+
+    print('Passed all tests.')
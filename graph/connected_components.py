@@ -2,26 +2,257 @@
 Utilities for determining the connected components of a graph.
 '''
 
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+CHUNK_SIZE = 1 << 16
+'''Edges per chunk handed to each worker by `connected_components`'''
+
+class _DisjointSetBase:
+    '''Storage, node bookkeeping and queries shared by `DisjointSet` and `RollbackDisjointSet`'''
+
+    __slots__ = ('parent', 'size', 'count', 'dense')
+
+    def __init__(self, n=None):
+        self.dense = n is not None
+        if self.dense:
+            if n < 0:
+                raise ValueError('expected n >= 0, got {}'.format(n))
+            self.parent = array('l', range(n))
+            self.size = array('l', [1]) * n
+            self.count = n
+        else:
+            self.parent = {}
+            self.size = {}
+            self.count = 0
+
+    def add(self, a):
+        '''Add node `a` as a singleton component, if not already present'''
+        if self.dense:
+            if not 0 <= a < len(self.parent):
+                raise IndexError('node {} out of range for {} nodes'.format(a, len(self.parent)))
+        elif a not in self.parent:
+            self.parent[a] = a
+            self.size[a] = 1
+            self.count += 1
+
+    def connected(self, a, b):
+        '''Whether `a` and `b` are in the same component'''
+        return self.find(a) == self.find(b)
+
+    def component_size(self, a):
+        '''Number of nodes in the component of `a`'''
+        return self.size[self.find(a)]
+
+    def components(self):
+        '''Dictionary {`ancestor`:`children`} of lists of nodes that share ancestors'''
+        parent = self.parent
+        nodes = range(len(parent)) if self.dense else parent
+        out = {i:[i] for i in nodes if parent[i] == i}
+        find = self.find
+        for i in nodes:
+            if i != parent[i]:
+                out[find(i)].append(i)
+        return out
+
+    def __len__(self):
+        return len(self.parent)
+
+    def __contains__(self, a):
+        if self.dense:
+            return isinstance(a, int) and 0 <= a < len(self.parent)
+        return a in self.parent
+
+class DisjointSet(_DisjointSetBase):
+    '''Union-Find (disjoint-set) structure over the nodes of a graph
+
+    Uses path halving in `find` and union by size, so any sequence of
+    operations takes nearly constant amortized time per operation.
+
+    Input:
+
+     - `n`: if given, the nodes are the integers `0..n-1`, and `parent` and
+       `size` are `array('l')`s (dense mode); otherwise nodes are arbitrary
+       hashable keys, added on first use, and `parent` and `size` are dicts
+
+    Attributes:
+
+     - `parent`: map `i` \\(\\mapsto\\) `parent[i]`
+     - `size`: map `i` \\(\\mapsto\\) `size[i]` (meaningful only for roots)
+     - `count`: number of components
+    '''
+
+    __slots__ = ()
+
+    def find(self, a):
+        '''Find the root ancestor of `a`, halving the path to it'''
+        parent = self.parent
+        if self.dense and not 0 <= a < len(parent):
+            raise IndexError('node {} out of range for {} nodes'.format(a, len(parent)))
+        while parent[a] != a:
+            parent[a] = a = parent[parent[a]]
+        return a
+
+    def union(self, a, b):
+        '''Combine the components of `a` and `b`; whether they were separate'''
+        if not self.dense:
+            self.add(a)
+            self.add(b)
+        a = self.find(a)
+        b = self.find(b)
+        if a == b: return False
+        size = self.size
+        if size[a] > size[b]:
+            a, b = b, a
+        self.parent[a] = b
+        size[b] += size[a]
+        self.count -= 1
+        return True
+
+    def union_many(self, edges):
+        '''Combine the components of the endpoints of every edge in the iterable `edges`
+
+        Consumes `edges` once, so it may be a generator. Returns the number of merges.'''
+        parent, size, dense = self.parent, self.size, self.dense
+        n = len(parent)
+        merged = added = 0
+        try:
+            for a, b in edges:
+                if dense:
+                    if not (0 <= a < n and 0 <= b < n):
+                        raise IndexError('node {} out of range for {} nodes'.format(b if 0 <= a < n else a, n))
+                else:
+                    if a not in parent:
+                        parent[a] = a
+                        size[a] = 1
+                        added += 1
+                    if b not in parent:
+                        parent[b] = b
+                        size[b] = 1
+                        added += 1
+                while parent[a] != a:
+                    parent[a] = a = parent[parent[a]]
+                while parent[b] != b:
+                    parent[b] = b = parent[parent[b]]
+                if a == b: continue
+                if size[a] > size[b]:
+                    a, b = b, a
+                parent[a] = b
+                size[b] += size[a]
+                merged += 1
+        finally:
+            # keep the count right for the edges done if one is invalid
+            self.count += added - merged
+        return merged
+
+    def find_many(self, nodes):
+        '''Root ancestors of every node in the iterable `nodes`, as a list'''
+        find = self.find
+        return [find(a) for a in nodes]
+
+class RollbackDisjointSet(_DisjointSetBase):
+    '''Union-Find structure for online connectivity, with checkpoints and rollback
+
+    Edges are added one at a time with `add_edge`; the number of components
+    and the size of every component are kept up to date, so queries between
+    insertions never revisit earlier edges. `rollback` undoes every change
+    since a `checkpoint`, e.g. for offline dynamic connectivity or what-if
+    queries.
+
+    Unions are by size and `find` does not compress paths, so every change
+    can be undone in \\(O(1)\\) and `find` takes \\(O(\\log n)\\).
+
+    Input and attributes as for `DisjointSet`.
+    '''
+
+    __slots__ = ('history',)
+
+    def __init__(self, n=None):
+        super().__init__(n)
+        self.history = []
+
+    def add(self, a):
+        '''Add node `a` as a singleton component, if not already present'''
+        if not self.dense and a not in self.parent:
+            self.history.append((a, a))
+        super().add(a)
+
+    def find(self, a):
+        '''Find the root ancestor of `a`'''
+        parent = self.parent
+        if self.dense and not 0 <= a < len(parent):
+            raise IndexError('node {} out of range for {} nodes'.format(a, len(parent)))
+        while parent[a] != a:
+            a = parent[a]
+        return a
+
+    def add_edge(self, a, b):
+        '''Add the edge `(a, b)`, combining the components of `a` and `b`; whether they were separate'''
+        if not self.dense:
+            self.add(a)
+            self.add(b)
+        a = self.find(a)
+        b = self.find(b)
+        if a == b: return False
+        size = self.size
+        if size[a] > size[b]:
+            a, b = b, a
+        self.parent[a] = b
+        size[b] += size[a]
+        self.count -= 1
+        self.history.append((a, b))
+        return True
+
+    def add_edges(self, edges):
+        '''Add every edge in the iterable `edges`; the number of merges'''
+        add_edge = self.add_edge
+        return sum(add_edge(a, b) for a, b in edges)
+
+    def checkpoint(self):
+        '''A token for the current state, to pass to `rollback`'''
+        return len(self.history)
+
+    def rollback(self, checkpoint=0):
+        '''Undo every change made since `checkpoint` was taken (by default, all of them)'''
+        if not 0 <= checkpoint <= len(self.history):
+            raise ValueError('invalid checkpoint {}, expected 0 to {}'.format(checkpoint, len(self.history)))
+        parent, size, history = self.parent, self.size, self.history
+        while len(history) > checkpoint:
+            a, b = history.pop()
+            if a == b:
+                # node added in keyed mode
+                del parent[a]
+                del size[a]
+                self.count -= 1
+            else:
+                parent[a] = a
+                size[b] -= size[a]
+                self.count += 1
+
 def find(parent, a):
-    '''Find the root ancestor of `a` in `parent`'''
+    '''Find the root ancestor of `a` in `parent`, halving the path to it'''
     while a != parent[a]:
-        a = parent[a]
+        parent[a] = a = parent[parent[a]]
     return a
 
 def union(parent, size, a, b):
     '''Combine components `a` and `b` in `parent` and `size`
-    
+
     Input:
-    
+
      - `parent`: map `i` \\(\\mapsto\\) `parent[i]`
      - `size`: map `i` \\(\\mapsto\\) `size[i]`
      - `a`: graph node
      - `b`: graph node
-     
+
     Output:
 
      - `parent'`: updated `parent` array
      - `size'`: updated `size` array
+
+    Prefer `DisjointSet.union`, which updates in place without returning.
     '''
     a_parent = find(parent, a)
     b_parent = find(parent, b)
@@ -40,34 +271,60 @@ def connected(parent, a, b):
     '''Whether `a` and `b` share an ancestor in `parent`'''
     return find(parent, a) == find(parent, b)
 
-def connected_components(edges):
+def _chunk_forest(edges, dense):
+    '''Union-Find over one chunk of edges; its nodes and their roots, as two sequences'''
+    local = DisjointSet()
+    local.union_many(edges)
+    find = local.find
+    nodes = list(local.parent)
+    roots = [find(a) for a in nodes]
+    if dense:
+        return array('l', nodes), array('l', roots)
+    return nodes, roots
+
+def _connected_components_parallel(components, edges, workers, chunk_size):
+    '''Union into `components` the partial forests of chunks of `edges`, built by `workers` processes'''
+    edges = iter(edges)
+    pending = deque()
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            chunk = list(islice(edges, chunk_size))
+            if chunk:
+                pending.append(pool.submit(_chunk_forest, chunk, components.dense))
+            # bound the chunks in flight, so memory does not grow with the number of edges
+            while pending and (len(pending) >= 2 * workers or not chunk):
+                components.union_many(zip(*pending.popleft().result()))
+            if not chunk:
+                return components
+
+def connected_components(edges, n=None, workers=None, chunk_size=CHUNK_SIZE):
     '''Connected components of the graph specified by `edges`
-    
+
     Input:
-    
-     - `edges`: a list of 2-tuples (or 2-iterables)
-     
+
+     - `edges`: an iterable of 2-tuples (or 2-iterables), consumed once (so it may be a generator)
+     - `n`: if given, the nodes are the integers `0..n-1`, including isolated ones (see `DisjointSet`)
+     - `workers`: if > 1, split `edges` into chunks of `chunk_size` edges, find a
+       spanning forest of each chunk in a pool of `workers` processes, and union
+       the forests, each given as (node, root) pairs. Defaults to serial
+     - `chunk_size`: edges per chunk in parallel mode. Defaults to `CHUNK_SIZE`
+
     Output:
-    
-     - `components`: a dictionary {`ancestor`:`children`} of lists of components that share ancestors
+
+     - `components`: a dictionary {`ancestor`:`children`} of lists of components that share ancestors.
+       In parallel mode, the components are the same but the ancestors and the order may differ
 
     Uses the Union-Find algorithm.
     '''
-    parent = {}
-    size = {}
-    for i,j in edges:
-        parent[i] = i
-        parent[j] = j
-        size[i] = 1
-        size[j] = 1
-    for i,j in edges:
-        parent, size = union(parent, size, i, j)
-    out = {i:[i] for i in parent if parent[i] == i}
-    for i in parent:
-        if i != parent[i]:
-            out[find(parent, i)].append(i)
-    return out
-    
+    components = DisjointSet(n)
+    if workers is not None and workers > 1:
+        if chunk_size < 1:
+            raise ValueError('expected chunk_size >= 1, got {}'.format(chunk_size))
+        _connected_components_parallel(components, edges, workers, chunk_size)
+    else:
+        components.union_many(edges)
+    return components.components()
+
 if __name__ == '__main__':
     # test union_find
     edges = [
@@ -77,4 +334,71 @@ if __name__ == '__main__':
     ]
     components = connected_components(edges)
     unambiguous = [sorted(component) for component in components.values()]
-    assert unambiguous == [[1], [2, 3, 4]], 'Failed test: connected_components'
\ No newline at end of file
+    assert unambiguous == [[1], [2, 3, 4]], 'Failed test: connected_components'
+    components = connected_components((tuple(edge) for edge in edges), n=6)
+    unambiguous = sorted(sorted(component) for component in components.values())
+    assert unambiguous == [[0], [1], [2, 3, 4], [5]], 'Failed test: connected_components (dense)'
+
+    # test DisjointSet
+    for ds in (DisjointSet(), DisjointSet(10)):
+        assert ds.union_many([(0, 1), (2, 3), (1, 3), (0, 2), (5, 6)]) == 4, 'Failed test: DisjointSet.union_many'
+        assert ds.connected(0, 3) and not ds.connected(0, 5), 'Failed test: DisjointSet.connected'
+        assert ds.component_size(2) == 4 and ds.component_size(6) == 2, 'Failed test: DisjointSet.component_size'
+        assert len(set(ds.find_many([0, 1, 2, 3]))) == 1, 'Failed test: DisjointSet.find_many'
+        assert ds.union(3, 6) and not ds.union(0, 5), 'Failed test: DisjointSet.union'
+    assert ds.count == 5 and len(ds) == 10 and 9 in ds and 10 not in ds, 'Failed test: DisjointSet (dense)'
+    ds = DisjointSet()
+    ds.union('a', 'b')
+    ds.add('c')
+    assert ds.count == 2 and ds.components() == {'b': ['b', 'a'], 'c': ['c']}, 'Failed test: DisjointSet (keys)'
+
+    # test find
+    parent = {0: 0, 1: 0, 2: 1, 3: 2}
+    assert find(parent, 3) == 0 and parent[3] == 1, 'Failed test: find'
+
+    # test connected_components (parallel)
+    from random import Random
+    rng = Random(0)
+    edges = [(rng.randrange(300), rng.randrange(300)) for _ in range(200)] + [(400, 400)]
+    def normalize(components):
+        return sorted(sorted(component) for component in components.values())
+    serial = normalize(connected_components(edges))
+    assert normalize(connected_components(iter(edges), workers=2, chunk_size=16)) == serial, 'Failed test: connected_components (parallel)'
+    assert normalize(connected_components(edges, n=401, workers=2, chunk_size=16)) == normalize(connected_components(edges, n=401)), 'Failed test: connected_components (parallel, dense)'
+
+    # test dense bounds
+    for ds in (DisjointSet(3), RollbackDisjointSet(3)):
+        merge = ds.union if isinstance(ds, DisjointSet) else ds.add_edge
+        for call in (lambda: ds.find(-1), lambda: ds.connected(0, 3), lambda: merge(0, -1)):
+            try:
+                call()
+                assert False, 'Failed test: {} (bounds)'.format(type(ds).__name__)
+            except IndexError:
+                pass
+        assert ds.count == 3, 'Failed test: {} (bounds, count)'.format(type(ds).__name__)
+    ds = DisjointSet(3)
+    try:
+        ds.union_many([(0, 1), (1, 3)])
+        assert False, 'Failed test: DisjointSet.union_many (bounds)'
+    except IndexError:
+        assert ds.count == 2 and ds.connected(0, 1), 'Failed test: DisjointSet.union_many (bounds, count)'
+    try:
+        RollbackDisjointSet(3).add_edges([(-1, 0)])
+        assert False, 'Failed test: RollbackDisjointSet.add_edges (bounds)'
+    except IndexError:
+        pass
+
+    # test RollbackDisjointSet
+    for ds in (RollbackDisjointSet(), RollbackDisjointSet(8)):
+        ds.add_edges([(0, 1), (2, 3)])
+        before = ds.checkpoint()
+        count = ds.count
+        assert ds.add_edge(1, 2) and not ds.add_edge(0, 3), 'Failed test: RollbackDisjointSet.add_edge'
+        assert ds.connected(0, 3) and ds.component_size(3) == 4 and ds.count == count - 1, 'Failed test: RollbackDisjointSet.connected'
+        ds.add_edge(5, 6)
+        ds.rollback(before)
+        assert not ds.connected(0, 3) and ds.component_size(3) == 2 and ds.count == count, 'Failed test: RollbackDisjointSet.rollback'
+        ds.rollback()
+        assert ds.count == (0 if not ds.dense else 8), 'Failed test: RollbackDisjointSet.rollback (all)'
+
+    print('Passed all tests.')
@@ -0,0 +1,321 @@
+'''
+Compact compressed sparse row (CSR) representation of a graph.
+
+The out-edges of node `u` are `targets[offsets[u]:offsets[u + 1]]`, with
+weights (if any) at the same positions of `weights`. Nodes are the integers
+`0..n-1`; graphs built from other hashable keys keep the original keys in
+`labels` (and the reverse map in `index`).
+
+The algorithms of the `graph` package accept a `CSRGraph` wherever they
+accept an adjacency dictionary or list, and use its arrays directly.
+'''
+
+import json
+import mmap
+import struct
+from array import array
+
+_HEADER = struct.Struct('<4sBBxxqqq')
+'''Binary file header: magic, version, weight typecode (0 if unweighted), node count, edge count, label bytes'''
+
+_MAGIC = b'CSRG'
+_VERSION = 1
+
+class CSRGraph:
+    '''Directed graph in compressed sparse row form
+
+    Input:
+
+     - `offsets`: `array('q')` of length \\(n+1\\); the out-edges of `u` are at positions `offsets[u]:offsets[u+1]`
+     - `targets`: `array('q')` of length \\(m\\), the head of every edge
+     - `weights`: `array('q')` or `array('d')` of length \\(m\\), or `None` if unweighted
+     - `labels`: list of the original node keys, or `None` if nodes are `0..n-1`
+
+    Use `from_edges` or `from_adjacency` rather than calling this directly.
+    '''
+
+    __slots__ = ('offsets', 'targets', 'weights', 'labels', 'index', '_buffer')
+
+    def __init__(self, offsets, targets, weights=None, labels=None):
+        if len(offsets) == 0 or offsets[-1] != len(targets):
+            raise ValueError('offsets must have length n+1 and end at the edge count {}'.format(len(targets)))
+        if weights is not None and len(weights) != len(targets):
+            raise ValueError('expected {} weights, got {}'.format(len(targets), len(weights)))
+        if labels is not None and len(labels) != len(offsets) - 1:
+            raise ValueError('expected {} labels, got {}'.format(len(offsets) - 1, len(labels)))
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.labels = labels
+        self.index = None if labels is None else {key: i for i, key in enumerate(labels)}
+        self._buffer = None
+
+    @classmethod
+    def from_edges(cls, edges, n=None, directed=True):
+        '''Graph with the edges in the iterable `edges`
+
+        Input:
+
+         - `edges`: 2-tuples `(u, v)` or weighted 3-tuples `(u, v, w)`, consumed once
+         - `n`: if given, nodes are the integers `0..n-1`; otherwise nodes are
+           arbitrary hashable keys, numbered in order of first appearance
+         - `directed`: if `False`, every edge is also added in reverse
+
+        Edges are bucketed by tail with a counting sort, so the out-edges of
+        each node keep their input order.
+        '''
+        sources, heads = array('q'), array('q')
+        weights = []
+        index = None if n is not None else {}
+        weighted = None
+        for edge in edges:
+            if weighted is None:
+                weighted = len(edge) == 3
+            if weighted:
+                u, v, w = edge
+                weights.append(w)
+            else:
+                u, v = edge
+            if index is not None:
+                u = index.setdefault(u, len(index))
+                v = index.setdefault(v, len(index))
+            sources.append(u)
+            heads.append(v)
+        if n is None:
+            n = len(index)
+        elif sources and not (0 <= min(sources) and max(sources) < n and 0 <= min(heads) and max(heads) < n):
+            raise ValueError('edge endpoints must lie in 0..{}'.format(n - 1))
+        if weighted:
+            weights = _weight_array(weights)
+        if not directed:
+            sources, heads = sources + heads, heads + sources
+            if weighted:
+                weights += weights
+        offsets, order = _bucket(sources, n)
+        targets = array('q', bytes(8 * len(heads)))
+        for i, pos in enumerate(order):
+            targets[pos] = heads[i]
+        out_weights = None
+        if weighted:
+            out_weights = array(weights.typecode, bytes(weights.itemsize * len(weights)))
+            for i, pos in enumerate(order):
+                out_weights[pos] = weights[i]
+        labels = None if index is None else list(index)
+        return cls(offsets, targets, out_weights, labels)
+
+    @classmethod
+    def from_adjacency(cls, adj):
+        '''Graph with adjacency `adj`
+
+        Input:
+
+         - `adj`: a list indexed by node, or a dictionary keyed by node, of either
+           iterables of neighbors or dictionaries {`neighbor`: `weight`}. With a
+           dictionary, nodes are its keys (and any neighbors not among them)
+        '''
+        keys = range(len(adj)) if not isinstance(adj, dict) else adj
+        n = len(adj) if not isinstance(adj, dict) else None
+        if any(isinstance(adj[u], dict) for u in keys):
+            edges = ((u, v, w) for u in keys for v, w in adj[u].items())
+        else:
+            edges = ((u, v) for u in keys for v in adj[u])
+        graph = cls.from_edges(edges, n)
+        if n is None and len(graph) < len(adj):
+            # nodes without any edges
+            labels = graph.labels + [u for u in adj if u not in graph.index]
+            offsets = graph.offsets + array('q', [graph.offsets[-1]]) * (len(labels) - len(graph.labels))
+            graph = cls(offsets, graph.targets, graph.weights, labels)
+        return graph
+
+    @classmethod
+    def load(cls, path):
+        '''Graph saved with `save` to the file `path`
+
+        The file is memory-mapped read-only and the arrays are `memoryview`s
+        into it, so loading takes constant time and memory regardless of
+        the graph size. Call `close` to release the file.'''
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, typecode, n, m, label_bytes = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            buffer.close()
+            raise ValueError('{} is not a CSRGraph file'.format(path))
+        view = memoryview(buffer)
+        start = _HEADER.size
+        offsets = view[start:start + 8 * (n + 1)].cast('q')
+        start += 8 * (n + 1)
+        targets = view[start:start + 8 * m].cast('q')
+        start += 8 * m
+        weights = None
+        if typecode:
+            weights = view[start:start + 8 * m].cast(chr(typecode))
+            start += 8 * m
+        labels = json.loads(bytes(view[start:start + label_bytes])) if label_bytes else None
+        graph = cls(offsets, targets, weights, labels)
+        graph._buffer = buffer
+        return graph
+
+    def save(self, path):
+        '''Write the graph to the binary file `path`, to be opened with `load`
+
+        Labels, if any, must be integers or strings.'''
+        label_bytes = b''
+        if self.labels is not None:
+            if not all(isinstance(key, (int, str)) for key in self.labels):
+                raise ValueError('can only save integer or string labels')
+            label_bytes = json.dumps(self.labels).encode()
+        typecode = 0 if self.weights is None else ord(_typecode(self.weights))
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, typecode, len(self), self.m, len(label_bytes)))
+            for data in (self.offsets, self.targets, self.weights):
+                if data is not None:
+                    f.write(memoryview(data).cast('B'))
+            f.write(label_bytes)
+
+    def close(self):
+        '''Release the file of a graph opened with `load`
+
+        Raises `BufferError` while slices returned by `neighbors` or `edge_weights` are still referenced.'''
+        if self._buffer is not None:
+            for view in (self.offsets, self.targets, self.weights):
+                if view is not None:
+                    view.release()
+            self.offsets = self.targets = self.weights = None
+            self._buffer.close()
+            self._buffer = None
+
+    @property
+    def m(self):
+        '''Number of edges'''
+        return len(self.targets)
+
+    @property
+    def weighted(self):
+        '''Whether the edges have weights'''
+        return self.weights is not None
+
+    def degree(self, u):
+        '''Out-degree of node `u`'''
+        return self.offsets[u + 1] - self.offsets[u]
+
+    def neighbors(self, u):
+        '''Heads of the out-edges of node `u`'''
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+    def edge_weights(self, u):
+        '''Weights of the out-edges of node `u`, aligned with `neighbors(u)`'''
+        return self.weights[self.offsets[u]:self.offsets[u + 1]]
+
+    def edges(self):
+        '''Iterator over all edges as `(u, v)` or, if weighted, `(u, v, w)`'''
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        for u in range(len(self)):
+            for i in range(offsets[u], offsets[u + 1]):
+                yield (u, targets[i]) if weights is None else (u, targets[i], weights[i])
+
+    def reverse(self):
+        '''Graph with every edge reversed'''
+        n = len(self)
+        offsets = self.offsets
+        sources = array('q', bytes(8 * self.m))
+        for u in range(n):
+            for i in range(offsets[u], offsets[u + 1]):
+                sources[i] = u
+        new_offsets, order = _bucket(self.targets, n)
+        targets = array('q', bytes(8 * self.m))
+        weights = None
+        if self.weights is not None:
+            weights = array(_typecode(self.weights), bytes(8 * self.m))
+        for i, pos in enumerate(order):
+            targets[pos] = sources[i]
+            if weights is not None:
+                weights[pos] = self.weights[i]
+        return CSRGraph(new_offsets, targets, weights, None if self.labels is None else list(self.labels))
+
+    def node_id(self, key):
+        '''Integer node of the original key `key`'''
+        return key if self.index is None else self.index[key]
+
+    def label(self, u):
+        '''Original key of the integer node `u`'''
+        return u if self.labels is None else self.labels[u]
+
+    def to_adjacency(self):
+        '''Adjacency list of lists of neighbors, or of dictionaries {`neighbor`: `weight`} if weighted'''
+        if self.weights is None:
+            return [list(self.neighbors(u)) for u in range(len(self))]
+        return [dict(zip(self.neighbors(u), self.edge_weights(u))) for u in range(len(self))]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return 'CSRGraph(n={}, m={}, weighted={})'.format(len(self), self.m, self.weighted)
+
+def _typecode(data):
+    '''Typecode of an `array` or `memoryview`'''
+    return data.typecode if isinstance(data, array) else data.format
+
+def _weight_array(weights):
+    '''`weights` as an integer array if possible, else a float array'''
+    try:
+        return array('q', weights)
+    except TypeError:
+        return array('d', weights)
+
+def _bucket(keys, n):
+    '''Counting sort of positions by `keys` in `0..n-1`: the offsets of each bucket and the new position of every key'''
+    offsets = array('q', bytes(8 * (n + 1)))
+    for k in keys:
+        offsets[k + 1] += 1
+    for u in range(n):
+        offsets[u + 1] += offsets[u]
+    cursor = offsets[:-1]
+    order = array('q', bytes(8 * len(keys)))
+    for i, k in enumerate(keys):
+        order[i] = cursor[k]
+        cursor[k] += 1
+    return offsets, order
+
+def as_csr(graph):
+    '''`graph` as a `CSRGraph`: a `CSRGraph` itself, or an adjacency list or dictionary (see `CSRGraph.from_adjacency`)'''
+    if isinstance(graph, CSRGraph):
+        return graph
+    return CSRGraph.from_adjacency(graph)
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    # test from_edges
+    G = CSRGraph.from_edges([(0, 1), (0, 2), (2, 1), (1, 3)], n=5)
+    assert list(G.offsets) == [0, 2, 3, 4, 4, 4] and list(G.targets) == [1, 2, 3, 1], 'Failed test: from_edges'
+    assert list(G.neighbors(0)) == [1, 2] and G.degree(4) == 0 and not G.weighted, 'Failed test: neighbors'
+    H = CSRGraph.from_edges([('a', 'b', 2), ('b', 'c', 0.5)], directed=False)
+    assert H.labels == ['a', 'b', 'c'] and H.weights.typecode == 'd', 'Failed test: from_edges (labels)'
+    assert sorted(H.edges()) == [(0, 1, 2.0), (1, 0, 2.0), (1, 2, 0.5), (2, 1, 0.5)], 'Failed test: from_edges (undirected)'
+
+    # test from_adjacency
+    A = CSRGraph.from_adjacency({'x': {'y': 3}, 'y': {}, 'z': {}})
+    assert A.labels == ['x', 'y', 'z'] and list(A.edges()) == [(0, 1, 3)], 'Failed test: from_adjacency'
+    assert CSRGraph.from_adjacency([[1, 2], [2], []]).to_adjacency() == [[1, 2], [2], []], 'Failed test: to_adjacency'
+
+    # test reverse
+    R = G.reverse()
+    assert sorted(R.edges()) == sorted((v, u) for u, v in G.edges()), 'Failed test: reverse'
+    assert sorted(H.reverse().edges()) == sorted(H.edges()), 'Failed test: reverse (symmetric)'
+
+    # test save and load
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'graph.csr')
+        H.save(path)
+        L = CSRGraph.load(path)
+        assert list(L.edges()) == list(H.edges()) and L.labels == H.labels, 'Failed test: save/load'
+        assert L.node_id('c') == 2 and sorted(L.neighbors(1)) == [0, 2], 'Failed test: load'
+        L.close()
+        G.save(path)
+        L = CSRGraph.load(path)
+        assert list(L.edges()) == list(G.edges()) and L.labels is None and not L.weighted, 'Failed test: save/load (unweighted)'
+        L.close()
+
+    print('Passed all tests.')
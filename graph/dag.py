@@ -1,3 +1,364 @@
 '''
 Utilities related to directed acyclic graphs (DAGs).
-'''
\ No newline at end of file
+
+`topological_sort` orders a whole graph at once. `TopologicalOrder` keeps
+an order up to date as edges are added one at a time, and `PathDP` keeps
+longest path, shortest path or path count values over it.
+'''
+
+from array import array
+from heapq import heappush, heappop
+from math import inf
+
+from .csr import as_csr
+
+def topological_sort(graph):
+    '''Nodes of the DAG `graph` in topological order, by Kahn's algorithm
+
+    Input:
+
+     - `graph`: adjacency list or dictionary, or `CSRGraph`
+
+    Output: list of nodes, each before all of its out-neighbors. Raises `ValueError` if `graph` has a cycle
+    '''
+    graph = as_csr(graph)
+    order = _kahn(len(graph), graph.offsets, graph.targets)
+    return [graph.label(u) for u in order]
+
+def _kahn(n, offsets, targets):
+    '''Topological order of the integer nodes of a graph in CSR form as an `array('q')`'''
+    indegree = array('q', bytes(8 * n))
+    for v in targets:
+        indegree[v] += 1
+    order = array('q', (u for u in range(n) if not indegree[u]))
+    head = 0
+    while head < len(order):
+        u = order[head]
+        head += 1
+        for i in range(offsets[u], offsets[u + 1]):
+            v = targets[i]
+            indegree[v] -= 1
+            if not indegree[v]:
+                order.append(v)
+    if len(order) < n:
+        raise ValueError('graph has a cycle through {} nodes'.format(n - len(order)))
+    return order
+
+class TopologicalOrder:
+    '''Topological order of a DAG on the nodes `0..n-1` maintained as edges are added (Pearce-Kelly)
+
+    Adding an edge \\(u \\to v\\) with `u` already before `v` costs \\(O(1)\\).
+    Otherwise only the nodes whose positions lie between `v` and `u` and
+    that are reachable from `v` or reach `u` are searched and reordered.
+
+    `order` lists the nodes by position and `position` gives the position of
+    each node; `out` and `into` hold the out- and in-neighbors of each node as
+    dictionaries {`neighbor`: `weight`}.
+
+    Input:
+
+     - `n`: initial number of nodes
+    '''
+
+    __slots__ = ('out', 'into', 'order', 'position', 'stamp', 'generation')
+
+    def __init__(self, n=0):
+        self.out = [{} for _ in range(n)]
+        self.into = [{} for _ in range(n)]
+        self.order = array('q', range(n))
+        self.position = array('q', range(n))
+        self.stamp = array('q', bytes(8 * n))
+        self.generation = 0
+
+    @classmethod
+    def from_edges(cls, edges, n):
+        '''Order of the DAG on the nodes `0..n-1` with edges `(u, v)` or weighted `(u, v, w)`, found with Kahn's algorithm
+
+        Raises `ValueError` if the edges form a cycle.
+        '''
+        dag = cls(n)
+        offsets = array('q', bytes(8 * (n + 1)))
+        for u, v, *w in edges:
+            if not (0 <= u < n and 0 <= v < n):
+                raise IndexError('edge ({}, {}) out of range for {} nodes'.format(u, v, n))
+            if v not in dag.out[u]:
+                offsets[u + 1] += 1
+            dag.out[u][v] = dag.into[v][u] = w[0] if w else 1
+        for u in range(n):
+            offsets[u + 1] += offsets[u]
+        targets = array('q', (v for u in range(n) for v in dag.out[u]))
+        dag.order = _kahn(n, offsets, targets)
+        for i, u in enumerate(dag.order):
+            dag.position[u] = i
+        return dag
+
+    def add_node(self):
+        '''Add a node after all others; its id'''
+        u = len(self.order)
+        self.out.append({})
+        self.into.append({})
+        self.order.append(u)
+        self.position.append(u)
+        self.stamp.append(0)
+        return u
+
+    def _reach(self, start, edges, inside, mark, target=-1):
+        '''Nodes reachable from `start` along `edges` through nodes `x` with `inside(position[x])`, marked with `mark`
+
+        Raises `ValueError` if `target` is reached.
+        '''
+        position, stamp = self.position, self.stamp
+        stamp[start] = mark
+        found = [start]
+        stack = [start]
+        while stack:
+            x = stack.pop()
+            for y in edges[x]:
+                if y == target:
+                    raise ValueError('edge ({}, {}) would create a cycle'.format(target, start))
+                if stamp[y] != mark and inside(position[y]):
+                    stamp[y] = mark
+                    found.append(y)
+                    stack.append(y)
+        return found
+
+    def add_edge(self, u, v, w=1):
+        '''Add the edge \\(u \\to v\\) with weight `w`, reordering nodes if needed
+
+        Raises `ValueError`, leaving the graph unchanged, if the edge would close a cycle.
+        '''
+        n = len(self.order)
+        if not (0 <= u < n and 0 <= v < n):
+            raise IndexError('edge ({}, {}) out of range for {} nodes'.format(u, v, n))
+        if u == v:
+            raise ValueError('edge ({}, {}) would create a cycle'.format(u, v))
+        position = self.position
+        lower, upper = position[v], position[u]
+        if lower < upper:
+            self.generation += 2
+            forward = self._reach(v, self.out, lambda p: p < upper, self.generation, u)
+            backward = self._reach(u, self.into, lambda p: p > lower, self.generation + 1)
+            forward.sort(key=position.__getitem__)
+            backward.sort(key=position.__getitem__)
+            slots = sorted(position[x] for x in forward + backward)
+            for p, x in zip(slots, backward + forward):
+                position[x] = p
+                self.order[p] = x
+        self.out[u][v] = self.into[v][u] = w
+
+    def add_edges(self, edges):
+        '''Add every edge `(u, v)` or `(u, v, w)` of `edges` in turn'''
+        for u, v, *w in edges:
+            self.add_edge(u, v, *w)
+
+    def remove_edge(self, u, v):
+        '''Remove the edge \\(u \\to v\\); the order stays valid'''
+        del self.out[u][v]
+        del self.into[v][u]
+
+    def descendants(self, u):
+        '''Nodes reachable from `u`, including `u`'''
+        self.generation += 2
+        return self._reach(u, self.out, lambda p: True, self.generation)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+PATH_DP_KINDS = ('longest', 'shortest', 'count')
+'''Values `PathDP` can maintain'''
+
+class PathDP:
+    '''Longest path, shortest path or path count to every node of a `TopologicalOrder`, kept up to date as edges change
+
+    Values are measured from the sources: by default the nodes without
+    in-edges at the time. For `'longest'` and `'shortest'` they are path
+    weights (0 at a source, `-inf` or `inf` if unreachable), and for
+    `'count'` the number of distinct paths from any source.
+
+    Input:
+
+     - `dag`: a `TopologicalOrder`
+     - `kind`: one of `PATH_DP_KINDS`
+     - `sources`: fixed iterable of source nodes, or `None`
+    '''
+
+    __slots__ = ('dag', 'kind', 'sources', 'values', 'queued')
+
+    def __init__(self, dag, kind='longest', sources=None):
+        if kind not in PATH_DP_KINDS:
+            raise ValueError('unknown kind {}'.format(kind))
+        self.dag = dag
+        self.kind = kind
+        self.sources = None if sources is None else set(sources)
+        self.values = []
+        self.queued = bytearray()
+        self.recompute()
+
+    def _value(self, v):
+        '''Value of node `v` from the values of its in-neighbors'''
+        values = self.values
+        into = self.dag.into[v]
+        source = not into if self.sources is None else v in self.sources
+        if self.kind == 'count':
+            return source + sum(values[u] for u in into)
+        weights = (values[u] + w for u, w in into.items())
+        if self.kind == 'longest':
+            best = max(weights, default=-inf)
+            return max(best, 0) if source else best
+        best = min(weights, default=inf)
+        return min(best, 0) if source else best
+
+    def _grow(self):
+        '''Extend `values` to nodes added to the DAG since, computing their values in topological order'''
+        start = len(self.values)
+        if start == len(self.dag):
+            return
+        self.values.extend([None] * (len(self.dag) - start))
+        self.queued.extend(bytes(len(self.dag) - start))
+        for v in sorted(range(start, len(self.dag)), key=self.dag.position.__getitem__):
+            self.values[v] = self._value(v)
+
+    def recompute(self):
+        '''Recompute every value with one pass over the order'''
+        self._grow()
+        for v in self.dag.order:
+            self.values[v] = self._value(v)
+
+    def update(self, v):
+        '''Recompute the values of `v` and, as far as they change, of its descendants
+
+        Call after changing the in-edges of `v` through the `TopologicalOrder`
+        directly; `add_edge` and `remove_edge` do so themselves.
+        '''
+        self._grow()
+        values, position, out, queued = self.values, self.dag.position, self.dag.out, self.queued
+        order = self.dag.order
+        heap = [position[v]]
+        queued[v] = 1
+        while heap:
+            x = order[heappop(heap)]
+            queued[x] = 0
+            value = self._value(x)
+            if value == values[x]:
+                continue
+            values[x] = value
+            for y in out[x]:
+                if not queued[y]:
+                    queued[y] = 1
+                    heappush(heap, position[y])
+
+    def add_edge(self, u, v, w=1):
+        '''Add the edge \\(u \\to v\\) to the DAG and update the values below it'''
+        self.dag.add_edge(u, v, w)
+        self.update(v)
+
+    def remove_edge(self, u, v):
+        '''Remove the edge \\(u \\to v\\) from the DAG and update the values below it'''
+        self.dag.remove_edge(u, v)
+        self.update(v)
+
+    def path(self, v):
+        '''A path from a source to `v` achieving its longest or shortest path value, or `None` if unreachable'''
+        if self.kind == 'count':
+            raise ValueError('paths are only defined for longest and shortest values')
+        values, into = self.values, self.dag.into
+        if abs(values[v]) == inf:
+            return None
+        path = [v]
+        while True:
+            source = not into[v] if self.sources is None else v in self.sources
+            if source and values[v] == 0:
+                break
+            v = next(u for u, w in into[v].items() if values[u] + w == values[v])
+            path.append(v)
+        return path[::-1]
+
+    def __getitem__(self, v):
+        return self.values[v]
+
+if __name__ == '__main__':
+    from random import Random
+
+    # test topological_sort
+    adj = {'shirt': ['tie', 'belt'], 'tie': ['jacket'], 'pants': ['shoes', 'belt'], 'belt': ['jacket'], 'socks': ['shoes']}
+    order = topological_sort(adj)
+    assert all(order.index(u) < order.index(v) for u in adj for v in adj[u]), 'Failed test: topological_sort'
+    try:
+        topological_sort([[1], [2], [0]])
+        assert False, 'Failed test: topological_sort (cycle)'
+    except ValueError:
+        pass
+
+    # test TopologicalOrder
+    dag = TopologicalOrder(5)
+    dag.add_edges([(3, 1), (1, 0), (4, 3), (2, 4)])
+    assert list(dag) == [2, 4, 3, 1, 0], 'Failed test: TopologicalOrder'
+    try:
+        dag.add_edge(0, 2)
+        assert False, 'Failed test: TopologicalOrder (cycle)'
+    except ValueError:
+        pass
+    assert list(dag) == [2, 4, 3, 1, 0] and 2 not in dag.out[0], 'Failed test: TopologicalOrder (unchanged after cycle)'
+    u = dag.add_node()
+    dag.add_edge(u, 2)
+    assert dag.order[0] == u and sorted(dag.descendants(4)) == [0, 1, 3, 4], 'Failed test: TopologicalOrder.add_node'
+
+    # test TopologicalOrder against random insertions
+    rng = Random(5)
+    n = 300
+    dag = TopologicalOrder(n)
+    edges = set()
+    for _ in range(3000):
+        a, b = rng.randrange(n), rng.randrange(n)
+        try:
+            dag.add_edge(a, b)
+            edges.add((a, b))
+        except ValueError:
+            pass
+        assert len(dag.order) == n and sorted(dag.order) == list(range(n)), 'Failed test: TopologicalOrder (permutation)'
+    assert all(dag.position[a] < dag.position[b] for a, b in edges), 'Failed test: TopologicalOrder (random)'
+    batch = TopologicalOrder.from_edges(edges, n)
+    assert all(batch.position[a] < batch.position[b] for a, b in edges), 'Failed test: TopologicalOrder.from_edges'
+
+    # test PathDP
+    dag = TopologicalOrder(5)
+    longest, shortest, count = (PathDP(dag, kind, sources=[0]) for kind in PATH_DP_KINDS)
+    for a, b, w in [(0, 1, 2), (0, 2, 5), (1, 2, 1), (2, 3, 1), (1, 3, 7)]:
+        dag.add_edge(a, b, w)
+        for dp in (longest, shortest, count):
+            dp.update(b)
+    assert longest.values[:4] == [0, 2, 5, 9] and longest[4] == -inf, 'Failed test: PathDP (longest)'
+    assert shortest.values[:4] == [0, 2, 3, 4] and shortest[4] == inf, 'Failed test: PathDP (shortest)'
+    assert count.values == [1, 1, 2, 3, 0], 'Failed test: PathDP (count)'
+    assert longest.path(3) == [0, 1, 3] and shortest.path(3) == [0, 1, 2, 3] and longest.path(4) is None, 'Failed test: PathDP.path'
+    longest.add_edge(3, 4, 1)
+    count.update(4)
+    assert longest[4] == 10 and count[4] == 3, 'Failed test: PathDP.add_edge'
+    longest.remove_edge(1, 3)
+    assert longest[3] == 6 and longest[4] == 7, 'Failed test: PathDP.remove_edge'
+
+    # test PathDP with nodes added after it was built
+    dag = TopologicalOrder(3)
+    dp, fixed = PathDP(dag), PathDP(dag, 'shortest', sources=[0])
+    u = dag.add_node()
+    dp.add_edge(u, 1, 5)
+    fixed.update(1)
+    assert dp.values == [0, 5, 0, 0] and fixed.values == [0, inf, inf, inf], 'Failed test: PathDP (add_node)'
+
+    # test PathDP updates against recomputation
+    dag = TopologicalOrder(n)
+    dp = PathDP(dag, 'longest')
+    for _ in range(2000):
+        a, b = rng.randrange(n), rng.randrange(n)
+        try:
+            dp.add_edge(a, b, rng.randint(1, 9))
+        except ValueError:
+            pass
+    values = list(dp.values)
+    dp.recompute()
+    assert dp.values == values, 'Failed test: PathDP (incremental)'
+
+    print('Passed all tests.')
@@ -1,3 +1,211 @@
 '''
 Utilities for doing a depth-first search (DFS) on a graph.
-'''
\ No newline at end of file
+
+Graphs are adjacency lists or dictionaries, or `CSRGraph`s (see
+`csr.as_csr`). Every search keeps an explicit stack, plus a cursor into each
+node's out-edges, instead of recursing, so the depth of the graph is not
+bounded by Python's recursion limit.
+'''
+
+from array import array
+
+from .csr import as_csr
+
+def _dfs(graph, sources):
+    '''Generator of `(u, True)` when the search enters integer node `u` and `(u, False)` when it leaves it'''
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    cursor = array('q', offsets[:n])
+    visited = bytearray(n)
+    for s in sources:
+        if visited[s]:
+            continue
+        visited[s] = 1
+        yield s, True
+        stack = [s]
+        while stack:
+            u = stack[-1]
+            i = cursor[u]
+            end = offsets[u + 1]
+            while i < end and visited[targets[i]]:
+                i += 1
+            if i < end:
+                cursor[u] = i + 1
+                v = targets[i]
+                visited[v] = 1
+                yield v, True
+                stack.append(v)
+            else:
+                cursor[u] = end
+                stack.pop()
+                yield u, False
+
+def _sources(graph, sources):
+    '''Integer start nodes: those of `sources`, or every node if `None`'''
+    return range(len(graph)) if sources is None else (graph.node_id(s) for s in sources)
+
+def preorder(graph, sources=None):
+    '''Generator over the nodes of `graph` in DFS preorder (as they are first reached)
+
+    Input:
+
+     - `graph`: adjacency list or dictionary, or `CSRGraph`
+     - `sources`: nodes to search from, in turn. Defaults to every node, giving a DFS forest
+    '''
+    graph = as_csr(graph)
+    for u, entering in _dfs(graph, _sources(graph, sources)):
+        if entering:
+            yield graph.label(u)
+
+def postorder(graph, sources=None):
+    '''Generator over the nodes of `graph` in DFS postorder (once all their descendants are done)
+
+    Input: as for `preorder`
+    '''
+    graph = as_csr(graph)
+    for u, entering in _dfs(graph, _sources(graph, sources)):
+        if not entering:
+            yield graph.label(u)
+
+def strongly_connected_components(graph):
+    '''Strongly connected components of the directed graph `graph` by Tarjan's algorithm
+
+    Output: list of components (lists of nodes), in reverse topological order of the condensation
+    '''
+    graph = as_csr(graph)
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    cursor = array('q', offsets[:n])
+    index = array('q', [-1]) * n
+    low = array('q', bytes(8 * n))
+    on_stack = bytearray(n)
+    stack = []
+    components = []
+    counter = 0
+    for s in range(n):
+        if index[s] >= 0:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        on_stack[s] = 1
+        calls = [s]
+        while calls:
+            u = calls[-1]
+            i = cursor[u]
+            if i < offsets[u + 1]:
+                cursor[u] = i + 1
+                v = targets[i]
+                if index[v] < 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = 1
+                    calls.append(v)
+                elif on_stack[v] and index[v] < low[u]:
+                    low[u] = index[v]
+                continue
+            calls.pop()
+            if calls and low[u] < low[calls[-1]]:
+                low[calls[-1]] = low[u]
+            if low[u] == index[u]:
+                component = []
+                while True:
+                    v = stack.pop()
+                    on_stack[v] = 0
+                    component.append(graph.label(v))
+                    if v == u:
+                        break
+                components.append(component)
+    return components
+
+def articulation_points(graph):
+    '''Nodes of the undirected graph `graph` whose removal disconnects their component
+
+    Input:
+
+     - `graph`: adjacency list or dictionary, or `CSRGraph`, listing every edge in both directions
+
+    Output: list of nodes, in DFS preorder
+    '''
+    graph = as_csr(graph)
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    cursor = array('q', offsets[:n])
+    index = array('q', [-1]) * n
+    low = array('q', bytes(8 * n))
+    parent = array('q', [-1]) * n
+    # whether the edge back to the parent has been skipped, so that parallel edges count
+    skipped = bytearray(n)
+    is_cut = bytearray(n)
+    counter = 0
+    for s in range(n):
+        if index[s] >= 0:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        children = 0
+        calls = [s]
+        while calls:
+            u = calls[-1]
+            i = cursor[u]
+            if i < offsets[u + 1]:
+                cursor[u] = i + 1
+                v = targets[i]
+                if index[v] < 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    parent[v] = u
+                    calls.append(v)
+                    if u == s:
+                        children += 1
+                elif v == parent[u] and not skipped[u]:
+                    skipped[u] = 1
+                elif index[v] < low[u]:
+                    low[u] = index[v]
+                continue
+            calls.pop()
+            p = parent[u]
+            if p >= 0:
+                if low[u] < low[p]:
+                    low[p] = low[u]
+                if p != s and low[u] >= index[p]:
+                    is_cut[p] = 1
+        if children > 1:
+            is_cut[s] = 1
+    cut = sorted((u for u in range(n) if is_cut[u]), key=index.__getitem__)
+    return [graph.label(u) for u in cut]
+
+if __name__ == '__main__':
+    from .csr import CSRGraph
+
+    # test preorder
+    adj = {'a': ['b', 'c'], 'b': ['d'], 'c': ['d'], 'd': [], 'e': ['a']}
+    assert list(preorder(adj, ['a'])) == ['a', 'b', 'd', 'c'], 'Failed test: preorder'
+    assert list(preorder(adj)) == ['a', 'b', 'd', 'c', 'e'], 'Failed test: preorder (forest)'
+
+    # test postorder
+    assert list(postorder(adj, ['a'])) == ['d', 'b', 'c', 'a'], 'Failed test: postorder'
+
+    # test strongly_connected_components
+    scc = [[1, 2], [2, 0], [0, 3], [3, 4], [4, 3], [5]]
+    assert [sorted(c) for c in strongly_connected_components(scc)] == [[3, 4], [0, 1, 2], [5]], 'Failed test: strongly_connected_components'
+
+    # test articulation_points
+    undirected = {
+        0: [1, 2], 1: [0, 2], 2: [0, 1, 3], 3: [2, 4, 5], 4: [3, 5], 5: [3, 4, 6], 6: [5]
+    }
+    assert articulation_points(undirected) == [2, 3, 5], 'Failed test: articulation_points'
+    assert articulation_points([[1, 1], [0, 0]]) == [], 'Failed test: articulation_points (parallel edges)'
+
+    # test a chain deeper than the recursion limit
+    n = 10 ** 6
+    chain = CSRGraph.from_edges(((i, i + 1) for i in range(n - 1)), n=n)
+    assert next(postorder(chain, [0])) == n - 1, 'Failed test: postorder (chain)'
+    assert len(strongly_connected_components(chain)) == n, 'Failed test: strongly_connected_components (chain)'
+    cycle = CSRGraph.from_edges(((i, (i + 1) % n) for i in range(n)), n=n)
+    assert len(strongly_connected_components(cycle)) == 1, 'Failed test: strongly_connected_components (cycle)'
+    path = CSRGraph.from_edges(((i, i + 1) for i in range(9999)), n=10 ** 4, directed=False)
+    assert len(articulation_points(path)) == 9998, 'Failed test: articulation_points (path)'
+
+    print('Passed all tests.')
@@ -1,3 +1,427 @@
 '''
 Utilities for determining the max flow through a graph.
-'''
\ No newline at end of file
+
+`FlowNetwork` keeps the residual graph in flat arrays: arc `e` and its
+reverse arc `e ^ 1` are stored next to each other, so pushing flow along an
+arc and updating its reverse is two array writes. The flow is kept between
+calls to `max_flow`, so after changing capacities with `set_capacity` the
+next call continues from the previous flow instead of starting from zero.
+'''
+
+from array import array
+from collections import deque
+from math import inf
+
+from .csr import as_csr
+
+MAX_FLOW_METHODS = ('dinic', 'push_relabel')
+'''Algorithms accepted by the `method` keyword of `FlowNetwork.max_flow`'''
+
+class FlowNetwork:
+    '''Flow network on the nodes `0..n-1`, with a residual graph in arrays
+
+    Input:
+
+     - `n`: number of nodes
+
+    Attributes:
+
+     - `head`: `head[u]` is the first arc out of `u`, or `-1`
+     - `next`: `next[e]` is the arc after `e` out of the same node, or `-1`
+     - `to`: `to[e]` is the head of arc `e`; its tail is `to[e ^ 1]`
+     - `capacity`: capacity of every arc (the capacity of a reverse arc is usually `0`)
+     - `residual`: residual capacity of every arc, so the flow on `e` is `capacity[e] - residual[e]`
+
+    Capacities are stored as `array('q')`, or `array('d')` once any capacity is a float.
+    '''
+
+    __slots__ = ('n', 'head', 'next', 'to', 'capacity', 'residual', 'source', 'sink')
+
+    def __init__(self, n):
+        if n < 0:
+            raise ValueError('expected n >= 0, got {}'.format(n))
+        self.n = n
+        self.head = array('q', [-1]) * n
+        self.next = array('q')
+        self.to = array('q')
+        self.capacity = array('q')
+        self.residual = array('q')
+        self.source = self.sink = None
+
+    @classmethod
+    def from_graph(cls, graph):
+        '''Network with an arc for every edge of `graph` (an adjacency list or dictionary, or a `CSRGraph`)
+
+        Edge weights are the capacities (`1` if unweighted). Nodes are the node ids of `csr.as_csr(graph)`.'''
+        graph = as_csr(graph)
+        network = cls(len(graph))
+        network.add_edges(graph.edges() if graph.weighted else ((u, v, 1) for u, v in graph.edges()))
+        return network
+
+    def _check_node(self, u):
+        if not 0 <= u < self.n:
+            raise IndexError('node {} out of range for {} nodes'.format(u, self.n))
+
+    def _append(self, u, v, capacity, reverse_capacity):
+        try:
+            pair = array(self.capacity.typecode, (capacity, reverse_capacity))
+        except TypeError:
+            # float capacities
+            pair = array('d', (capacity, reverse_capacity))
+            self.capacity = array('d', self.capacity)
+            self.residual = array('d', self.residual)
+        self.capacity.extend(pair)
+        self.residual.extend(pair)
+        e = len(self.to)
+        self.to.extend((v, u))
+        self.next.extend((self.head[u], self.head[v]))
+        self.head[u] = e
+        self.head[v] = e + 1
+        return e
+
+    def add_edge(self, u, v, capacity, reverse_capacity=0):
+        '''Add an arc from `u` to `v` with capacity `capacity` (and its reverse arc, with `reverse_capacity`); the arc id'''
+        self._check_node(u)
+        self._check_node(v)
+        if capacity < 0 or reverse_capacity < 0:
+            raise ValueError('expected nonnegative capacities, got {} and {}'.format(capacity, reverse_capacity))
+        return self._append(u, v, capacity, reverse_capacity)
+
+    def add_edges(self, edges):
+        '''Add an arc for every `(u, v, capacity)` in the iterable `edges`; the list of arc ids'''
+        add_edge = self.add_edge
+        return [add_edge(u, v, c) for u, v, c in edges]
+
+    def arcs(self, u):
+        '''Iterator over the ids of the arcs out of `u` (including reverse arcs)'''
+        nxt = self.next
+        e = self.head[u]
+        while e != -1:
+            yield e
+            e = nxt[e]
+
+    def flow(self, e):
+        '''Flow on arc `e`'''
+        return self.capacity[e] - self.residual[e]
+
+    def flows(self):
+        '''List of the flow on every arc added with `add_edge`, in order'''
+        return [c - r for c, r in zip(self.capacity[::2], self.residual[::2])]
+
+    def value(self, s):
+        '''Net flow out of node `s`'''
+        capacity, residual = self.capacity, self.residual
+        return sum(capacity[e] - residual[e] for e in self.arcs(s))
+
+    def reset(self):
+        '''Remove all flow'''
+        self.residual = array(self.capacity.typecode, self.capacity)
+        self.source = self.sink = None
+
+    def set_capacity(self, e, capacity):
+        '''Change the capacity of arc `e`, keeping as much of the current flow as possible
+
+        If the new capacity is below the flow on `e`, the surplus is rerouted
+        from the tail of `e` to its head, or else cancelled back to the last
+        source or sink, so the flow stays valid; the next `max_flow` call
+        then continues from it.'''
+        if capacity < 0:
+            raise ValueError('expected a nonnegative capacity, got {}'.format(capacity))
+        old = self.capacity[e]
+        try:
+            self.capacity[e] = capacity
+        except TypeError:
+            self.capacity = array('d', self.capacity)
+            self.residual = array('d', self.residual)
+            self.capacity[e] = capacity
+        surplus = (old - self.residual[e]) - capacity
+        self.residual[e] += capacity - old
+        if surplus <= 0:
+            return
+        # cancel the surplus flow on e, then remove it from the rest of the network
+        self.residual[e] += surplus
+        self.residual[e ^ 1] -= surplus
+        u, v = self.to[e ^ 1], self.to[e]
+        terminals = (self.source, self.sink)
+        if self.source is None:
+            raise ValueError('capacity below the current flow, but no previous max_flow to repair')
+        if u in terminals or v in terminals:
+            left = surplus
+        else:
+            # flow on cycles through e goes around them instead
+            left = surplus - self._dinic(u, v, surplus)
+        if u not in terminals:
+            self._reroute(left, lambda terminal, limit: self._dinic(u, terminal, limit))
+        if v not in terminals:
+            self._reroute(left, lambda terminal, limit: self._dinic(terminal, v, limit))
+
+    def _reroute(self, amount, push):
+        '''Call `push(terminal, limit)` with the source and sink until `amount` has been pushed'''
+        while amount > 0:
+            pushed = 0
+            for terminal in (self.source, self.sink):
+                if pushed < amount:
+                    pushed += push(terminal, amount - pushed)
+            if not pushed:
+                break
+            amount -= pushed
+
+    def max_flow(self, s, t, method='dinic'):
+        '''Maximize the flow from `s` to `t`, starting from the current flow; the flow value
+
+        Input:
+
+         - `s`: source node
+         - `t`: sink node
+         - `method`: one of `MAX_FLOW_METHODS`. `'dinic'` augments along blocking
+           flows of BFS level graphs; `'push_relabel'` is highest-label
+           push-relabel with the gap and global relabeling heuristics
+
+        Output: the net flow out of `s`
+        '''
+        self._check_node(s)
+        self._check_node(t)
+        if s == t:
+            raise ValueError('source and sink must differ')
+        if method not in MAX_FLOW_METHODS:
+            raise ValueError('unknown method {!r}, expected one of {}'.format(method, MAX_FLOW_METHODS))
+        if (self.source, self.sink) not in ((s, t), (None, None)):
+            self.reset()
+        self.source, self.sink = s, t
+        if method == 'dinic':
+            self._dinic(s, t)
+        else:
+            self._push_relabel(s, t)
+        return self.value(s)
+
+    def _levels(self, s, t):
+        '''BFS distances from `s` along arcs with residual capacity, stopping at the level of `t`'''
+        head, nxt, to, residual = self.head, self.next, self.to, self.residual
+        level = array('q', [-1]) * self.n
+        level[s] = 0
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            if u == t:
+                break
+            e = head[u]
+            while e != -1:
+                v = to[e]
+                if residual[e] > 0 and level[v] < 0:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+                e = nxt[e]
+        return level
+
+    def _dinic(self, s, t, limit=inf):
+        '''Dinic's algorithm: push up to `limit` more flow from `s` to `t`; the amount pushed'''
+        head, nxt, to = self.head, self.next, self.to
+        residual = self.residual
+        total = 0
+        while total < limit:
+            level = self._levels(s, t)
+            if level[t] < 0:
+                break
+            current = array('q', head)
+            path = []
+            u = s
+            while total < limit:
+                if u == t:
+                    f = min(limit - total, min(residual[e] for e in path))
+                    for e in path:
+                        residual[e] -= f
+                        residual[e ^ 1] += f
+                    total += f
+                    # resume from the tail of the first saturated arc
+                    for i, e in enumerate(path):
+                        if residual[e] == 0:
+                            del path[i:]
+                            u = to[e ^ 1]
+                            break
+                    continue
+                # advance along the current arc of u, skipping arcs outside the level graph
+                e = current[u]
+                next_level = level[u] + 1
+                while e != -1 and (residual[e] <= 0 or level[to[e]] != next_level):
+                    e = nxt[e]
+                current[u] = e
+                if e != -1:
+                    path.append(e)
+                    u = to[e]
+                    continue
+                # dead end: drop u from the level graph and retreat
+                level[u] = -1
+                if not path:
+                    break
+                e = path.pop()
+                u = to[e ^ 1]
+                current[u] = nxt[e]
+        return total
+
+    def _push_relabel(self, s, t):
+        '''Highest-label push-relabel from `s` to `t`, with the gap and global relabeling heuristics'''
+        n = self.n
+        head, nxt, to, residual = self.head, self.next, self.to, self.residual
+        height = [0] * n
+        excess = [0] * n
+        count = [0] * (2 * n + 1)
+        buckets = [[] for _ in range(2 * n + 1)]
+        current = array('q', head)
+
+        def global_relabel():
+            '''Exact heights: distance to `t`, or `n` plus the distance to `s`, in the residual graph'''
+            for u in range(n):
+                height[u] = 2 * n
+            for root, base in ((t, 0), (s, n)):
+                height[root] = base
+                queue = deque([root])
+                while queue:
+                    v = queue.popleft()
+                    e = head[v]
+                    while e != -1:
+                        u = to[e]
+                        if residual[e ^ 1] > 0 and height[u] == 2 * n:
+                            height[u] = height[v] + 1
+                            queue.append(u)
+                        e = nxt[e]
+            for h in range(2 * n + 1):
+                count[h] = 0
+                buckets[h].clear()
+            for u in range(n):
+                count[height[u]] += 1
+                current[u] = head[u]
+                if excess[u] > 0 and u != s and u != t:
+                    buckets[height[u]].append(u)
+
+        e = head[s]
+        while e != -1:
+            f = residual[e]
+            if f > 0:
+                residual[e] = 0
+                residual[e ^ 1] += f
+                excess[to[e]] += f
+                excess[s] -= f
+            e = nxt[e]
+        global_relabel()
+        top = 2 * n
+        work = 0
+        while top >= 0:
+            if not buckets[top]:
+                top -= 1
+                continue
+            u = buckets[top].pop()
+            if height[u] != top or excess[u] <= 0:
+                continue
+            # discharge u
+            while excess[u] > 0:
+                e = current[u]
+                if e == -1:
+                    # relabel
+                    old = height[u]
+                    new = 2 * n
+                    e = head[u]
+                    while e != -1:
+                        if residual[e] > 0 and height[to[e]] + 1 < new:
+                            new = height[to[e]] + 1
+                        e = nxt[e]
+                    count[old] -= 1
+                    current[u] = head[u]
+                    work += 1
+                    if count[old] == 0 and old < n:
+                        # gap: nodes above it can no longer reach t
+                        for v in range(n):
+                            if old < height[v] < n:
+                                count[height[v]] -= 1
+                                height[v] = n + 1
+                                count[n + 1] += 1
+                                if excess[v] > 0 and v != s and v != t:
+                                    buckets[n + 1].append(v)
+                        new = max(new, n + 1)
+                    height[u] = new
+                    count[new] += 1
+                    if new >= 2 * n:
+                        break
+                    continue
+                v = to[e]
+                if residual[e] > 0 and height[u] == height[v] + 1:
+                    f = min(excess[u], residual[e])
+                    residual[e] -= f
+                    residual[e ^ 1] += f
+                    excess[u] -= f
+                    if excess[v] == 0 and v != s and v != t:
+                        buckets[height[v]].append(v)
+                    excess[v] += f
+                else:
+                    current[u] = nxt[e]
+            if excess[u] > 0 and height[u] < 2 * n:
+                buckets[height[u]].append(u)
+            # nodes activated while discharging u (or lifted by a gap) are below its new height
+            top = max(top, min(height[u], 2 * n))
+            if work >= n:
+                work = 0
+                global_relabel()
+                top = 2 * n
+
+    def min_cut(self, s=None):
+        '''Minimum cut after `max_flow`
+
+        Output:
+
+         - `side`: `bytearray` with `side[u] == 1` for the nodes on the source side
+         - `edges`: ids of the arcs (added with `add_edge`) from the source side to the other side, which are saturated
+        '''
+        s = self.source if s is None else s
+        if s is None:
+            raise ValueError('no source given and no previous max_flow')
+        head, nxt, to, residual = self.head, self.next, self.to, self.residual
+        side = bytearray(self.n)
+        side[s] = 1
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            e = head[u]
+            while e != -1:
+                v = to[e]
+                if residual[e] > 0 and not side[v]:
+                    side[v] = 1
+                    queue.append(v)
+                e = nxt[e]
+        edges = [e for e in range(0, len(to), 2) if side[to[e ^ 1]] and not side[to[e]]]
+        return side, edges
+
+if __name__ == '__main__':
+    # CLRS flow network, max flow 23
+    edges = [(0, 1, 16), (0, 2, 13), (1, 3, 12), (2, 1, 4), (2, 4, 14), (3, 2, 9), (3, 5, 20), (4, 3, 7), (4, 5, 4)]
+
+    # test max_flow
+    for method in MAX_FLOW_METHODS:
+        network = FlowNetwork(6)
+        ids = network.add_edges(edges)
+        assert network.max_flow(0, 5, method) == 23, 'Failed test: max_flow ({})'.format(method)
+        flows = network.flows()
+        assert all(0 <= f <= c for f, (_, _, c) in zip(flows, edges)), 'Failed test: flows ({})'.format(method)
+        assert all(network.value(u) == 0 for u in range(1, 5)), 'Failed test: flow conservation ({})'.format(method)
+
+        # test min_cut
+        side, cut = network.min_cut()
+        assert sum(edges[e // 2][2] for e in cut) == 23 and side[0] and not side[5], 'Failed test: min_cut ({})'.format(method)
+
+        # test set_capacity
+        network.set_capacity(ids[8], 10)
+        assert network.max_flow(0, 5, method) == 25, 'Failed test: set_capacity (increase, {})'.format(method)
+        network.set_capacity(ids[1], 2)
+        assert network.max_flow(0, 5, method) == 14, 'Failed test: set_capacity (decrease, {})'.format(method)
+        assert all(network.value(u) == 0 for u in range(1, 5)), 'Failed test: set_capacity (conservation, {})'.format(method)
+
+    # test from_graph
+    network = FlowNetwork.from_graph({0: {1: 2.5, 2: 1}, 1: {3: 1}, 2: {3: 4}, 3: {}})
+    assert network.max_flow(0, 3) == 2 and network.capacity.typecode == 'd', 'Failed test: from_graph'
+
+    # test a float reverse capacity after integer arcs
+    network = FlowNetwork(3)
+    network.add_edge(0, 1, 1, 0.5)
+    e = network.add_edge(1, 2, 3)
+    assert list(network.capacity) == list(network.residual) == [1, 0.5, 3, 0], 'Failed test: add_edge (float reverse capacity)'
+    assert network.max_flow(0, 2) == 1 and network.flow(e) == 1, 'Failed test: max_flow (float reverse capacity)'
+
+    print('Passed all tests.')
@@ -1,3 +1,438 @@
 '''
 Utilities for determining the min cost flow of a graph.
-'''
\ No newline at end of file
+
+`MinCostFlow` stores the residual graph like `max_flow.FlowNetwork`, with
+arc `e` and its reverse arc `e ^ 1` side by side in flat arrays, plus the
+cost of every arc (the reverse arc costs the negation). `hungarian` solves
+the dense assignment problem directly.
+'''
+
+from array import array
+from collections import deque
+from heapq import heappush, heappop
+from math import inf
+
+from .csr import as_csr
+
+MIN_COST_FLOW_METHODS = ('ssp', 'cost_scaling')
+'''Algorithms accepted by the `method` keyword of `MinCostFlow.solve`'''
+
+COST_SCALING_FACTOR = 8
+'''Factor by which `'cost_scaling'` divides \\(\\varepsilon\\) between refinements'''
+
+class MinCostFlow:
+    '''Min cost flow network on the nodes `0..n-1`, with a residual graph in arrays
+
+    Input:
+
+     - `n`: number of nodes
+
+    Attributes as for `max_flow.FlowNetwork`, plus:
+
+     - `cost`: cost per unit of flow of every arc (the reverse arc of `e` costs `-cost[e]`)
+
+    Capacities and costs are stored as `array('q')`, or `array('d')` once any of them is a float.
+    '''
+
+    __slots__ = ('n', 'head', 'next', 'to', 'capacity', 'residual', 'cost')
+
+    def __init__(self, n):
+        if n < 0:
+            raise ValueError('expected n >= 0, got {}'.format(n))
+        self.n = n
+        self.head = array('q', [-1]) * n
+        self.next = array('q')
+        self.to = array('q')
+        self.capacity = array('q')
+        self.residual = array('q')
+        self.cost = array('q')
+
+    @classmethod
+    def from_graph(cls, graph, capacity=1):
+        '''Network with an arc of capacity `capacity` for every edge of `graph` (an adjacency list or dictionary, or a `CSRGraph`)
+
+        Edge weights are the costs (`0` if unweighted). Nodes are the node ids of `csr.as_csr(graph)`.'''
+        graph = as_csr(graph)
+        network = cls(len(graph))
+        network.add_edges((u, v, capacity, w[0] if w else 0) for u, v, *w in graph.edges())
+        return network
+
+    def add_edge(self, u, v, capacity, cost):
+        '''Add an arc from `u` to `v` with capacity `capacity` and cost `cost` per unit of flow; the arc id'''
+        return self.add_edges([(u, v, capacity, cost)])[0]
+
+    def add_edges(self, edges):
+        '''Add an arc for every `(u, v, capacity, cost)` in the iterable `edges`; the list of arc ids
+
+        The arcs are buffered and appended to the arrays in one step.'''
+        n = self.n
+        get = self.head.__getitem__
+        # new heads of the touched nodes, only stored once the whole batch is valid
+        head = {}
+        start = e = len(self.to)
+        to, nxt, capacity, cost = [], [], [], []
+        for u, v, c, w in edges:
+            if not (0 <= u < n and 0 <= v < n):
+                raise IndexError('arc ({}, {}) out of range for {} nodes'.format(u, v, n))
+            if c < 0:
+                raise ValueError('expected a nonnegative capacity, got {}'.format(c))
+            to += (v, u)
+            nxt += (head[u] if u in head else get(u), head[v] if v in head else get(v))
+            head[u] = e
+            head[v] = e + 1
+            capacity += (c, 0)
+            cost += (w, -w)
+            e += 2
+        columns = []
+        for name, values in (('capacity', capacity), ('residual', capacity), ('cost', cost)):
+            typecode = getattr(self, name).typecode
+            try:
+                columns.append((name, array(typecode, values)))
+            except TypeError:
+                # float capacities or costs
+                columns.append((name, array('d', values)))
+        for name, values in columns:
+            if values.typecode != getattr(self, name).typecode:
+                setattr(self, name, array('d', getattr(self, name)))
+            getattr(self, name).extend(values)
+        self.to.extend(to)
+        self.next.extend(nxt)
+        for u, first in head.items():
+            self.head[u] = first
+        return list(range(start, e, 2))
+
+    def flow(self, e):
+        '''Flow on arc `e`'''
+        return self.capacity[e] - self.residual[e]
+
+    def flows(self):
+        '''List of the flow on every arc added with `add_edge` or `add_edges`, in order'''
+        return [c - r for c, r in zip(self.capacity[::2], self.residual[::2])]
+
+    def total_cost(self):
+        '''Total cost of the current flow'''
+        return sum((c - r) * w for c, r, w in zip(self.capacity[::2], self.residual[::2], self.cost[::2]))
+
+    def reset(self):
+        '''Remove all flow'''
+        self.residual = array(self.capacity.typecode, self.capacity)
+
+    def solve(self, s, t, max_flow=inf, method='ssp'):
+        '''Send as much flow as possible (at most `max_flow`) from `s` to `t`, at minimum cost
+
+        Input:
+
+         - `s`: source node
+         - `t`: sink node
+         - `max_flow`: upper bound on the flow. Defaults to no bound
+         - `method`: one of `MIN_COST_FLOW_METHODS`. `'ssp'` (successive shortest
+           paths) runs one Dijkstra per augmentation, on costs reduced by
+           Johnson potentials, so its time grows with the number of
+           augmenting paths. `'cost_scaling'` (Goldberg-Tarjan) needs integer
+           costs and takes \\(O(\\log(nC))\\) refinements for maximum cost \\(C\\),
+           regardless of the flow value; it also cancels negative cost cycles
+
+        Output:
+
+         - `flow`: the flow value
+         - `cost`: its total cost
+
+        `flows()` gives the flow on every arc. With `'ssp'`, negative costs are
+        allowed but negative cost cycles raise `ValueError`.
+        '''
+        if not (0 <= s < self.n and 0 <= t < self.n) or s == t:
+            raise ValueError('expected distinct source and sink nodes, got {} and {}'.format(s, t))
+        if method not in MIN_COST_FLOW_METHODS:
+            raise ValueError('unknown method {!r}, expected one of {}'.format(method, MIN_COST_FLOW_METHODS))
+        self.reset()
+        if method == 'ssp':
+            flow = self._ssp(s, t, max_flow)
+        else:
+            flow = self._cost_scaling(s, t, max_flow)
+        return flow, self.total_cost()
+
+    def _potentials(self, s):
+        '''Shortest distances from `s` over arcs with residual capacity (`0` if unreachable), by Bellman-Ford (SPFA)'''
+        n = self.n
+        head, nxt, to, residual, cost = self.head, self.next, self.to, self.residual, self.cost
+        if min(cost[::2], default=0) >= 0:
+            return [0] * n
+        dist = [inf] * n
+        dist[s] = 0
+        queued = bytearray(n)
+        relaxed = [0] * n
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            queued[u] = 0
+            relaxed[u] += 1
+            if relaxed[u] > n:
+                raise ValueError('negative cost cycle detected')
+            du = dist[u]
+            e = head[u]
+            while e != -1:
+                if residual[e] > 0:
+                    v = to[e]
+                    if du + cost[e] < dist[v]:
+                        dist[v] = du + cost[e]
+                        if not queued[v]:
+                            queued[v] = 1
+                            queue.append(v)
+                e = nxt[e]
+        return [0 if d == inf else d for d in dist]
+
+    def _ssp(self, s, t, limit):
+        '''Successive shortest paths with Dijkstra on reduced costs; the flow value'''
+        n = self.n
+        head, nxt, to, residual, cost = self.head, self.next, self.to, self.residual, self.cost
+        potential = self._potentials(s)
+        flow = 0
+        while flow < limit:
+            dist = [inf] * n
+            dist[s] = 0
+            prev = array('q', [-1]) * n
+            done = bytearray(n)
+            heap = [(0, s)]
+            while heap:
+                d, u = heappop(heap)
+                if done[u]:
+                    continue
+                done[u] = 1
+                if u == t:
+                    break
+                pu = potential[u]
+                e = head[u]
+                while e != -1:
+                    if residual[e] > 0:
+                        v = to[e]
+                        nd = d + cost[e] + pu - potential[v]
+                        if nd < dist[v]:
+                            dist[v] = nd
+                            prev[v] = e
+                            heappush(heap, (nd, v))
+                    e = nxt[e]
+            if not done[t]:
+                break
+            # keep reduced costs nonnegative; nodes not settled are at least as far as t
+            dt = dist[t]
+            for v in range(n):
+                potential[v] += dist[v] if done[v] else dt
+            f = limit - flow
+            v = t
+            while v != s:
+                e = prev[v]
+                f = min(f, residual[e])
+                v = to[e ^ 1]
+            v = t
+            while v != s:
+                e = prev[v]
+                residual[e] -= f
+                residual[e ^ 1] += f
+                v = to[e ^ 1]
+            flow += f
+        return flow
+
+    def _cost_scaling(self, s, t, limit):
+        '''Goldberg-Tarjan cost scaling on the circulation closed by an arc from `t` to `s`; the flow value'''
+        if self.cost.typecode != 'q':
+            raise ValueError('cost scaling needs integer costs')
+        n = self.n
+        if limit == inf:
+            limit = sum(self.capacity[e] for e in range(0, len(self.to), 2) if self.to[e ^ 1] == s)
+        # an arc from t back to s, cheap enough that every s-t path on it is a negative cycle
+        big = n * max(map(abs, self.cost), default=0) + 1
+        closing = self.add_edge(t, s, limit, -big)
+        try:
+            head, nxt, to, residual = self.head, self.next, self.to, self.residual
+            # with costs multiplied by n + 1, an epsilon-optimal flow for epsilon = 1 is optimal
+            cost = array('q', (c * (n + 1) for c in self.cost))
+            potential = [0] * n
+            excess = [0] * n
+            eps = max(map(abs, cost), default=1)
+            while eps > 1:
+                eps = max(1, eps // COST_SCALING_FACTOR)
+                # saturate every arc with negative reduced cost
+                for u in range(n):
+                    pu = potential[u]
+                    e = head[u]
+                    while e != -1:
+                        r = residual[e]
+                        if r > 0 and cost[e] + pu - potential[to[e]] < 0:
+                            residual[e] = 0
+                            residual[e ^ 1] += r
+                            excess[u] -= r
+                            excess[to[e]] += r
+                        e = nxt[e]
+                active = deque(u for u in range(n) if excess[u] > 0)
+                current = array('q', head)
+                while active:
+                    u = active.popleft()
+                    while excess[u] > 0:
+                        e = current[u]
+                        if e == -1:
+                            # relabel: lower the potential of u until an arc becomes admissible
+                            best = -inf
+                            e = head[u]
+                            while e != -1:
+                                if residual[e] > 0 and potential[to[e]] - cost[e] > best:
+                                    best = potential[to[e]] - cost[e]
+                                e = nxt[e]
+                            potential[u] = best - eps
+                            current[u] = head[u]
+                            continue
+                        v = to[e]
+                        if residual[e] > 0 and cost[e] + potential[u] - potential[v] < 0:
+                            f = min(excess[u], residual[e])
+                            residual[e] -= f
+                            residual[e ^ 1] += f
+                            excess[u] -= f
+                            if excess[v] <= 0 < excess[v] + f:
+                                active.append(v)
+                            excess[v] += f
+                        else:
+                            current[u] = nxt[e]
+            flow = self.capacity[closing] - self.residual[closing]
+        finally:
+            self.head[t] = self.next[closing]
+            self.head[s] = self.next[closing + 1]
+            for data in (self.to, self.next, self.capacity, self.residual, self.cost):
+                del data[closing:]
+        return flow
+
+def hungarian(cost):
+    '''Minimum cost assignment of rows to columns of the matrix `cost` by the Hungarian algorithm
+
+    Takes \\(O(n^2 m)\\) for an \\(n\\times m\\) matrix with \\(n \\le m\\), using
+    row and column potentials.
+
+    Input:
+
+     - `cost`: \\(n\\times m\\) matrix (nested lists)
+
+    Output:
+
+     - `total`: the minimum total cost
+     - `assignment`: list with the column assigned to every row (`None` for unassigned rows if \\(n > m\\))
+    '''
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    if any(len(row) != m for row in cost):
+        raise ValueError('expected a rectangular matrix')
+    if n > m:
+        total, columns = hungarian([list(col) for col in zip(*cost)])
+        assignment = [None] * n
+        for j, i in enumerate(columns):
+            assignment[i] = j
+        return total, assignment
+    # potentials u (rows) and v (columns); p[j] is the row assigned to column j, 1-indexed with 0 as a sentinel
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return sum(cost[i][j] for i, j in enumerate(assignment)), assignment
+
+if __name__ == '__main__':
+    # test solve
+    edges = [(0, 1, 4, 1), (0, 2, 2, 5), (1, 2, 2, 1), (1, 3, 2, 6), (2, 3, 5, 2)]
+    for method in MIN_COST_FLOW_METHODS:
+        network = MinCostFlow(4)
+        ids = network.add_edges(edges)
+        assert network.solve(0, 3, method=method) == (6, 36), 'Failed test: solve ({})'.format(method)
+        assert network.flows() == [4, 2, 2, 2, 4] and network.flow(ids[3]) == 2, 'Failed test: flows ({})'.format(method)
+        assert network.solve(0, 3, max_flow=3, method=method) == (3, 15), 'Failed test: solve (max_flow, {})'.format(method)
+
+    # test negative costs
+    network = MinCostFlow(3)
+    network.add_edges([(0, 1, 1, -2), (1, 2, 1, 1), (0, 2, 1, 0)])
+    assert network.solve(0, 2) == (2, -1), 'Failed test: solve (negative costs)'
+    network = MinCostFlow(4)
+    network.add_edges([(0, 1, 1, 0), (1, 3, 1, 0), (1, 2, 1, 1), (2, 1, 1, -5)])
+    try:
+        network.solve(0, 3)
+        assert False, 'Failed test: solve (negative cycle)'
+    except ValueError:
+        pass
+    # cost scaling also saturates the negative cycle 1 -> 2 -> 1
+    assert network.solve(0, 3, method='cost_scaling') == (1, -4), 'Failed test: solve (cost_scaling, negative cycle)'
+
+    # test from_graph
+    network = MinCostFlow.from_graph({'s': {'a': 1, 'b': 3}, 'a': {'t': 1}, 'b': {'t': 1}, 't': {}})
+    assert network.solve(0, 3) == (2, 6), 'Failed test: from_graph'
+
+    # test mixed integer and float arcs
+    network = MinCostFlow(3)
+    network.add_edges([(0, 1, 1, 1), (1, 2, 2, 1.5)])
+    network.add_edge(0, 2, 0.5, 4)
+    assert len(network.cost) == len(network.capacity) == len(network.to) == 6, 'Failed test: add_edges (mixed types)'
+    assert network.solve(0, 2) == (1.5, 4.5) and network.flows() == [1, 1, 0.5], 'Failed test: solve (mixed types)'
+
+    # test a failed batch leaves the network unchanged
+    network = MinCostFlow(3)
+    for bad in ([(0, 1, 1, 1), (0, 9, 1, 1)], [(0, 1, 1, 1), (1, 2, -1, 1)]):
+        try:
+            network.add_edges(bad)
+            assert False, 'Failed test: add_edges (invalid)'
+        except (IndexError, ValueError):
+            pass
+    assert list(network.head) == [-1] * 3 and len(network.to) == 0, 'Failed test: add_edges (invalid, unchanged)'
+    network.add_edges([(0, 1, 1, 1), (1, 2, 1, 1)])
+    assert network.solve(0, 2) == (1, 2), 'Failed test: solve (after invalid batch)'
+
+    # test hungarian
+    C = [
+        [4, 1, 3],
+        [2, 0, 5],
+        [3, 2, 2]
+    ]
+    assert hungarian(C) == (5, [1, 0, 2]), 'Failed test: hungarian'
+    assert hungarian([[1, 9], [9, 1], [5, 5]]) == (2, [0, 1, None]), 'Failed test: hungarian (rectangular)'
+
+    # test hungarian against solve
+    from random import Random
+    rng = Random(0)
+    n = 12
+    C = [[rng.randint(0, 50) for _ in range(n)] for _ in range(n)]
+    network = MinCostFlow(2 * n + 2)
+    network.add_edges([(2 * n, i, 1, 0) for i in range(n)] + [(n + j, 2 * n + 1, 1, 0) for j in range(n)])
+    network.add_edges((i, n + j, 1, C[i][j]) for i in range(n) for j in range(n))
+    assert network.solve(2 * n, 2 * n + 1) == (n, hungarian(C)[0]), 'Failed test: hungarian (assignment flow)'
+
+    print('Passed all tests.')
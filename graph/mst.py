@@ -1,3 +1,301 @@
 '''
 Utilities for determining the minimum spanning tree of a graph.
-'''
\ No newline at end of file
+
+Every function returns a minimum spanning forest (one tree per connected
+component) as `(weight, edges)`, where `edges` is a list of `(u, v, w)`.
+Edges are undirected.
+'''
+
+import pickle
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappop, merge
+from itertools import islice
+from math import inf
+from multiprocessing import shared_memory
+from operator import itemgetter
+from tempfile import TemporaryFile
+
+from .connected_components import DisjointSet
+from .csr import CSRGraph, as_csr, _weight_array
+
+SORT_CHUNK_SIZE = 1 << 20
+'''Edges sorted in memory at a time by `kruskal`; larger inputs are sorted in runs spilled to temporary files'''
+
+SPILL_BLOCK_SIZE = 1 << 12
+'''Edges per pickled block in the temporary files of `kruskal`'''
+
+PARALLEL_MIN_EDGES = 1 << 16
+'''Edges below which `workers` is ignored and `boruvka` stays serial'''
+
+def _spill(edges):
+    '''Write `edges` to a temporary file in pickled blocks; an iterator reading them back'''
+    f = TemporaryFile()
+    for i in range(0, len(edges), SPILL_BLOCK_SIZE):
+        pickle.dump(edges[i:i + SPILL_BLOCK_SIZE], f, pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    def read():
+        with f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+    return read()
+
+def sorted_edges(edges, chunk_size=SORT_CHUNK_SIZE):
+    '''Iterator over the `(u, v, w)` edges of the iterable `edges` in order of weight
+
+    Sorts runs of `chunk_size` edges in memory, spills each run to a
+    temporary file, and merges the runs, so memory use is bounded by
+    `chunk_size` edges however long `edges` is. The sort is stable.'''
+    key = itemgetter(2)
+    edges = iter(edges)
+    runs = []
+    while True:
+        chunk = list(islice(edges, chunk_size))
+        chunk.sort(key=key)
+        if not runs and len(chunk) < chunk_size:
+            # fits in memory
+            return iter(chunk)
+        if not chunk:
+            break
+        runs.append(_spill(chunk))
+        del chunk
+    return merge(*runs, key=key)
+
+def kruskal(edges, n=None, presorted=False, chunk_size=SORT_CHUNK_SIZE):
+    '''Minimum spanning forest by Kruskal's algorithm
+
+    Input:
+
+     - `edges`: an iterable of `(u, v, w)`, consumed once
+     - `n`: if given, nodes are the integers `0..n-1` (see `connected_components.DisjointSet`),
+       and the search stops as soon as the forest spans them
+     - `presorted`: whether `edges` is already in order of weight, e.g. read
+       from a sorted file; otherwise they are sorted with `sorted_edges`
+     - `chunk_size`: passed to `sorted_edges`
+
+    Output: `(weight, edges)`
+    '''
+    if not presorted:
+        edges = sorted_edges(edges, chunk_size)
+    components = DisjointSet(n)
+    union = components.union
+    forest = []
+    total = 0
+    for u, v, w in edges:
+        if union(u, v):
+            forest.append((u, v, w))
+            total += w
+            if n is not None and len(forest) == n - 1:
+                break
+    return total, forest
+
+def prim(graph, root=None):
+    '''Minimum spanning forest by Prim's algorithm with a binary heap
+
+    Input:
+
+     - `graph`: an undirected graph as an adjacency list or dictionary of
+       dictionaries {`neighbor`: `weight`}, or a `CSRGraph` with every edge in both directions
+     - `root`: node to grow the first tree from. Defaults to the first node
+
+    Output: `(weight, edges)`
+    '''
+    graph = as_csr(graph)
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    weights = graph.weights if graph.weights is not None else array('q', [1]) * graph.m
+    seen = bytearray(n)
+    forest = []
+    total = 0
+    start = graph.node_id(root) if root is not None else 0
+    for r in [start] + list(range(n)):
+        if r >= n or seen[r]:
+            continue
+        seen[r] = 1
+        heap = [(weights[i], r, targets[i]) for i in range(offsets[r], offsets[r + 1])]
+        heap.sort()
+        while heap:
+            w, u, v = heappop(heap)
+            if seen[v]:
+                continue
+            seen[v] = 1
+            forest.append((graph.label(u), graph.label(v), w))
+            total += w
+            for i in range(offsets[v], offsets[v + 1]):
+                if not seen[targets[i]]:
+                    heappush(heap, (weights[i], v, targets[i]))
+    return total, forest
+
+def prim_dense(adj_mat):
+    '''Minimum spanning forest of the graph with symmetric weight matrix `adj_mat` (`inf` or `None` where there is no edge)
+
+    Takes \\(O(n^2)\\) without a heap, which is optimal for dense graphs.
+
+    Output: `(weight, edges)`
+    '''
+    n = len(adj_mat)
+    best = [inf] * n
+    parent = [-1] * n
+    seen = bytearray(n)
+    forest = []
+    total = 0
+    for _ in range(n):
+        # closest node outside the forest, or a new root
+        u = min((i for i in range(n) if not seen[i]), key=best.__getitem__)
+        seen[u] = 1
+        if parent[u] >= 0:
+            forest.append((parent[u], u, best[u]))
+            total += best[u]
+        for v, w in enumerate(adj_mat[u]):
+            if w is not None and not seen[v] and w < best[v]:
+                best[v] = w
+                parent[v] = u
+    return total, forest
+
+def _cheapest(us, vs, ws, comp, start, stop):
+    '''Cheapest edge (as `(weight, index)`) leaving each component, over the edges `start`..`stop-1`'''
+    best = {}
+    for i in range(start, stop):
+        cu = comp[us[i]]
+        cv = comp[vs[i]]
+        if cu == cv:
+            continue
+        w = ws[i]
+        for c in (cu, cv):
+            b = best.get(c)
+            if b is None or w < b[0] or (w == b[0] and i < b[1]):
+                best[c] = (w, i)
+    return best
+
+def _cheapest_block(names, typecode, n, m, start, stop):
+    '''Worker for `boruvka`: `_cheapest` over edges held in shared memory `names`'''
+    edges, labels = (shared_memory.SharedMemory(name=name) for name in names)
+    uv = edges.buf[:16 * m].cast('q')
+    ws = edges.buf[16 * m:24 * m].cast(typecode)
+    comp = labels.buf[:8 * n].cast('q')
+    try:
+        return _cheapest(uv[:m], uv[m:], ws, comp, start, stop)
+    finally:
+        for view in (uv, ws, comp):
+            view.release()
+        edges.close()
+        labels.close()
+
+def _merge_cheapest(best, other):
+    '''Fold the per-component results of one `_cheapest_block` into `best`'''
+    for c, b in other.items():
+        a = best.get(c)
+        if a is None or b < a:
+            best[c] = b
+
+def boruvka(edges, n, workers=None):
+    '''Minimum spanning forest by Boruvka's algorithm
+
+    Each round finds the cheapest edge leaving every component and adds them
+    all, at least halving the number of components, so there are at most
+    \\(\\log_2 n\\) rounds over the edges. Ties are broken by edge order.
+
+    Input:
+
+     - `edges`: an iterable of `(u, v, w)` on the nodes `0..n-1`, or an undirected `CSRGraph`.
+       Edges are read once into flat arrays (24 bytes per edge)
+     - `n`: number of nodes
+     - `workers`: if > 1, split the search for cheapest edges in each round
+       across this many processes, which read the edges and component labels
+       from shared memory (for at least `PARALLEL_MIN_EDGES` edges)
+
+    Output: `(weight, edges)`
+    '''
+    if isinstance(edges, CSRGraph):
+        edges = ((u, v, w[0] if w else 1) for u, v, *w in edges.edges() if u < v)
+    us, vs, ws = array('q'), array('q'), []
+    for u, v, w in edges:
+        us.append(u)
+        vs.append(v)
+        ws.append(w)
+    ws = _weight_array(ws)
+    m = len(us)
+    if m and not (0 <= min(min(us), min(vs)) and max(max(us), max(vs)) < n):
+        raise ValueError('edge endpoints must lie in 0..{}'.format(n - 1))
+    components = DisjointSet(n)
+    forest = []
+    total = 0
+    pool = segments = None
+    if workers is not None and workers > 1 and m >= PARALLEL_MIN_EDGES:
+        segments = [shared_memory.SharedMemory(create=True, size=24 * m), shared_memory.SharedMemory(create=True, size=max(8, 8 * n))]
+        segments[0].buf[:8 * m] = us.tobytes()
+        segments[0].buf[8 * m:16 * m] = vs.tobytes()
+        segments[0].buf[16 * m:24 * m] = ws.tobytes()
+        pool = ProcessPoolExecutor(workers)
+    try:
+        while True:
+            comp = array('q', components.find_many(range(n)))
+            if pool is not None:
+                segments[1].buf[:8 * n] = comp.tobytes()
+                step = -(-m // workers)
+                futures = [pool.submit(_cheapest_block, [s.name for s in segments], ws.typecode, n, m, i, min(i + step, m)) for i in range(0, m, step)]
+                best = {}
+                for future in futures:
+                    _merge_cheapest(best, future.result())
+            else:
+                best = _cheapest(us, vs, ws, comp, 0, m)
+            if not best:
+                break
+            for w, i in set(best.values()):
+                if components.union(us[i], vs[i]):
+                    forest.append((us[i], vs[i], w))
+                    total += w
+    finally:
+        if pool is not None:
+            pool.shutdown()
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+    return total, forest
+
+if __name__ == '__main__':
+    edges = [
+        ('a', 'b', 4), ('a', 'h', 8), ('b', 'c', 8), ('b', 'h', 11), ('c', 'd', 7),
+        ('c', 'f', 4), ('c', 'i', 2), ('d', 'e', 9), ('d', 'f', 14), ('e', 'f', 10),
+        ('f', 'g', 2), ('g', 'h', 1), ('g', 'i', 6), ('h', 'i', 7), ('x', 'y', 3)
+    ]
+    nodes = sorted({u for e in edges for u in e[:2]})
+    index = {u: i for i, u in enumerate(nodes)}
+    numbered = [(index[u], index[v], w) for u, v, w in edges]
+
+    # test kruskal
+    weight, forest = kruskal(edges)
+    assert weight == 40 and len(forest) == 9, 'Failed test: kruskal'
+    assert kruskal(iter(edges), chunk_size=4) == (weight, forest), 'Failed test: kruskal (external sort)'
+    assert kruskal(sorted(edges, key=itemgetter(2)), presorted=True)[0] == 40, 'Failed test: kruskal (presorted)'
+    assert list(sorted_edges(iter(edges), chunk_size=3)) == sorted(edges, key=itemgetter(2)), 'Failed test: sorted_edges'
+
+    # test prim
+    adjacency = {}
+    for u, v, w in edges:
+        adjacency.setdefault(u, {})[v] = w
+        adjacency.setdefault(v, {})[u] = w
+    weight, forest = prim(adjacency, root='a')
+    assert weight == 40 and len(forest) == 9 and forest[0][:2] == ('a', 'b'), 'Failed test: prim'
+    matrix = [[inf] * len(nodes) for _ in nodes]
+    for u, v, w in numbered:
+        matrix[u][v] = matrix[v][u] = w
+    assert prim_dense(matrix)[0] == 40 and len(prim_dense(matrix)[1]) == 9, 'Failed test: prim_dense'
+
+    # test boruvka
+    weight, forest = boruvka(numbered, len(nodes))
+    assert weight == 40 and len(forest) == 9, 'Failed test: boruvka'
+    assert boruvka(CSRGraph.from_edges(numbered, n=len(nodes), directed=False), len(nodes))[0] == 40, 'Failed test: boruvka (CSRGraph)'
+
+    # test boruvka with workers
+    from random import Random
+    rng = Random(0)
+    n = 5000
+    many = [(rng.randrange(n), rng.randrange(n), rng.randint(1, 1000)) for _ in range(PARALLEL_MIN_EDGES)]
+    assert boruvka(many, n, workers=2)[0] == boruvka(many, n)[0] == kruskal(many, n)[0], 'Failed test: boruvka (workers)'
+
+    print('Passed all tests.')
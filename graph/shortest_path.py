@@ -1,9 +1,587 @@
 '''
 Utilities for determining shortest paths through a graph.
+
+Graphs are adjacency lists or dictionaries mapping each node to a dictionary
+{`neighbor`: `weight`} (or to an iterable of `(neighbor, weight)` pairs), or
+`csr.CSRGraph`s, whose unweighted edges have weight 1. Edge weights must be
+nonnegative, except for `all_pairs_shortest_path`.
 '''
 
+from array import array
+from heapq import heappush, heappop
+from itertools import repeat
+from math import inf, log2
+from multiprocessing import Barrier, Process, shared_memory
+
+from .csr import CSRGraph, as_csr
+
+def _neighbors(graph):
+    '''Function \\(u \\mapsto\\) iterable of `(v, weight)` pairs, for a graph in any supported form'''
+    if isinstance(graph, CSRGraph):
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        if weights is None:
+            return lambda u: zip(targets[offsets[u]:offsets[u + 1]], repeat(1))
+        return lambda u: zip(targets[offsets[u]:offsets[u + 1]], weights[offsets[u]:offsets[u + 1]])
+    get = graph.get if isinstance(graph, dict) else lambda u, default: graph[u]
+    def neighbors(u):
+        edges = get(u, ())
+        return edges.items() if isinstance(edges, dict) else edges
+    return neighbors
+
+def _reverse(graph):
+    '''Graph with every edge of `graph` reversed, in the same form'''
+    if isinstance(graph, CSRGraph):
+        return graph.reverse()
+    neighbors = _neighbors(graph)
+    out = {}
+    for u in (graph if isinstance(graph, dict) else range(len(graph))):
+        for v, w in neighbors(u):
+            edges = out.setdefault(v, {})
+            edges[u] = min(w, edges.get(u, inf))
+    return out
+
+def _search(neighbors, a, b=None, heuristic=None):
+    '''Dijkstra (or, with `heuristic`, A*) from `a`, stopping once `b` is settled: dictionaries of distances and predecessors'''
+    dist = {a: 0}
+    prev = {a: None}
+    heap = [(heuristic(a) if heuristic else 0, 0, a)]
+    while heap:
+        _, d, u = heappop(heap)
+        if d > dist[u]:
+            # stale entry, superseded by a shorter distance
+            continue
+        if u == b:
+            break
+        for v, w in neighbors(u):
+            if w < 0:
+                raise ValueError('negative edge weight {} on edge ({}, {})'.format(w, u, v))
+            nd = d + w
+            if nd < dist.get(v, inf):
+                dist[v] = nd
+                prev[v] = u
+                heappush(heap, (nd + heuristic(v) if heuristic else nd, nd, v))
+    return dist, prev
+
+def reconstruct_path(prev, a, b):
+    '''Path from `a` to `b` given the predecessor `prev[v]` of every reached node `v`, or `[]` if `b` was not reached'''
+    if b != a and (b not in prev if isinstance(prev, dict) else prev[b] is None):
+        return []
+    path = [b]
+    while b != a:
+        b = prev[b]
+        path.append(b)
+    path.reverse()
+    return path
+
+def _labeled(graph, a, b, heuristic):
+    '''Node ids of `a` and `b` in `graph` and the heuristic on node ids'''
+    if isinstance(graph, CSRGraph):
+        a, b = graph.node_id(a), graph.node_id(b)
+        if heuristic and graph.labels is not None:
+            labels, target = graph.labels, graph.labels[b]
+            return a, b, lambda u: heuristic(labels[u], target)
+    return a, b, heuristic and (lambda u: heuristic(u, b))
+
+def _unlabeled(graph, path):
+    '''`path` of node ids as original node keys'''
+    if isinstance(graph, CSRGraph) and graph.labels is not None:
+        return [graph.labels[u] for u in path]
+    return path
+
 def djikstra(adj_list, a, b):
-    pass
+    '''Shortest path from `a` to `b` by Dijkstra's algorithm
+
+    Input:
+
+     - `adj_list`: a graph (see module docs)
+     - `a`: source node
+     - `b`: target node
+
+    Output:
+
+     - `distance`: length of the shortest path, or `inf` if `b` is unreachable
+     - `path`: list of the nodes on the path from `a` to `b`, or `[]` if unreachable
+
+    Uses a binary heap with lazy deletion, and stops as soon as `b` is settled.
+    '''
+    a, b, _ = _labeled(adj_list, a, b, None)
+    dist, prev = _search(_neighbors(adj_list), a, b)
+    return dist.get(b, inf), _unlabeled(adj_list, reconstruct_path(prev, a, b))
+
+def single_source_distances(adj_list, a, predecessors=False):
+    '''Shortest distances from `a` to every node reachable from `a`, by Dijkstra's algorithm
+
+    Output: dictionary {`node`: `distance`} (and, if `predecessors`, dictionary
+    {`node`: `previous node`} for `reconstruct_path`), keyed by node id for a `CSRGraph`'''
+    if isinstance(adj_list, CSRGraph):
+        a = adj_list.node_id(a)
+    dist, prev = _search(_neighbors(adj_list), a)
+    return (dist, prev) if predecessors else dist
+
+def astar(adj_list, a, b, heuristic):
+    '''Shortest path from `a` to `b` by A* search
+
+    Input as for `djikstra`, plus:
+
+     - `heuristic`: function `(u, b)` \\(\\mapsto\\) lower bound on the distance from
+       `u` to `b`, which must be consistent (e.g. `mathematics.geometry.distance.euclidean`
+       between node coordinates, when weights are lengths). `heuristic = lambda u, b: 0` gives Dijkstra
+
+    Output as for `djikstra`.
+    '''
+    a, b, h = _labeled(adj_list, a, b, heuristic)
+    dist, prev = _search(_neighbors(adj_list), a, b, h)
+    return dist.get(b, inf), _unlabeled(adj_list, reconstruct_path(prev, a, b))
+
+def bidirectional_dijkstra(adj_list, a, b, reverse=None):
+    '''Shortest path from `a` to `b` by Dijkstra's algorithm, searching from both ends
+
+    Settles roughly the nodes within half the distance from either end, rather
+    than all nodes within the full distance from `a`.
+
+    Input as for `djikstra`, plus:
+
+     - `reverse`: `adj_list` with every edge reversed, e.g. from `CSRGraph.reverse`.
+       Built on each call if not given, so pass it when running many queries
+
+    Output as for `djikstra`.
+    '''
+    a, b, _ = _labeled(adj_list, a, b, None)
+    if a == b:
+        return 0, _unlabeled(adj_list, [a])
+    neighbors = (_neighbors(adj_list), _neighbors(reverse if reverse is not None else _reverse(adj_list)))
+    dist = ({a: 0}, {b: 0})
+    prev = ({a: None}, {b: None})
+    done = (set(), set())
+    heaps = ([(0, a)], [(0, b)])
+    best, meet = inf, None
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, u = heappop(heaps[side])
+        if u in done[side]:
+            continue
+        done[side].add(u)
+        here, there = dist[side], dist[1 - side]
+        for v, w in neighbors[side](u):
+            if w < 0:
+                raise ValueError('negative edge weight {} on edge ({}, {})'.format(w, u, v))
+            nd = d + w
+            if nd < here.get(v, inf):
+                here[v] = nd
+                prev[side][v] = u
+                heappush(heaps[side], (nd, v))
+            if v in there and nd + there[v] < best:
+                best, meet = nd + there[v], v
+    if meet is None:
+        return inf, []
+    path = reconstruct_path(prev[0], a, meet)
+    v = prev[1][meet]
+    while v is not None:
+        path.append(v)
+        v = prev[1][v]
+    return best, _unlabeled(adj_list, path)
+
+class ShortestPathWorkspace:
+    '''Preallocated state for running many shortest path queries on one graph
+
+    Distances and predecessors live in arrays of length \\(n\\) that are
+    allocated once. Each query bumps a generation counter instead of clearing
+    them: an entry is valid only if its stamp equals the current generation.
+    So a query costs time proportional to the part of the graph it explores,
+    however large the graph. Distances are exact integers if the weights are.
+
+    Input:
+
+     - `graph`: a graph (see module docs), converted once to a `CSRGraph`
+    '''
+
+    __slots__ = ('graph', 'dist', 'prev', 'stamp', 'generation')
+
+    def __init__(self, graph):
+        graph = as_csr(graph)
+        if graph.weights is not None and len(graph.weights) and min(graph.weights) < 0:
+            raise ValueError('negative edge weight {}'.format(min(graph.weights)))
+        n = len(graph)
+        self.graph = graph
+        self.dist = array('q' if _integral(graph.weights) else 'd', bytes(8 * n))
+        self.prev = array('q', bytes(8 * n))
+        self.stamp = array('q', bytes(8 * n))
+        self.generation = 0
+
+    def _search(self, a, b=None, heuristic=None):
+        '''Dijkstra (or A*) from node id `a`, stopping once `b` is settled'''
+        self.generation += 1
+        generation, dist, prev, stamp = self.generation, self.dist, self.prev, self.stamp
+        offsets, targets, weights = self.graph.offsets, self.graph.targets, self.graph.weights
+        dist[a] = 0
+        prev[a] = -1
+        stamp[a] = generation
+        heap = [(heuristic(a) if heuristic else 0, 0, a)]
+        while heap:
+            _, d, u = heappop(heap)
+            if d > dist[u]:
+                continue
+            if u == b:
+                break
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + (weights[i] if weights is not None else 1)
+                if stamp[v] != generation or nd < dist[v]:
+                    stamp[v] = generation
+                    dist[v] = nd
+                    prev[v] = u
+                    heappush(heap, (nd + heuristic(v) if heuristic else nd, nd, v))
+
+    def query(self, a, b, heuristic=None):
+        '''Shortest path from `a` to `b`, by Dijkstra's algorithm or, with `heuristic`, A*
+
+        Input and output as for `astar`.'''
+        graph = self.graph
+        a, b, h = _labeled(graph, a, b, heuristic)
+        self._search(a, b, h)
+        if self.stamp[b] != self.generation:
+            return inf, []
+        path = [b]
+        while path[-1] != a:
+            path.append(self.prev[path[-1]])
+        path.reverse()
+        return self.dist[b], _unlabeled(graph, path)
+
+    def query_many(self, pairs, heuristic=None):
+        '''Iterator over `query(a, b, heuristic)` for every pair `(a, b)` in the iterable `pairs`'''
+        for a, b in pairs:
+            yield self.query(a, b, heuristic)
+
+    def distances(self, a):
+        '''List of the shortest distances from `a` to every node id (`inf` if unreachable)'''
+        self._search(self.graph.node_id(a))
+        generation, stamp = self.generation, self.stamp
+        return [d if s == generation else inf for d, s in zip(self.dist, stamp)]
+
+APSP_METHODS = ('auto', 'floyd_warshall', 'johnson')
+'''Algorithms accepted by the `method` keyword of `all_pairs_shortest_path`'''
+
+JOHNSON_DENSITY = 1.5
+'''With `method='auto'`, Johnson's algorithm is used if \\(m \\log_2 n < 1.5 n^2\\) for \\(n\\) nodes and \\(m\\) edges'''
+
+PARALLEL_MIN_NODES = 256
+'''Nodes below which `workers` is ignored and Floyd-Warshall stays serial'''
+
+_NO_PATH = (1 << 63) - 1
+'''Stand-in for `inf` in integer distance matrices in shared memory'''
+
+def _integral(weights):
+    '''Whether the edge weights `weights` (`None` for unit weights) are all integers'''
+    if weights is None:
+        return True
+    if isinstance(weights, array):
+        return weights.typecode not in 'fd'
+    return all(isinstance(w, int) for w in weights)
+
+def _pack(row, integral):
+    '''Distance row `row` as an array for shared memory'''
+    if integral:
+        return array('q', [_NO_PATH if x == inf else x for x in row])
+    return array('d', row)
+
+def _unpack(view, integral):
+    '''Distance row of the shared memory `view`, as a list'''
+    row = view.tolist()
+    return [inf if x == _NO_PATH else x for x in row] if integral else row
+
+def _floyd_warshall(D, P, n, start=0, stop=None, pivot=None):
+    '''Floyd-Warshall for \\(n\\) nodes on the rows `start`..`stop-1` of `D` (and predecessors `P`), in place
+
+    Iteration `k` reads row `k` from `pivot(k)` if given (as `(row, predecessor row)`), else from `D`.'''
+    rows = range(start, n if stop is None else stop)
+    for k in range(n):
+        Dk, Pk = pivot(k) if pivot else (D[k], P[k] if P is not None else None)
+        # only finite entries of row k can improve other rows
+        finite = [(j, x) for j, x in enumerate(Dk) if x != inf]
+        for i in rows:
+            Di = D[i]
+            dik = Di[k]
+            if dik == inf or i == k:
+                continue
+            if P is None:
+                for j, x in finite:
+                    x += dik
+                    if x < Di[j]:
+                        Di[j] = x
+            else:
+                Pi = P[i]
+                for j, x in finite:
+                    x += dik
+                    if x < Di[j]:
+                        Di[j] = x
+                        Pi[j] = Pk[j]
+
+def _floyd_warshall_block(names, n, start, stop, barrier, predecessors, integral):
+    '''Worker for `_floyd_warshall_parallel`: rows `start`..`stop-1` of the matrices in shared memory `names`
+
+    Before iteration `k`, the owner of row `k` publishes it to shared memory,
+    and all workers wait at `barrier`; rows never change in their own
+    iteration, so one barrier per iteration suffices.'''
+    segments = [shared_memory.SharedMemory(name=name) for name in names]
+    bufs = [segment.buf.cast(typecode) for segment, typecode in zip(segments, 'qq' if integral else 'dq')]
+    try:
+        D = {i: _unpack(bufs[0][i*n:(i+1)*n], integral) for i in range(start, stop)}
+        P = {i: bufs[1][i*n:(i+1)*n].tolist() for i in range(start, stop)} if predecessors else None
+        def pivot(k):
+            if start <= k < stop:
+                bufs[0][k*n:(k+1)*n] = _pack(D[k], integral)
+                if predecessors:
+                    bufs[1][k*n:(k+1)*n] = array('q', P[k])
+            barrier.wait()
+            return _unpack(bufs[0][k*n:(k+1)*n], integral), bufs[1][k*n:(k+1)*n].tolist() if predecessors else None
+        _floyd_warshall(D, P, n, start, stop, pivot)
+        for i in range(start, stop):
+            bufs[0][i*n:(i+1)*n] = _pack(D[i], integral)
+            if predecessors:
+                bufs[1][i*n:(i+1)*n] = array('q', P[i])
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        for buf, segment in zip(bufs, segments):
+            buf.release()
+            segment.close()
+
+def _floyd_warshall_parallel(D, P, workers):
+    '''Floyd-Warshall split into row blocks across `workers` processes sharing the matrices
+
+    Integer distances are shared as 64-bit integers, so they stay exact.'''
+    n = len(D)
+    integral = all(isinstance(x, int) for row in D for x in row if x != inf)
+    segments = [shared_memory.SharedMemory(create=True, size=max(1, 8 * n * n)) for _ in range(1 + (P is not None))]
+    bufs = [segment.buf.cast(typecode) for segment, typecode in zip(segments, 'qq' if integral else 'dq')]
+    try:
+        for i in range(n):
+            bufs[0][i*n:(i+1)*n] = _pack(D[i], integral)
+            if P is not None:
+                bufs[1][i*n:(i+1)*n] = array('q', [-1 if p is None else p for p in P[i]])
+        step = -(-n // workers)
+        blocks = [(i, min(i + step, n)) for i in range(0, n, step)]
+        barrier = Barrier(len(blocks))
+        names = [segment.name for segment in segments]
+        processes = [Process(target=_floyd_warshall_block, args=(names, n, start, stop, barrier, P is not None, integral)) for start, stop in blocks]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        if any(process.exitcode for process in processes):
+            raise RuntimeError('Floyd-Warshall worker failed')
+        D[:] = [_unpack(bufs[0][i*n:(i+1)*n], integral) for i in range(n)]
+        if P is not None:
+            P[:] = [[None if p < 0 else p for p in bufs[1][i*n:(i+1)*n]] for i in range(n)]
+    finally:
+        for buf, segment in zip(bufs, segments):
+            buf.release()
+            segment.close()
+            segment.unlink()
+
+def _bellman_ford(graph):
+    '''Potentials \\(h\\) with \\(w(u,v) + h(u) - h(v) \\ge 0\\) on every edge, from a virtual source joined to all nodes'''
+    n = len(graph)
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    h = [0] * n
+    if weights is None or min(weights, default=0) >= 0:
+        return h
+    for _ in range(n):
+        changed = False
+        for u in range(n):
+            hu = h[u]
+            for i in range(offsets[u], offsets[u + 1]):
+                x = hu + weights[i]
+                if x < h[targets[i]]:
+                    h[targets[i]] = x
+                    changed = True
+        if not changed:
+            return h
+    raise ValueError('negative cycle detected')
+
+def _johnson(graph, predecessors):
+    '''Johnson's algorithm: Bellman-Ford reweighting, then Dijkstra from every node'''
+    n = len(graph)
+    h = _bellman_ford(graph)
+    offsets, targets = graph.offsets, graph.targets
+    weights = graph.weights if graph.weights is not None else array('q', [1]) * graph.m
+    if _integral(weights):
+        # integer weights stay exact
+        reweighted = array('q', (weights[i] + h[u] - h[targets[i]] for u in range(n) for i in range(offsets[u], offsets[u + 1])))
+    else:
+        reweighted = array('d', bytes(8 * graph.m))
+        for u in range(n):
+            for i in range(offsets[u], offsets[u + 1]):
+                # clamp rounding errors, as reweighted edges are nonnegative
+                reweighted[i] = max(0.0, weights[i] + h[u] - h[targets[i]])
+    workspace = ShortestPathWorkspace(CSRGraph(offsets, targets, reweighted))
+    D, P = [], [] if predecessors else None
+    for s in range(n):
+        workspace._search(s)
+        generation, stamp, dist, prev = workspace.generation, workspace.stamp, workspace.dist, workspace.prev
+        hs = h[s]
+        D.append([d - hs + ht if st == generation else inf for d, ht, st in zip(dist, h, stamp)])
+        if predecessors:
+            row = [p if st == generation else None for p, st in zip(prev, stamp)]
+            row[s] = None
+            P.append(row)
+    return D, P
+
+def all_pairs_shortest_path(adj_mat, predecessors=False, method='auto', workers=None):
+    '''Shortest distances between all pairs of nodes
+
+    Input:
+
+     - `adj_mat`: \\(n\\times n\\) matrix of edge weights, with `inf` (or `None`)
+       where there is no edge; or a `CSRGraph`. Weights may be negative
+     - `predecessors`: also return the predecessor matrix. Defaults to `False`,
+       which saves its \\(n^2\\) memory
+     - `method`: one of `APSP_METHODS`. `'floyd_warshall'` takes \\(O(n^3)\\);
+       `'johnson'` (Bellman-Ford reweighting, then Dijkstra from every node)
+       takes \\(O(nm\\log n)\\) for \\(m\\) edges, which is faster for sparse graphs.
+       `'auto'` picks by `JOHNSON_DENSITY`
+     - `workers`: if > 1, split Floyd-Warshall by row blocks across this many
+       processes (for at least `PARALLEL_MIN_NODES` nodes)
+
+    Output:
+
+     - `dist`: matrix with the length of the shortest path from `i` to `j` at `dist[i][j]`, or `inf` if there is none.
+       With integer weights, every method gives the same exact integers
+     - `pred` (if `predecessors`): matrix with the node before `j` on a shortest
+       path from `i` to `j` at `pred[i][j]`, or `None`; `reconstruct_path(pred[i], i, j)` gives the path
+
+    Raises `ValueError` if the graph has a negative cycle.
+    '''
+    if method not in APSP_METHODS:
+        raise ValueError('unknown method {!r}, expected one of {}'.format(method, APSP_METHODS))
+    if isinstance(adj_mat, CSRGraph):
+        graph, n = adj_mat, len(adj_mat)
+        D = None
+    else:
+        D = [[inf if w is None else w for w in row] for row in adj_mat]
+        n = len(D)
+        if any(len(row) != n for row in D):
+            raise ValueError('expected a square matrix')
+        for i in range(n):
+            if D[i][i] < 0:
+                raise ValueError('negative cycle detected')
+            D[i][i] = 0
+        graph = None
+    if method == 'auto':
+        m = graph.m if graph is not None else sum(w != inf for row in D for w in row) - n
+        method = 'johnson' if m * log2(max(n, 2)) < JOHNSON_DENSITY * n * n else 'floyd_warshall'
+    if method == 'johnson':
+        if graph is None:
+            graph = CSRGraph.from_edges(((i, j, w) for i, row in enumerate(D) for j, w in enumerate(row) if w != inf and i != j), n=n)
+            if graph.weights is None:
+                graph = CSRGraph(graph.offsets, graph.targets, array('q'), None)
+        D, P = _johnson(graph, predecessors)
+        return (D, P) if predecessors else D
+    if D is None:
+        D = [[inf] * n for _ in range(n)]
+        for u, v, *w in graph.edges():
+            D[u][v] = min(D[u][v], w[0] if w else 1)
+        for i in range(n):
+            D[i][i] = min(D[i][i], 0)
+    P = [[i if w != inf and i != j else None for j, w in enumerate(row)] for i, row in enumerate(D)] if predecessors else None
+    if workers is not None and workers > 1 and n >= PARALLEL_MIN_NODES:
+        _floyd_warshall_parallel(D, P, workers)
+    else:
+        _floyd_warshall(D, P, n)
+    if any(D[i][i] < 0 for i in range(n)):
+        raise ValueError('negative cycle detected')
+    return (D, P) if predecessors else D
+
+if __name__ == '__main__':
+    from mathematics.geometry.distance import euclidean
+
+    graph = {
+        'a': {'b': 7, 'c': 9, 'f': 14},
+        'b': {'a': 7, 'c': 10, 'd': 15},
+        'c': {'a': 9, 'b': 10, 'd': 11, 'f': 2},
+        'd': {'b': 15, 'c': 11, 'e': 6},
+        'e': {'d': 6, 'f': 9},
+        'f': {'a': 14, 'c': 2, 'e': 9},
+        'g': {}
+    }
+
+    # test djikstra
+    assert djikstra(graph, 'a', 'e') == (20, ['a', 'c', 'f', 'e']), 'Failed test: djikstra'
+    assert djikstra(graph, 'a', 'g') == (inf, []), 'Failed test: djikstra (unreachable)'
+    assert djikstra({0: [(1, 2)], 1: [(2, 3)]}, 0, 2) == (5, [0, 1, 2]), 'Failed test: djikstra (pairs)'
+    csr = CSRGraph.from_adjacency(graph)
+    assert djikstra(csr, 'a', 'e') == (20, ['a', 'c', 'f', 'e']), 'Failed test: djikstra (CSRGraph)'
+
+    # test single_source_distances
+    dist, prev = single_source_distances(graph, 'a', predecessors=True)
+    assert dist == {'a': 0, 'b': 7, 'c': 9, 'f': 11, 'd': 20, 'e': 20}, 'Failed test: single_source_distances'
+    assert reconstruct_path(prev, 'a', 'd') == ['a', 'c', 'd'], 'Failed test: reconstruct_path'
+
+    # test bidirectional_dijkstra
+    assert bidirectional_dijkstra(graph, 'a', 'e') == (20, ['a', 'c', 'f', 'e']), 'Failed test: bidirectional_dijkstra'
+    assert bidirectional_dijkstra(csr, 'e', 'b', csr.reverse())[0] == 21, 'Failed test: bidirectional_dijkstra (CSRGraph)'
+    assert bidirectional_dijkstra(graph, 'a', 'g') == (inf, []), 'Failed test: bidirectional_dijkstra (unreachable)'
+
+    # test astar on a grid, with unit steps
+    coords = {(x, y): (x, y) for x in range(10) for y in range(10) if not (x == 5 and y < 8)}
+    grid = {p: {q: 1 for q in ((p[0] + 1, p[1]), (p[0] - 1, p[1]), (p[0], p[1] + 1), (p[0], p[1] - 1)) if q in coords} for p in coords}
+    distance, path = astar(grid, (0, 0), (9, 0), lambda u, v: euclidean(coords[u], coords[v]))
+    assert distance == djikstra(grid, (0, 0), (9, 0))[0] == 25 and len(path) == 26, 'Failed test: astar'
+
+    # test ShortestPathWorkspace
+    workspace = ShortestPathWorkspace(csr)
+    results = list(workspace.query_many([('a', 'e'), ('e', 'b'), ('a', 'g'), ('d', 'd')]))
+    assert results == [(20, ['a', 'c', 'f', 'e']), (21, ['e', 'd', 'b']), (inf, []), (0, ['d'])], 'Failed test: ShortestPathWorkspace.query_many'
+    assert workspace.distances('a') == [0, 7, 9, 11, 20, 20, inf], 'Failed test: ShortestPathWorkspace.distances'
+    workspace = ShortestPathWorkspace(CSRGraph.from_adjacency(grid))
+    assert workspace.query((0, 0), (9, 0), lambda u, v: euclidean(u, v))[0] == 25, 'Failed test: ShortestPathWorkspace (astar)'
+
+    # test all_pairs_shortest_path
+    A = [
+        [0, 3, inf, 7],
+        [8, 0, 2, inf],
+        [5, inf, 0, 1],
+        [2, None, inf, 0]
+    ]
+    expected = [
+        [0, 3, 5, 6],
+        [5, 0, 2, 3],
+        [3, 6, 0, 1],
+        [2, 5, 7, 0]
+    ]
+    for method in APSP_METHODS:
+        dist, pred = all_pairs_shortest_path(A, predecessors=True, method=method)
+        assert dist == expected, 'Failed test: all_pairs_shortest_path ({})'.format(method)
+        assert reconstruct_path(pred[1], 1, 0) == [1, 2, 3, 0], 'Failed test: all_pairs_shortest_path ({}, predecessors)'.format(method)
+    negative = [[0, 1, inf], [inf, 0, -2], [4, inf, 0]]
+    assert all_pairs_shortest_path(negative, method='johnson')[0] == [0, 1, -1], 'Failed test: all_pairs_shortest_path (negative weights)'
+    assert all_pairs_shortest_path(CSRGraph.from_edges([(0, 1, 1), (1, 2, -2), (2, 0, 4)], n=3)) == all_pairs_shortest_path(negative), 'Failed test: all_pairs_shortest_path (CSRGraph)'
+    for method in APSP_METHODS[1:]:
+        try:
+            all_pairs_shortest_path([[0, 1], [-2, 0]], method=method)
+            assert False, 'Failed test: all_pairs_shortest_path (negative cycle)'
+        except ValueError:
+            pass
+
+    # test all_pairs_shortest_path with workers
+    from random import Random
+    rng = Random(0)
+    n = PARALLEL_MIN_NODES
+    R = [[rng.randint(1, 99) if rng.random() < 0.05 else inf for _ in range(n)] for _ in range(n)]
+    dist, pred = all_pairs_shortest_path(R, predecessors=True, method='floyd_warshall', workers=2)
+    assert (dist, pred) == all_pairs_shortest_path(R, predecessors=True, method='floyd_warshall'), 'Failed test: all_pairs_shortest_path (workers)'
+    assert dist == all_pairs_shortest_path(R, method='johnson'), 'Failed test: all_pairs_shortest_path (johnson)'
+
+    # test all_pairs_shortest_path agrees exactly on integer weights
+    R[0][1] = 2 ** 53 + 1
+    results = [all_pairs_shortest_path(R, method=method) for method in APSP_METHODS[1:]]
+    results.append(all_pairs_shortest_path(R, method='floyd_warshall', workers=2))
+    assert results[0] == results[1] == results[2], 'Failed test: all_pairs_shortest_path (integer weights)'
+    assert all(type(x) is int for dist in results for row in dist for x in row if x != inf), 'Failed test: all_pairs_shortest_path (integer types)'
+    big = [[0, 2 ** 53 + 1, inf], [inf, 0, -1], [1, inf, 0]]
+    assert all(all_pairs_shortest_path(big, method=method)[0][2] == 2 ** 53 for method in APSP_METHODS), 'Failed test: all_pairs_shortest_path (large weights)'
 
-def all_pairs_shortest_path(adj_mat):
-    pass
\ No newline at end of file
+    print('Passed all tests.')
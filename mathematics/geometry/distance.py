@@ -1,3 +1,26 @@
 '''
 Utilities for determining distances between points.
-'''
\ No newline at end of file
+'''
+
+from math import dist
+
+def euclidean(p, q):
+    '''Euclidean distance between points `p` and `q` of the same dimension'''
+    if len(p) != len(q):
+        raise ValueError('expected p and q to have same dimension')
+    return dist(p, q)
+
+def manhattan(p, q):
+    '''Manhattan (taxicab) distance between points `p` and `q` of the same dimension'''
+    if len(p) != len(q):
+        raise ValueError('expected p and q to have same dimension')
+    return sum(abs(x - y) for x, y in zip(p, q))
+
+if __name__ == '__main__':
+    # test euclidean
+    assert euclidean((0, 0), (3, 4)) == 5.0, 'Failed test: euclidean'
+
+    # test manhattan
+    assert manhattan((1, 2, 3), (0, 0, 0)) == 6, 'Failed test: manhattan'
+
+    print('Passed all tests.')
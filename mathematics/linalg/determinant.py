@@ -1,24 +1,91 @@
 '''
-Simple functions for 2- and 3-dimensional matrix determinants.
+Simple functions for 2- and 3-dimensional matrix determinants, and exact
+fraction-free determinants and ranks of integer matrices.
 
-For \\(n\\times n\\) determinants, see the function `PLUDeterminant` 
-in `decomposition`.
+For \\(n\\times n\\) floating-point determinants, see the function `PLUDeterminant` 
+in `plu_decomposition`.
 '''
 
-def det2(A):
-    '''Determinant of a 2 by 2 matrix `A`'''
+def det2(A, mod=None):
+    '''Determinant of a 2 by 2 matrix `A` (modulo `mod`, if given)'''
     if len(A) != 2 or len(A[0]) != 2:
         raise ValueError('matrix must have dimensions (2,2)')
-    return A[0][0] * A[1][1] - A[0][1] * A[1][0]
+    d = A[0][0] * A[1][1] - A[0][1] * A[1][0]
+    return d if mod is None else d % mod
 
-def det3(A):
-    '''Determinant of a 3 by 3 matrix `A`'''
+def det3(A, mod=None):
+    '''Determinant of a 3 by 3 matrix `A` (modulo `mod`, if given)'''
     if len(A) != 3 or len(A[0]) != 3:
         raise ValueError('matrix must have dimensions (3,3)')
     a, b, c = A[0]
     d, e, f = A[1]
     g, h, i = A[2]
-    return a*(e*i - f*h) - b*(d*i - g*f) + c*(d*h - e*g)
+    d = a*(e*i - f*h) - b*(d*i - g*f) + c*(d*h - e*g)
+    return d if mod is None else d % mod
+
+def det_bareiss(A):
+    '''Exact determinant of a square integer matrix `A`
+
+    Uses fraction-free Bareiss elimination: every intermediate entry is a
+    minor of `A` and every division is exact, so the result is an `int`
+    (no rounding, unlike `PLUDeterminant`) and intermediate entries grow
+    only linearly in the matrix size. `A` is not modified.'''
+    n = len(A)
+    if n == 0 or n != len(A[0]):
+        raise ValueError('expected a square matrix, got dimensions ({},{})'.format(n, len(A[0]) if n else 0))
+    if n == 2: return det2(A)
+    if n == 3: return det3(A)
+    M = [list(row) for row in A]
+    sign = 1
+    prev = 1
+    for k in range(n - 1):
+        if M[k][k] == 0:
+            for i in range(k + 1, n):
+                if M[i][k] != 0:
+                    M[k], M[i] = M[i], M[k]
+                    sign = -sign
+                    break
+            else:
+                return 0
+        Mk = M[k]
+        pivot = Mk[k]
+        tail = Mk[k + 1:]
+        for i in range(k + 1, n):
+            Mi = M[i]
+            a = Mi[k]
+            Mi[k + 1:] = [(pivot * x - a * y) // prev for x, y in zip(Mi[k + 1:], tail)]
+        prev = pivot
+    return sign * M[n - 1][n - 1]
+
+def rank_bareiss(A):
+    '''Exact rank of an integer matrix `A` of any dimensions
+
+    Uses the same fraction-free elimination as `det_bareiss`, skipping
+    columns without a pivot. `A` is not modified.'''
+    M = [list(row) for row in A]
+    n, m = len(M), len(M[0])
+    r = 0
+    prev = 1
+    for c in range(m):
+        for i in range(r, n):
+            if M[i][c] != 0:
+                M[r], M[i] = M[i], M[r]
+                break
+        else:
+            continue
+        Mr = M[r]
+        pivot = Mr[c]
+        tail = Mr[c + 1:]
+        for i in range(r + 1, n):
+            Mi = M[i]
+            a = Mi[c]
+            Mi[c] = 0
+            Mi[c + 1:] = [(pivot * x - a * y) // prev for x, y in zip(Mi[c + 1:], tail)]
+        prev = pivot
+        r += 1
+        if r == n:
+            break
+    return r
 
 if __name__ == '__main__':
     # test det2
@@ -28,6 +95,7 @@ if __name__ == '__main__':
     ]
     expected = 8
     assert det2(A) == expected, 'Failed test: det2'
+    assert det2(A, mod=5) == 3, 'Failed test: det2 (mod)'
 
     # test det3
     A = [
@@ -37,5 +105,26 @@ if __name__ == '__main__':
     ]
     expected = -15
     assert det3(A) == expected, 'Failed test: det3'
+    assert det3(A, mod=7) == 6, 'Failed test: det3 (mod)'
+
+    # test det_bareiss
+    A = [[1, 3, 1, 4],[3, 9, 5, 15],[0, 2, 1, 1],[0, 4, 2, 3]]
+    expected = -4
+    assert det_bareiss(A) == expected, 'Failed test: det_bareiss'
+    assert det_bareiss([[1, 2, 3, 4], [2, 4, 6, 8], [0, 1, 0, 1], [5, 0, 2, 1]]) == 0, 'Failed test: det_bareiss (singular)'
+    A = [[2 ** 70, 1, 0, 0], [1, 2 ** 70, 1, 0], [0, 1, 2 ** 70, 1], [0, 0, 1, 2 ** 70]]
+    expected = 2 ** 280 - 3 * 2 ** 140 + 1
+    assert det_bareiss(A) == expected, 'Failed test: det_bareiss (big integers)'
+
+    # test rank_bareiss
+    A = [
+        [1, 2, 3, 4],
+        [2, 4, 6, 8],
+        [0, 1, 0, 1],
+        [1, 3, 3, 5]
+    ]
+    assert rank_bareiss(A) == 2, 'Failed test: rank_bareiss'
+    assert rank_bareiss([[0, 0, 1], [0, 0, 2], [1, 1, 0]]) == 2, 'Failed test: rank_bareiss'
+    assert rank_bareiss([[1, 2], [3, 4], [5, 6]]) == 2, 'Failed test: rank_bareiss (rectangular)'
 
-    print('Passed all tests.')
\ No newline at end of file
+    print('Passed all tests.')
@@ -0,0 +1,250 @@
+'''
+Iterative solvers for large linear systems \\(A\\vec x = b\\).
+
+Unlike `PLUSolve`, these never factor or copy `A`: each iteration only needs
+the product \\(A\\vec v\\), so time per iteration is proportional to the cost
+of that product and memory is \\(O(n)\\) beyond `A` itself.
+
+`A` may be a nested list matrix, a `matrix.Matrix`, a `sparse.CSRMatrix` (or
+any object with a `matvec` method), or a callable `v -> A v`. Jacobi and
+Gauss-Seidel also need the entries of `A`, so they do not accept callables.
+
+Every solver returns `(x, report)`, where `report` is a `SolverReport`.
+Convergence is declared when \\(\\|b - A\\vec x\\| \\le\\) `tol` \\(\\cdot \\|b\\|\\).
+'''
+
+from .vector import dot, norm, add, subtract, multiply_scalar
+from .sparse import CSRMatrix, COOMatrix
+
+class SolverReport:
+    '''Convergence report of an iterative solver
+
+     - `converged`: whether the relative residual reached the tolerance
+     - `iterations`: number of iterations performed
+     - `residuals`: residual norm \\(\\|b - A\\vec x\\|\\) before the first and after every iteration
+    '''
+
+    __slots__ = ('converged', 'iterations', 'residuals')
+
+    def __init__(self, converged, iterations, residuals):
+        self.converged = converged
+        self.iterations = iterations
+        self.residuals = residuals
+
+    @property
+    def residual_norm(self):
+        '''Final residual norm'''
+        return self.residuals[-1]
+
+    def __repr__(self):
+        return 'SolverReport(converged={}, iterations={}, residual_norm={})'.format(self.converged, self.iterations, self.residual_norm)
+
+def _operator(A):
+    '''The matrix-vector product \\(\\vec v \\mapsto A\\vec v\\) for any supported form of `A`'''
+    if isinstance(A, COOMatrix):
+        A = A.to_csr()
+    if hasattr(A, 'matvec'):
+        return A.matvec
+    if callable(A):
+        return A
+    return lambda v: [dot(row, v) for row in A]
+
+def _rows(A):
+    '''Rows of an explicit matrix `A` as `(columns, values)` pairs'''
+    if isinstance(A, COOMatrix):
+        A = A.to_csr()
+    if isinstance(A, CSRMatrix):
+        return [A.row(i) for i in range(A.shape[0])]
+    if callable(A):
+        raise ValueError('this solver needs the entries of A, got a callable operator')
+    return [(range(len(row)), row) for row in A]
+
+def _diagonal(rows):
+    '''Diagonal of the matrix with the given `_rows`, which must be nonzero'''
+    d = []
+    for i, (cols, values) in enumerate(rows):
+        for j, a in zip(cols, values):
+            if j == i:
+                break
+        else:
+            a = 0
+        if a == 0:
+            raise ArithmeticError('zero diagonal entry in row {}'.format(i))
+        d.append(a)
+    return d
+
+def _start(matvec, b, x0):
+    '''Initial iterate, residual, scale for the tolerance, and residual history'''
+    n = len(b)
+    x = [0.0] * n if x0 is None else list(x0)
+    if len(x) != n:
+        raise ValueError('expected x0 of length {}, got {}'.format(n, len(x)))
+    r = subtract(b, matvec(x))
+    return x, r, (norm(b) or 1.0), [norm(r)]
+
+def conjugate_gradient(A, b, x0=None, tol=1e-8, max_iter=None):
+    '''Solve \\(A\\vec x = b\\) by the Conjugate Gradient method
+
+    Input:
+
+     - `A`: symmetric positive definite \\(n \\times n\\) operator (see module docs)
+     - `b`: a list (vector) of length \\(n\\)
+     - `x0`: initial guess, e.g. a previous solution (warm start). Defaults to zeroes
+     - `tol`: relative residual tolerance. Defaults to `1e-8`
+     - `max_iter`: iteration limit. Defaults to \\(10n\\)
+
+    Output: `(x, report)`'''
+    matvec = _operator(A)
+    x, r, bnorm, residuals = _start(matvec, b, x0)
+    p = r
+    rs = dot(r, r)
+    it = 0
+    for it in range(1, (max_iter if max_iter is not None else 10 * len(b)) + 1):
+        if residuals[-1] <= tol * bnorm:
+            return x, SolverReport(True, it - 1, residuals)
+        Ap = matvec(p)
+        alpha = rs / dot(p, Ap)
+        x = add(x, multiply_scalar(p, alpha))
+        r = subtract(r, multiply_scalar(Ap, alpha))
+        rs_new = dot(r, r)
+        residuals.append(rs_new ** 0.5)
+        p = add(r, multiply_scalar(p, rs_new / rs))
+        rs = rs_new
+    return x, SolverReport(residuals[-1] <= tol * bnorm, it, residuals)
+
+def jacobi(A, b, x0=None, tol=1e-8, max_iter=None):
+    '''Solve \\(A\\vec x = b\\) by Jacobi iteration
+
+    Converges for strictly diagonally dominant `A`. Each iteration updates
+    every component from the previous iterate:
+    \\(\\vec x \\leftarrow \\vec x + D^{-1}(b - A\\vec x)\\).
+
+    Input and output as for `conjugate_gradient`, except that `A` must be an
+    explicit matrix and `max_iter` defaults to `1000`.'''
+    d = _diagonal(_rows(A))
+    matvec = _operator(A)
+    x, r, bnorm, residuals = _start(matvec, b, x0)
+    it = 0
+    for it in range(1, (max_iter if max_iter is not None else 1000) + 1):
+        if residuals[-1] <= tol * bnorm:
+            return x, SolverReport(True, it - 1, residuals)
+        x = [xi + ri / di for xi, ri, di in zip(x, r, d)]
+        r = subtract(b, matvec(x))
+        residuals.append(norm(r))
+    return x, SolverReport(residuals[-1] <= tol * bnorm, it, residuals)
+
+def gauss_seidel(A, b, x0=None, tol=1e-8, max_iter=None):
+    '''Solve \\(A\\vec x = b\\) by Gauss-Seidel iteration
+
+    Like `jacobi`, but each component update immediately uses the components
+    already updated in the same sweep, which typically halves the number of
+    iterations. Converges for strictly diagonally dominant or symmetric
+    positive definite `A`.
+
+    Input and output as for `jacobi`.'''
+    rows = _rows(A)
+    d = _diagonal(rows)
+    matvec = _operator(A)
+    x, r, bnorm, residuals = _start(matvec, b, x0)
+    it = 0
+    for it in range(1, (max_iter if max_iter is not None else 1000) + 1):
+        if residuals[-1] <= tol * bnorm:
+            return x, SolverReport(True, it - 1, residuals)
+        for i, (cols, values) in enumerate(rows):
+            x[i] += (b[i] - sum(a * x[j] for j, a in zip(cols, values))) / d[i]
+        r = subtract(b, matvec(x))
+        residuals.append(norm(r))
+    return x, SolverReport(residuals[-1] <= tol * bnorm, it, residuals)
+
+def bicgstab(A, b, x0=None, tol=1e-8, max_iter=None):
+    '''Solve \\(A\\vec x = b\\) by the stabilized biconjugate gradient method (BiCGSTAB)
+
+    Works for general (nonsymmetric) nonsingular `A`. Stops early, without
+    converging, if the method breaks down.
+
+    Input and output as for `conjugate_gradient`.'''
+    matvec = _operator(A)
+    x, r, bnorm, residuals = _start(matvec, b, x0)
+    r_hat = r
+    rho = alpha = omega = 1.0
+    v = p = [0.0] * len(b)
+    it = 0
+    for it in range(1, (max_iter if max_iter is not None else 10 * len(b)) + 1):
+        if residuals[-1] <= tol * bnorm:
+            return x, SolverReport(True, it - 1, residuals)
+        rho_new = dot(r_hat, r)
+        if rho_new == 0:
+            return x, SolverReport(False, it - 1, residuals)
+        beta = (rho_new / rho) * (alpha / omega)
+        p = add(r, multiply_scalar(subtract(p, multiply_scalar(v, omega)), beta))
+        v = matvec(p)
+        rv = dot(r_hat, v)
+        if rv == 0:
+            return x, SolverReport(False, it - 1, residuals)
+        alpha = rho_new / rv
+        s = subtract(r, multiply_scalar(v, alpha))
+        if norm(s) <= tol * bnorm:
+            x = add(x, multiply_scalar(p, alpha))
+            residuals.append(norm(s))
+            return x, SolverReport(True, it, residuals)
+        t = matvec(s)
+        tt = dot(t, t)
+        if tt == 0:
+            return x, SolverReport(False, it - 1, residuals)
+        omega = dot(t, s) / tt
+        x = add(x, add(multiply_scalar(p, alpha), multiply_scalar(s, omega)))
+        r = subtract(s, multiply_scalar(t, omega))
+        residuals.append(norm(r))
+        rho = rho_new
+        if omega == 0:
+            return x, SolverReport(False, it, residuals)
+    return x, SolverReport(residuals[-1] <= tol * bnorm, it, residuals)
+
+if __name__ == '__main__':
+    # symmetric positive definite, diagonally dominant test system
+    A = [
+        [4, 1, 0, 0],
+        [1, 4, 1, 0],
+        [0, 1, 4, 1],
+        [0, 0, 1, 4]
+    ]
+    expected = [1, 2, 3, 4]
+    b = [sum(a * x for a, x in zip(row, expected)) for row in A]
+
+    def close(x, y, eps=1e-6):
+        return all(abs(u - v) < eps for u, v in zip(x, y))
+
+    # test conjugate_gradient
+    x, report = conjugate_gradient(A, b)
+    assert report.converged and close(x, expected), 'Failed test: conjugate_gradient'
+    assert report.iterations <= 4 and len(report.residuals) == report.iterations + 1, 'Failed test: conjugate_gradient (report)'
+    x, report = conjugate_gradient(A, b, x0=expected)
+    assert report.converged and report.iterations == 0, 'Failed test: conjugate_gradient (warm start)'
+
+    # test jacobi
+    x, report = jacobi(A, b)
+    assert report.converged and close(x, expected), 'Failed test: jacobi'
+
+    # test gauss_seidel
+    x, report = gauss_seidel(CSRMatrix.from_dense(A), b)
+    assert report.converged and close(x, expected), 'Failed test: gauss_seidel'
+    assert report.iterations < jacobi(A, b)[1].iterations, 'Failed test: gauss_seidel (iterations)'
+
+    # test bicgstab
+    N = [
+        [4, 1, 0, 0],
+        [2, 5, 1, 0],
+        [0, -1, 4, 1],
+        [1, 0, 3, 6]
+    ]
+    c = [sum(a * x for a, x in zip(row, expected)) for row in N]
+    x, report = bicgstab(lambda v: [dot(row, v) for row in N], c)
+    assert report.converged and close(x, expected), 'Failed test: bicgstab'
+    x, report = bicgstab([[0, 1], [1, 0]], [1, 0])
+    assert not report.converged and report.iterations == 0, 'Failed test: bicgstab (breakdown)'
+
+    # test max_iter
+    x, report = jacobi(A, b, max_iter=2)
+    assert not report.converged and report.iterations == 2, 'Failed test: jacobi (max_iter)'
+
+    print('Passed all tests.')
@@ -2,9 +2,190 @@
 Matrix utilities.
 '''
 
-from math import log2
-from copy import deepcopy
-from functools import reduce
+from functools import partial
+from itertools import chain
+from array import array
+from operator import add, sub, mul
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+class Matrix:
+    '''Dense matrix stored in a single flat row-major `array`
+
+    Elements live in `data`, an `array('q')` for integer matrices or an
+    `array('d')` for float matrices, so an \\(n\\times m\\) matrix costs
+    \\(8nm\\) bytes instead of \\(n\\) row lists of boxed numbers. Element
+    \\((i, j)\\) is stored at `offset + i*strides[0] + j*strides[1]`, which
+    lets `row_range`, `col_range` and `transpose` return views that share
+    `data` with the original matrix rather than copying it.
+
+    Use `Matrix.from_lists` and `Matrix.tolist` to convert from and to the
+    nested list form used by the rest of this package. The module-level
+    functions (`matmul`, `matpow`, `transpose`, `diag`, ...) accept either form.
+    '''
+
+    __slots__ = ('data', 'shape', 'strides', 'offset')
+
+    def __init__(self, data, shape, strides=None, offset=0):
+        n, m = shape
+        if n <= 0 or m <= 0: raise ValueError('expecting n >= 1 and m >= 1')
+        if strides is None:
+            if len(data) != n * m:
+                raise ValueError('expected {} elements for shape {}, got {}'.format(n * m, (n, m), len(data)))
+            strides = (m, 1)
+        self.data = data
+        self.shape = (n, m)
+        self.strides = tuple(strides)
+        self.offset = offset
+
+    @classmethod
+    def from_lists(cls, A, typecode=None):
+        '''Pack the nested list matrix `A` into a `Matrix`
+
+        `typecode` defaults to `'q'` if every element of `A` is an integer
+        and `'d'` otherwise. Integers outside the signed 64-bit range raise
+        `OverflowError`.'''
+        n, m = len(A), len(A[0])
+        for row in A:
+            if len(row) != m:
+                raise ValueError('expected rows of length {}, got {}'.format(m, len(row)))
+        if typecode is None:
+            try:
+                return cls(array('q', chain.from_iterable(A)), (n, m))
+            except TypeError:
+                typecode = 'd'
+        return cls(array(typecode, chain.from_iterable(A)), (n, m))
+
+    @classmethod
+    def zeroes(cls, n, m, typecode='q'):
+        '''A zero `Matrix` of dimension \\(n\\times m\\)'''
+        if n <= 0 or m <= 0: raise ValueError('expecting n >= 1 and m >= 1')
+        return cls(array(typecode, bytes(array(typecode).itemsize * n * m)), (n, m))
+
+    @classmethod
+    def identity(cls, n, typecode='q'):
+        '''An identity `Matrix` of dimension \\(n\\times n\\)'''
+        z = cls.zeroes(n, n, typecode)
+        z.data[::n + 1] = array(typecode, [1]) * n
+        return z
+
+    @property
+    def typecode(self):
+        '''Typecode of the backing `array`'''
+        return self.data.typecode
+
+    def is_contiguous(self):
+        '''Whether this matrix is a dense row-major block of `data`'''
+        return self.strides == (self.shape[1], 1)
+
+    def copy(self):
+        '''A contiguous copy of this matrix that shares nothing with it'''
+        n, m = self.shape
+        if self.is_contiguous():
+            return Matrix(self.data[self.offset:self.offset + n * m], (n, m))
+        data = array(self.typecode)
+        for i in range(n):
+            data.extend(self._row(i))
+        return Matrix(data, (n, m))
+
+    def _row(self, i):
+        s0, s1 = self.strides
+        start = self.offset + i * s0
+        return self.data[start:start + (self.shape[1] - 1) * s1 + 1:s1]
+
+    def _col(self, j):
+        s0, s1 = self.strides
+        start = self.offset + j * s1
+        return self.data[start:start + (self.shape[0] - 1) * s0 + 1:s0]
+
+    def _check_index(self, i, n):
+        if i < 0: i += n
+        if not 0 <= i < n:
+            raise IndexError('index {} out of range for dimension {}'.format(i, n))
+        return i
+
+    def row(self, i):
+        '''The `i`th row as a list'''
+        return self._row(self._check_index(i, self.shape[0])).tolist()
+
+    def col(self, j):
+        '''The `j`th column as a list'''
+        return self._col(self._check_index(j, self.shape[1])).tolist()
+
+    def tolist(self):
+        '''This matrix in nested list form'''
+        return [self._row(i).tolist() for i in range(self.shape[0])]
+
+    def row_range(self, i=None, j=None):
+        '''View of rows `i`..`j` (either `i` or `j` optional)'''
+        i, j = _range_bounds(i, j, self.shape[0])
+        return Matrix(self.data, (j - i + 1, self.shape[1]), self.strides, self.offset + i * self.strides[0])
+
+    def col_range(self, i=None, j=None):
+        '''View of columns `i`..`j` (either `i` or `j` optional)'''
+        i, j = _range_bounds(i, j, self.shape[1])
+        return Matrix(self.data, (self.shape[0], j - i + 1), self.strides, self.offset + i * self.strides[1])
+
+    def transpose(self):
+        '''View of the transpose of this matrix'''
+        n, m = self.shape
+        s0, s1 = self.strides
+        return Matrix(self.data, (m, n), (s1, s0), self.offset)
+
+    def diag(self):
+        '''Diagonal elements as a list'''
+        n = min(self.shape)
+        step = self.strides[0] + self.strides[1]
+        return self.data[self.offset:self.offset + (n - 1) * step + 1:step].tolist()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for i in range(self.shape[0]):
+            yield self._row(i).tolist()
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            i, j = key
+            i = self._check_index(i, self.shape[0])
+            j = self._check_index(j, self.shape[1])
+            return self.data[self.offset + i * self.strides[0] + j * self.strides[1]]
+        return self.row(key)
+
+    def __setitem__(self, key, value):
+        i, j = key
+        i = self._check_index(i, self.shape[0])
+        j = self._check_index(j, self.shape[1])
+        self.data[self.offset + i * self.strides[0] + j * self.strides[1]] = value
+
+    def __eq__(self, other):
+        if isinstance(other, Matrix):
+            return self.shape == other.shape and self.tolist() == other.tolist()
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == [list(row) for row in other]
+        return NotImplemented
+
+    def __repr__(self):
+        return 'Matrix({})'.format(self.tolist())
+
+def _range_bounds(i, j, n):
+    '''Resolve the optional inclusive bounds of `row_range`/`col_range` against length `n`'''
+    if i is None and j is None: 
+        raise ValueError('expecting non-None value for either i or j')
+    if i is None: i = 0
+    if j is None: j = n - 1
+    if not 0 <= i <= j < n:
+        raise ValueError('invalid range {}..{} for dimension {}'.format(i, j, n))
+    return i, j
+
+def _unwrap(A):
+    '''Nested list form of `A`, which may be a `Matrix`'''
+    return A.tolist() if isinstance(A, Matrix) else A
+
+def _shape(A):
+    '''Dimensions `(n, m)` of `A`, which may be a `Matrix`'''
+    return A.shape if isinstance(A, Matrix) else (len(A), len(A[0]))
 
 def zeroes(n, m):
     '''A zero matrix of dimension \\(n\\times m\\)'''
@@ -24,73 +205,353 @@ def identity(n):
         z[i][i] = 1
     return z
 
-def matmul_square(A, B):
-    '''Multiply square matrices `A` and `B` (naively)'''
-    if len(A) != len(A[0]):
-        raise ValueError('matrix A is not square ({},{})'.format(len(A), len(A[0])))
-    if len(B) != len(B[0]):
-        raise ValueError('matrix B is not square ({},{})'.format(len(B), len(B[0])))
-    if len(A) != len(B) or len(A[0]) != len(B[0]):
-        raise ValueError('dimension mismatch between A () and B (), expected identical dimensions'.format((len(A), len(A[0])), (len(B), len(B[0]))))
-    n = len(A)
-    C = zeroes_square(n)
-    for i in range(n):
-        for j in range(n):
-            for k in range(n):
-                C[i][j] += A[i][k] * B[k][j]
+STRASSEN_CUTOFF = 128
+'''Dimension at or below which `strassen` recursion falls back to the `rows` kernel'''
+
+TILE_SIZE = 64
+'''Length of the inner-dimension tiles used by the `tiled` kernel'''
+
+TILED_MIN_SIZE = 1 << 16
+'''Size of `B` (in elements) from which `auto` prefers `tiled` over `rows`'''
+
+def _matmul_rows(A, B, mod=None):
+    '''Row-oriented kernel: every entry is a `sum` over a row of `A` zipped with a column of `B`'''
+    Bt = list(zip(*B))
+    if mod is not None:
+        return [[sum(map(mul, row, col)) % mod for col in Bt] for row in A]
+    return [[sum(map(mul, row, col)) for col in Bt] for row in A]
+
+def _matmul_tiled(A, B, tile=TILE_SIZE, mod=None):
+    '''`_matmul_rows` over tiles of the inner dimension, so each pass only touches a slice of `B`'''
+    Bt = list(zip(*B))
+    m = len(B)
+    C = [[0] * len(Bt) for _ in range(len(A))]
+    for k in range(0, m, tile):
+        cols = [col[k:k + tile] for col in Bt]
+        for i, row in enumerate(A):
+            part = row[k:k + tile]
+            if mod is not None:
+                C[i] = [(c + sum(map(mul, part, col))) % mod for c, col in zip(C[i], cols)]
+            else:
+                C[i] = [c + sum(map(mul, part, col)) for c, col in zip(C[i], cols)]
     return C
 
-def matmul(A, B):
-    '''Multiply matrices `A` and `B` (naively)'''
-    an, am = len(A), len(A[0])
-    bn, bm = len(B), len(B[0])
+def _add(A, B):
+    return [list(map(add, a, b)) for a, b in zip(A, B)]
+
+def _sub(A, B):
+    return [list(map(sub, a, b)) for a, b in zip(A, B)]
+
+def _pad(A, n, m):
+    '''`A` padded with zeroes to dimension \\(n\\times m\\)'''
+    extra = m - len(A[0])
+    rows = [list(row) + [0] * extra for row in A] if extra else A
+    return rows + [[0] * m for _ in range(n - len(A))]
+
+def _matmul_strassen(A, B, cutoff=STRASSEN_CUTOFF, mod=None):
+    '''Strassen recursion with 7 half-size products, padding odd dimensions with zeroes'''
+    n, m, p = len(A), len(B), len(B[0])
+    if min(n, m, p) <= cutoff:
+        return _matmul_rows(A, B, mod)
+    if n % 2 or m % 2 or p % 2:
+        C = _matmul_strassen(_pad(A, n + n % 2, m + m % 2), _pad(B, m + m % 2, p + p % 2), cutoff, mod)
+        return [row[:p] for row in C[:n]]
+    hn, hm, hp = n // 2, m // 2, p // 2
+    A11 = [row[:hm] for row in A[:hn]]
+    A12 = [row[hm:] for row in A[:hn]]
+    A21 = [row[:hm] for row in A[hn:]]
+    A22 = [row[hm:] for row in A[hn:]]
+    B11 = [row[:hp] for row in B[:hm]]
+    B12 = [row[hp:] for row in B[:hm]]
+    B21 = [row[:hp] for row in B[hm:]]
+    B22 = [row[hp:] for row in B[hm:]]
+    M1 = _matmul_strassen(_add(A11, A22), _add(B11, B22), cutoff, mod)
+    M2 = _matmul_strassen(_add(A21, A22), B11, cutoff, mod)
+    M3 = _matmul_strassen(A11, _sub(B12, B22), cutoff, mod)
+    M4 = _matmul_strassen(A22, _sub(B21, B11), cutoff, mod)
+    M5 = _matmul_strassen(_add(A11, A12), B22, cutoff, mod)
+    M6 = _matmul_strassen(_sub(A21, A11), _add(B11, B12), cutoff, mod)
+    M7 = _matmul_strassen(_sub(A12, A22), _add(B21, B22), cutoff, mod)
+    C11 = _add(_sub(_add(M1, M4), M5), M7)
+    C12 = _add(M3, M5)
+    C21 = _add(M2, M4)
+    C22 = _add(_add(_sub(M1, M2), M3), M6)
+    C = [a + b for a, b in zip(C11, C12)] + [a + b for a, b in zip(C21, C22)]
+    if mod is not None:
+        return [[x % mod for x in row] for row in C]
+    return C
+
+def _matmul2(A, B, mod=None):
+    '''Unrolled product of 2 by 2 matrices'''
+    (a, b), (c, d) = A
+    (e, f), (g, h) = B
+    C = [[a*e + b*g, a*f + b*h], [c*e + d*g, c*f + d*h]]
+    if mod is not None:
+        return [[x % mod for x in row] for row in C]
+    return C
+
+def _matmul3(A, B, mod=None):
+    '''Unrolled product of 3 by 3 matrices'''
+    (a, b, c), (d, e, f), (g, h, i) = A
+    (j, k, l), (m, n, o), (p, q, r) = B
+    C = [
+        [a*j + b*m + c*p, a*k + b*n + c*q, a*l + b*o + c*r],
+        [d*j + e*m + f*p, d*k + e*n + f*q, d*l + e*o + f*r],
+        [g*j + h*m + i*p, g*k + h*n + i*q, g*l + h*o + i*r]
+    ]
+    if mod is not None:
+        return [[x % mod for x in row] for row in C]
+    return C
+
+PARALLEL_MIN_WORK = 1 << 21
+'''Multiply-adds (\\(n\\cdot m\\cdot p\\)) below which `workers` is ignored and products stay serial'''
+
+def _pack_operands(A, B, mod=None):
+    '''Rows of `A` followed by columns of `B` in one flat `array`, or `None` if they do not fit
+
+    Integer operands are packed as `'q'` only if no entry of the product
+    (reduced by `mod`, if given) can overflow 64 bits; floats are packed as `'d'`.'''
+    try:
+        data = array('q', chain.from_iterable(A))
+        split = len(data)
+        data.extend(chain.from_iterable(zip(*B)))
+    except TypeError:
+        return 'd', array('d', chain(chain.from_iterable(A), chain.from_iterable(zip(*B))))
+    except OverflowError:
+        return None
+    if mod is not None:
+        return ('q', data) if mod <= 1 << 63 else None
+    a_max = max(map(abs, data[:split]))
+    b_max = max(map(abs, data[split:]))
+    if a_max * b_max * len(B) >= 1 << 63:
+        return None
+    return 'q', data
+
+def _matmul_block(name, n, m, p, typecode, start, stop, mod=None):
+    '''Worker for `_matmul_parallel`: rows `start`..`stop-1` of the product held in shared memory `name`'''
+    shm = shared_memory.SharedMemory(name=name)
+    buf = shm.buf.cast(typecode)
+    try:
+        cols = [buf[n*m + j*m:n*m + (j+1)*m].tolist() for j in range(p)]
+        out = n*m + p*m
+        for i in range(start, stop):
+            row = buf[i*m:(i+1)*m].tolist()
+            if mod is not None:
+                buf[out + i*p:out + (i+1)*p] = array(typecode, [sum(map(mul, row, col)) % mod for col in cols])
+            else:
+                buf[out + i*p:out + (i+1)*p] = array(typecode, [sum(map(mul, row, col)) for col in cols])
+    finally:
+        buf.release()
+        shm.close()
+
+def _matmul_parallel(A, B, workers, executor=None, mod=None):
+    '''`_matmul_rows` split into row blocks across a process pool, or `None` if the operands cannot be shared
+
+    `A`, the columns of `B` and the product live in one shared memory
+    segment, so tasks only carry the segment name and their row range.'''
+    packed = _pack_operands(A, B, mod)
+    if packed is None:
+        return None
+    typecode, data = packed
+    n, m, p = len(A), len(B), len(B[0])
+    shm = shared_memory.SharedMemory(create=True, size=(len(data) + n*p) * data.itemsize)
+    buf = shm.buf.cast(typecode)
+    try:
+        buf[:len(data)] = data
+        pool = executor or ProcessPoolExecutor(workers)
+        try:
+            step = -(-n // workers)
+            futures = [pool.submit(_matmul_block, shm.name, n, m, p, typecode, i, min(i + step, n), mod) for i in range(0, n, step)]
+            for future in futures:
+                future.result()
+        finally:
+            if executor is None:
+                pool.shutdown()
+        out = len(data)
+        return [buf[out + i*p:out + (i+1)*p].tolist() for i in range(n)]
+    finally:
+        buf.release()
+        shm.close()
+        shm.unlink()
+
+def _reduce(A, mod):
+    '''Contiguous copy of the `Matrix` `A` with every element reduced modulo `mod`'''
+    data = A.copy().data
+    return Matrix(array(data.typecode, [x % mod for x in data]), A.shape)
+
+def _matmul_flat(A, B, mod=None):
+    '''`rows` kernel for `Matrix` operands, reading rows of `A` and columns of `B` as slices of their flat arrays
+
+    The product is written row by row into a new flat `array`, so no nested
+    lists are built.'''
+    n, p = A.shape[0], B.shape[1]
+    cols = [B._col(j) for j in range(p)]
+    data = array('d' if 'd' in (A.typecode, B.typecode) else 'q')
+    for i in range(n):
+        row = A._row(i)
+        if mod is not None:
+            data.extend([sum(map(mul, row, col)) % mod for col in cols])
+        else:
+            data.extend([sum(map(mul, row, col)) for col in cols])
+    return Matrix(data, (n, p))
+
+def _flat_engine(method, cutoff, workers, n, m, p):
+    '''Whether an \\(n\\times m\\) by \\(m\\times p\\) product of `Matrix` operands runs on their flat arrays'''
+    if workers is not None and workers > 1 and n > 1 and n * m * p >= PARALLEL_MIN_WORK:
+        return False
+    return method in ('rows', 'tiled') or method == 'auto' and min(n, m, p) < 2 * cutoff
+
+def _matmul_matrix(A, B, method, cutoff, workers, mod):
+    '''Dispatch a validated product with at least one `Matrix` operand; the product as a `Matrix`'''
+    n, m = _shape(A)
+    p = _shape(B)[1]
+    if not _flat_engine(method, cutoff, workers, n, m, p):
+        return Matrix.from_lists(_matmul(_unwrap(A), _unwrap(B), method, cutoff, workers, mod=mod))
+    A, B = (X if isinstance(X, Matrix) else Matrix.from_lists(X) for X in (A, B))
+    if mod is not None:
+        A, B = _reduce(A, mod), _reduce(B, mod)
+    return _matmul_flat(A, B, mod)
+
+MATMUL_METHODS = ('auto', 'rows', 'tiled', 'strassen')
+'''Multiplication engines accepted by the `method` keyword of `matmul`, `matmul_square` and `matpow`'''
+
+def _matmul(A, B, method, cutoff, workers=None, executor=None, mod=None):
+    '''Dispatch an already validated product to the engine selected by `method`'''
+    if mod is not None:
+        A = [[x % mod for x in row] for row in A]
+        B = [[x % mod for x in row] for row in B]
+    if method == 'auto' and len(A) == len(B) == len(B[0]):
+        if len(A) == 2:
+            return _matmul2(A, B, mod)
+        if len(A) == 3:
+            return _matmul3(A, B, mod)
+    if workers is not None and workers > 1 and len(A) > 1 and len(A) * len(B) * len(B[0]) >= PARALLEL_MIN_WORK:
+        C = _matmul_parallel(A, B, workers, executor, mod)
+        if C is not None:
+            return C
+    if method == 'auto':
+        if min(len(A), len(B), len(B[0])) >= 2 * cutoff:
+            method = 'strassen'
+        elif len(B) * len(B[0]) >= TILED_MIN_SIZE:
+            method = 'tiled'
+        else:
+            method = 'rows'
+    if method == 'rows':
+        return _matmul_rows(A, B, mod)
+    if method == 'tiled':
+        return _matmul_tiled(A, B, mod=mod)
+    if method == 'strassen':
+        return _matmul_strassen(A, B, cutoff, mod)
+    raise ValueError('unknown method {!r}, expected one of {}'.format(method, MATMUL_METHODS))
+
+def matmul_square(A, B, method='auto', cutoff=STRASSEN_CUTOFF, workers=None, mod=None):
+    '''Multiply square matrices `A` and `B`
+
+    `method` selects the multiplication engine:
+
+     - `'rows'`: row-oriented kernel over the rows of `A` and the columns of `B`
+     - `'tiled'`: the `rows` kernel over tiles of `TILE_SIZE` along the inner dimension, for large matrices
+     - `'strassen'`: Strassen recursion down to dimension `cutoff`, then the `rows` kernel
+     - `'auto'` (default): unrolled kernels for 2 by 2 and 3 by 3, `strassen` if every dimension is at least `2*cutoff`, else `tiled` or `rows` by size
+
+    All engines give identical results for integer matrices. For floats the
+    engines sum in different orders, so results may differ in the last bits.
+
+    With `workers` > 1, products of at least `PARALLEL_MIN_WORK` multiply-adds
+    are split into row blocks across that many processes, using the `rows`
+    kernel on operands passed through shared memory. Integer products that
+    could overflow 64 bits always run serially.
+
+    With an integer `mod`, the product is computed modulo `mod`: operands are
+    reduced first and every entry is reduced as it is accumulated, so
+    entries stay below `mod`.
+
+    If either operand is a `Matrix`, so is the product. The `rows` and
+    `tiled` engines (and `auto` below the Strassen threshold) then read
+    the operands straight from their flat arrays and write the product into
+    a new one; `strassen` and parallel products convert the operands to
+    nested lists first. Integer products outside the signed 64-bit range
+    raise `OverflowError`, as for `Matrix.from_lists`.'''
+    (an, am), (bn, bm) = _shape(A), _shape(B)
+    if an != am:
+        raise ValueError('matrix A is not square ({},{})'.format(an, am))
+    if bn != bm:
+        raise ValueError('matrix B is not square ({},{})'.format(bn, bm))
+    if an != bn or am != bm:
+        raise ValueError('dimension mismatch between A {} and B {}, expected identical dimensions'.format((an, am), (bn, bm)))
+    if isinstance(A, Matrix) or isinstance(B, Matrix):
+        return _matmul_matrix(A, B, method, cutoff, workers, mod)
+    return _matmul(A, B, method, cutoff, workers, mod=mod)
+
+def matmul(A, B, method='auto', cutoff=STRASSEN_CUTOFF, workers=None, mod=None):
+    '''Multiply matrices `A` and `B`
+
+    See `matmul_square` for `method`, `cutoff`, `workers`, `mod` and `Matrix` operands.'''
+    (an, am), (bn, bm) = _shape(A), _shape(B)
     if am != bn: 
         raise ValueError('unable to multiply matrices of dimensions ({}),({}): misaligned dimensions ({} != {})'.format((an, am), (bn, bm), am, bn))
-    if an == am == bn == bm:
-        return matmul_square(A, B)
-    n = an
-    m = am
-    p = bm
-    C = zeroes(n, p)
-    for i in range(n):
-        for j in range(p):
-            for k in range(m):
-                C[i][j] += A[i][k] * B[k][j]
-    return C
+    if isinstance(A, Matrix) or isinstance(B, Matrix):
+        return _matmul_matrix(A, B, method, cutoff, workers, mod)
+    return _matmul(A, B, method, cutoff, workers, mod=mod)
     
-def matpow(A, n):
-    '''Raise matrix `A` to integer power `n` (with \\(\\log(n)\\) multiplications)'''
+def matpow(A, n, method='auto', cutoff=STRASSEN_CUTOFF, workers=None, mod=None):
+    '''Raise matrix `A` to integer power `n` (with \\(\\log(n)\\) multiplications)
+
+    See `matmul_square` for `method`, `cutoff`, `workers`, `mod` and `Matrix`
+    operands; a single process pool is shared by all multiplications. Only
+    the running product and the current square are kept, so with `mod`
+    memory stays bounded for any exponent.'''
     if n < 0:
         raise ValueError('expected n >= 0')
     if int(n) != n:
         raise ValueError('expected integer n, got {}'.format(n))
-    if len(A) != len(A[0]):
-        raise ValueError('expected square matrix, got dimensions ({}, {})'.format(len(A), len(A[0])))
-    if n == 0: return identity(n)
+    k, m = _shape(A)
+    if k != m:
+        raise ValueError('expected square matrix, got dimensions ({}, {})'.format(k, m))
+    if isinstance(A, Matrix):
+        if not _flat_engine(method, cutoff, workers, k, k, k):
+            return Matrix.from_lists(matpow(A.tolist(), n, method, cutoff, workers, mod))
+        A = A.copy() if mod is None else _reduce(A, mod)
+        if n == 0:
+            I = Matrix.identity(k, A.typecode)
+            return I if mod is None else _reduce(I, mod)
+        return _matpow(A, int(n), partial(_matmul_flat, mod=mod))
+    if mod is not None:
+        A = [[x % mod for x in row] for row in A]
+    if n == 0: return identity(len(A)) if mod is None else [[x % mod for x in row] for row in identity(len(A))]
     if n == 1: return A
-    acc = deepcopy(A)
-    log_iters = int(log2(n))
-    extra_results = []
-    for i in range(log_iters+1):
-        # do we need to cache this result?
-        if n & (1 << i):
-            extra_results.append(deepcopy(acc))
-        if i < log_iters: 
-            # only update acc when necessary
-            acc = matmul_square(acc, acc)
-    # multiply all cached results together
-    return reduce(matmul_square, extra_results)
+    if workers is not None and workers > 1 and len(A) ** 3 >= PARALLEL_MIN_WORK:
+        with ProcessPoolExecutor(workers) as executor:
+            return _matpow(A, int(n), partial(_matmul, method=method, cutoff=cutoff, workers=workers, executor=executor, mod=mod))
+    return _matpow(A, int(n), partial(_matmul, method=method, cutoff=cutoff, mod=mod))
+
+def _matpow(A, n, multiply):
+    '''Binary exponentiation of `A` by `n` >= 1, multiplying with `multiply`'''
+    result = None
+    while True:
+        if n & 1:
+            result = A if result is None else multiply(result, A)
+        n >>= 1
+        if not n:
+            return result
+        A = multiply(A, A)
 
 def transpose(A):
-    '''Transpose of a matrix `A`'''
+    '''Transpose of a matrix `A` (a view if `A` is a `Matrix`)'''
+    if isinstance(A, Matrix):
+        return A.transpose()
     return list(zip(*A))
 
 def col(A, i):
     '''Get the `i`th column of a matrix `A`'''
+    if isinstance(A, Matrix):
+        return A.col(i)
     return [row[i] for row in A]
 
 def col_range(A, i=None, j=None):
     '''Columns `i`..`j` of a matrix `A` (either `i` or `j` optional)'''
+    if isinstance(A, Matrix):
+        return A.col_range(i, j)
     if i is None and j is None: 
         raise ValueError('expecting non-None value for either i or j')
     if i is None:
@@ -102,6 +563,8 @@ def col_range(A, i=None, j=None):
 
 def row_range(A, i=None, j=None):
     '''Rows `i`..`j` of a matrix `A` (either `i` or `j` optional)'''
+    if isinstance(A, Matrix):
+        return A.row_range(i, j)
     if i is None and j is None: 
         raise ValueError('expecting non-None value for either i or j')
     if i is None:
@@ -113,6 +576,8 @@ def row_range(A, i=None, j=None):
     
 def diag(A):
     '''Diagonal elements of a matrix `A`'''
+    if isinstance(A, Matrix):
+        return A.diag()
     n = min(len(A), len(A[0]))
     return [A[i][i] for i in range(n)]
 
@@ -135,6 +600,15 @@ if __name__ == '__main__':
     ]
     assert matpow(A, n) == expected, 'Failed test: matpow'
 
+    # test matpow mod
+    F = [[1, 1], [1, 0]]
+    assert matpow(F, 90) == [[4660046610375530309, 2880067194370816120], [2880067194370816120, 1779979416004714189]], 'Failed test: matpow (2x2)'
+    assert matpow(F, 90, mod=1000)[0][1] == 2880067194370816120 % 1000, 'Failed test: matpow (mod)'
+    assert matpow(F, 10**18, mod=10**9 + 7)[0][1] == 209783453, 'Failed test: matpow (mod, huge exponent)'
+    T = [[1, 1, 1], [1, 0, 0], [0, 1, 0]]
+    assert matpow(T, 37, mod=97) == [[x % 97 for x in row] for row in matpow(T, 37, method='rows')], 'Failed test: matpow (3x3, mod)'
+    assert matpow(T, 0, mod=1) == zeroes_square(3), 'Failed test: matpow (n = 0, mod)'
+
     # test matmul
     A = [
         [1, 2, 3],
@@ -172,6 +646,27 @@ if __name__ == '__main__':
     ]
     assert matmul_square(A, B) == expected, 'Failed test: matmul_square'
 
+    # test matmul engines
+    from random import Random
+    rng = Random(0)
+    A = [[rng.randint(-9, 9) for _ in range(37)] for _ in range(45)]
+    B = [[rng.randint(-9, 9) for _ in range(29)] for _ in range(37)]
+    expected = [[sum(A[i][k] * B[k][j] for k in range(37)) for j in range(29)] for i in range(45)]
+    for method in MATMUL_METHODS:
+        assert matmul(A, B, method, cutoff=4) == expected, 'Failed test: matmul ({})'.format(method)
+    assert _matmul_tiled(A, B, tile=5) == expected, 'Failed test: matmul (tiled)'
+    for method in MATMUL_METHODS:
+        assert matmul(A, B, method, cutoff=4, mod=13) == [[x % 13 for x in row] for row in expected], 'Failed test: matmul ({}, mod)'.format(method)
+    A = [[rng.randint(-9, 9) for _ in range(20)] for _ in range(20)]
+    assert matpow(A, 7, 'strassen', cutoff=3) == matpow(A, 7, 'rows'), 'Failed test: matpow (strassen)'
+
+    # test parallel matmul
+    assert _matmul_parallel(A, B[:20], 3) == matmul(A, B[:20]), 'Failed test: matmul (parallel, int)'
+    F = [[x / 7 for x in row] for row in A]
+    assert _matmul_parallel(F, F, 2) == _matmul_rows(F, F), 'Failed test: matmul (parallel, float)'
+    assert _matmul_parallel([[1 << 40]], [[1 << 40]], 2) is None, 'Failed test: matmul (parallel, overflow)'
+    assert _matmul_parallel(A, A, 2, mod=1 << 62) == matmul(A, A, mod=1 << 62), 'Failed test: matmul (parallel, mod)'
+
     # test identity
     n = 3
     expected = [
@@ -258,4 +753,40 @@ if __name__ == '__main__':
     expected = [1, 5]
     assert diag(A) == expected, 'Failed test: diag'
 
+    # test Matrix
+    A = [
+        [1, 2, 3],
+        [4, 5, 6]
+    ]
+    M = Matrix.from_lists(A)
+    assert M.typecode == 'q' and M.tolist() == A, 'Failed test: Matrix.from_lists'
+    assert Matrix.from_lists([[1.5, 2], [3, 4]]).typecode == 'd', 'Failed test: Matrix.from_lists'
+    T = transpose(M)
+    assert T.data is M.data and T == [[1, 4], [2, 5], [3, 6]], 'Failed test: Matrix.transpose'
+    V = col_range(row_range(M, 1), 1, 2)
+    assert V.data is M.data and V == [[5, 6]], 'Failed test: Matrix views'
+    V[0, 0] = 50
+    assert M[1, 1] == 50 and M[1] == [4, 50, 6], 'Failed test: Matrix view writes'
+    M[1, 1] = 5
+    assert T.row_range(1, 2).col(1) == [5, 6], 'Failed test: Matrix.col'
+    assert diag(T) == [1, 5] and T.copy().is_contiguous(), 'Failed test: Matrix.diag'
+    assert Matrix.identity(3) == identity(3), 'Failed test: Matrix.identity'
+    assert Matrix.zeroes(3, 4) == zeroes(3, 4), 'Failed test: Matrix.zeroes'
+    B = [
+        [1, 3, 0, 3],
+        [4, 2, 5, 0],
+        [0, 6, 4, 6]
+    ]
+    assert matmul(M, Matrix.from_lists(B)) == matmul(A, B), 'Failed test: matmul (Matrix)'
+    assert matmul(T, M) == matmul(transpose(A), A), 'Failed test: matmul (Matrix view)'
+    S = Matrix.from_lists([[1, 1], [1, 0]])
+    assert matpow(S, 10) == [[89, 55], [55, 34]], 'Failed test: matpow (Matrix)'
+    assert matpow(S, 0) == identity(2), 'Failed test: matpow (n = 0)'
+    C = matmul(T, B[:2])
+    assert isinstance(C, Matrix) and C.typecode == 'q' and C == matmul(transpose(A), B[:2]), 'Failed test: matmul (Matrix and list)'
+    assert matmul(M, Matrix.from_lists([[0.5], [1], [2]])) == [[8.5], [19]], 'Failed test: matmul (float Matrix)'
+    for method in MATMUL_METHODS:
+        assert matmul(M, Matrix.from_lists(B), method=method, cutoff=1, mod=7) == matmul(A, B, mod=7), 'Failed test: matmul (Matrix, {})'.format(method)
+    assert matpow(S, 90, mod=1000) == matpow([[1, 1], [1, 0]], 90, mod=1000) and matpow(S, 0, mod=1) == [[0, 0], [0, 0]], 'Failed test: matpow (Matrix, mod)'
+
     print('Passed all tests.')
\ No newline at end of file
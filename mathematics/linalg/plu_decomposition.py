@@ -6,19 +6,98 @@ See `plu_decomposition_utils` for underlying implementation.
 Source:  https://en.m.wikipedia.org/wiki/LU_decomposition#C_code_example
 '''
 
-from .matrix import diag, matmul
+from .matrix import diag, matmul, Matrix, _unwrap
 from .plu_decomposition_utils import *
 
 from copy import deepcopy
-from math import prod
+from math import prod, log, fsum
 
-def PLUDecomposition(A, tolerance=1e-9):
+class LUFactorization:
+    '''Reusable PLU factorization of a square matrix `A`
+
+    Holds the packed \\((L - I) + U\\) matrix `LU` and the permutation vector
+    `P` computed by `LUPDecompose` (or `LUPDecomposeBlocked` from dimension
+    `LU_BLOCKED_MIN_SIZE`), so any number of solves, the determinant
+    and the inverse all share a single \\(O(n^3)\\) factorization.
+
+    Input:
+
+     - `A`: an \\(n \\times n\\) matrix (nested lists or `Matrix`)
+     - `tolerance`: threshold for considering a float equal to 0. Defaults to `1e-9`
+     - `overwrite_a`: factor `A` in place instead of a copy. Defaults to `False`
+
+    If `A` is singular/degenerate this will throw.'''
+
+    __slots__ = ('LU', 'P', 'N')
+
+    def __init__(self, A, tolerance=1e-9, overwrite_a=False):
+        if isinstance(A, Matrix):
+            A = A.tolist()
+        elif not overwrite_a:
+            A = [list(row) for row in A]
+        if len(A) != len(A[0]):
+            raise ValueError('expected a square matrix, got dimensions ({},{})'.format(len(A), len(A[0])))
+        N = len(A)
+        decompose = LUPDecomposeBlocked if N >= LU_BLOCKED_MIN_SIZE else LUPDecompose
+        status, P = decompose(A, N, tolerance)
+        if status == 0:
+            raise ArithmeticError('degenerate matrix detected')
+        self.LU = A
+        self.P = P
+        self.N = N
+
+    def _sign(self):
+        return -1 if (self.P[self.N] - self.N) % 2 else 1
+
+    def solve(self, b):
+        '''Solution \\(\\vec x\\) to \\(A\\vec x = b\\) for a list (vector) `b` of length \\(n\\)'''
+        if len(b) != self.N:
+            raise ValueError('expected b of length {}, got {}'.format(self.N, len(b)))
+        return LUPSolve(self.LU, self.P, b, self.N)
+
+    def solve_many(self, B):
+        '''Solution \\(X\\) to \\(AX = B\\) for an \\(n \\times k\\) matrix `B`
+
+        Each column of `B` is a right-hand side; all columns are eliminated
+        together in one pass over `LU`, giving the same result as calling
+        `solve` on each column.'''
+        B = _unwrap(B)
+        if len(B) != self.N:
+            raise ValueError('expected B with {} rows, got {}'.format(self.N, len(B)))
+        return LUPSolveMany(self.LU, self.P, B, self.N)
+
+    def det(self):
+        '''Determinant \\(\\det A\\)'''
+        return prod(diag(self.LU)) * self._sign()
+
+    def logdet(self):
+        '''Sign and natural log of the absolute value of \\(\\det A\\), as a tuple `(sign, logabsdet)`
+
+        Unlike `det`, this does not overflow or underflow for large matrices.'''
+        d = diag(self.LU)
+        sign = self._sign()
+        for u in d:
+            if u < 0: sign = -sign
+        return sign, fsum(log(abs(u)) for u in d)
+
+    def inverse(self):
+        '''Inverse \\(A^{-1}\\)'''
+        return LUPInvert(self.LU, self.P, self.N)
+
+    def factors(self):
+        '''Permutation, lower and upper triangular matrices `(P, L, U)` with \\(PA = LU\\)'''
+        L, U = extractLU(self.LU, self.N)
+        return expandP(self.P), L, U
+
+def PLUDecomposition(A, tolerance=1e-9, overwrite_a=False, packed=False):
     '''PLU decomposition of a matrix `A`
     
     Input:
     
      - `A`: an \\(n \\times n\\) matrix
      - `tolerance`: threshold for considering a float equal to 0. Defaults to `1e-9`
+     - `overwrite_a`: decompose `A` in place instead of a copy. Defaults to `False`
+     - `packed`: return an `LUFactorization` instead of expanded matrices. Defaults to `False`
 
     Output:
 
@@ -30,46 +109,36 @@ def PLUDecomposition(A, tolerance=1e-9):
 
     Side effects:
 
-     - Modifies `A` in place
+     - Modifies `A` in place if `overwrite_a` is set (a `Matrix` is always unpacked into a copy)
     
     If `A` is singular/degenerate this will throw.'''
-    if len(A) != len(A[0]):
-        raise ValueError('expected a square matrix, got dimensions ({},{})'.format(len(A), len(A[0])))
-    N = len(A)
-    status, P = LUPDecompose(A, N, tolerance)
-    if status == 0:
-        raise ArithmeticError('degenerate matrix detected')
-    L, U = extractLU(A, N)
-    P = expandP(P)
-    return P, L, U
+    factorization = LUFactorization(A, tolerance, overwrite_a)
+    return factorization if packed else factorization.factors()
 
-def PLUDeterminant(A, tolerance=1e-9):
+def PLUDeterminant(A, tolerance=1e-9, overwrite_a=False):
     '''Determinant of a \\(n \\times n\\) matrix `A` using PLU decomposition
     
     Input:
     
      - `A`: an \\(n \\times n\\) matrix
      - `tolerance`: threshold for considering a float equal to 0. Defaults to `1e-9`
+     - `overwrite_a`: decompose `A` in place instead of a copy. Defaults to `False`
 
     Output:
 
      - `d`: \\(\\det A\\)
 
+    The result is a float; for the exact determinant of an integer matrix,
+    see `det_bareiss` in `determinant`.
+
     Side effects:
 
-     - Modifies `A` in place
+     - Modifies `A` in place if `overwrite_a` is set (a `Matrix` is always unpacked into a copy)
     
     If `A` is singular/degenerate this will throw.'''
-    if len(A) != len(A[0]):
-        raise ValueError('expected a square matrix, got dimensions ({},{})'.format(len(A), len(A[0])))
-    N = len(A)
-    status, P = LUPDecompose(A, N, tolerance)
-    if status == 0:
-        raise ArithmeticError('degenerate matrix detected')
-    L, U = extractLU(A, N)
-    return prod(diag(L)) * prod(diag(U)) * (-1 if (P[N] - N) % 2 else 1)
+    return LUFactorization(A, tolerance, overwrite_a).det()
 
-def PLUSolve(A, b, tolerance=1e-9):
+def PLUSolve(A, b, tolerance=1e-9, overwrite_a=False):
     '''Solution \\(\\vec x\\) to \\(A\\vec x = b\\) using PLU decomposition
     
     Input:
@@ -77,6 +146,7 @@ def PLUSolve(A, b, tolerance=1e-9):
      - `A`: an \\(n \\times n\\) matrix
      - `b`: a list (vector) of length \\(n\\)
      - `tolerance`: threshold for considering a float equal to 0. Defaults to `1e-9`
+     - `overwrite_a`: decompose `A` in place instead of a copy. Defaults to `False`
 
     Output:
 
@@ -84,24 +154,21 @@ def PLUSolve(A, b, tolerance=1e-9):
 
     Side effects:
 
-     - Modifies `A` in place
+     - Modifies `A` in place if `overwrite_a` is set (a `Matrix` is always unpacked into a copy)
     
+    To solve several systems with the same `A`, use `LUFactorization` instead.
+
     If `A` is singular/degenerate this will throw.'''
-    if len(A) != len(A[0]):
-        raise ValueError('expected a square matrix, got dimensions ({},{})'.format(len(A), len(A[0])))
-    N = len(A)
-    status, P = LUPDecompose(A, N, tolerance)
-    if status == 0:
-        raise ArithmeticError('degenerate matrix detected')
-    return LUPSolve(A, P, b, N)
+    return LUFactorization(A, tolerance, overwrite_a).solve(b)
 
-def PLUInvert(A, tolerance=1e-9):
+def PLUInvert(A, tolerance=1e-9, overwrite_a=False):
     '''Invert a matrix `A` using PLU decomposition
     
     Input:
     
      - `A`: an \\(n \\times n\\) matrix
      - `tolerance`: threshold for considering a float equal to 0. Defaults to `1e-9`
+     - `overwrite_a`: decompose `A` in place instead of a copy. Defaults to `False`
 
     Output:
 
@@ -109,16 +176,10 @@ def PLUInvert(A, tolerance=1e-9):
 
     Side effects:
 
-     - Modifies `A` in place
+     - Modifies `A` in place if `overwrite_a` is set (a `Matrix` is always unpacked into a copy)
     
     If `A` is singular/degenerate this will throw.'''
-    if len(A) != len(A[0]):
-        raise ValueError('expected a square matrix, got dimensions ({},{})'.format(len(A), len(A[0])))
-    N = len(A)
-    status, P = LUPDecompose(A, N, tolerance)
-    if status == 0:
-        raise ArithmeticError('degenerate matrix detected')
-    return LUPInvert(A, P, N)
+    return LUFactorization(A, tolerance, overwrite_a).inverse()
 
 if __name__ == "__main__":
     N = 4
@@ -142,6 +203,9 @@ if __name__ == "__main__":
     expected = [16.75, 3.2499999999999996, 5.500000000000001, -7.0]
     assert x == expected, 'Failed test: PLUSolve'
 
+    M = Matrix.from_lists(A_init)
+    assert PLUSolve(M, b) == expected and M == A_init, 'Failed test: PLUSolve (Matrix)'
+
     L, U = extractLU(A, N)
     P = expandP(P)
     assert matmul(L, U) == matmul(P, A_init), 'Failed tests: extractLU, expandP, PLUDecomposition'
@@ -160,4 +224,21 @@ if __name__ == "__main__":
     ]
     assert IA == expected, 'Failed test: PLUInvert'
 
+    # test LUFactorization
+    A = deepcopy(A_init)
+    F = PLUDecomposition(A, packed=True)
+    assert A == A_init, 'Failed test: PLUDecomposition (overwrite_a=False)'
+    assert F.solve(b) == PLUSolve(A, b), 'Failed test: LUFactorization.solve'
+    assert F.det() == PLUDeterminant(A), 'Failed test: LUFactorization.det'
+    assert F.inverse() == expected, 'Failed test: LUFactorization.inverse'
+    sign, logabsdet = F.logdet()
+    assert sign == -1 and abs(logabsdet - log(4)) < 1e-12, 'Failed test: LUFactorization.logdet'
+    B = [[4, 1], [2, 0], [5, 2], [3, -1]]
+    X = F.solve_many(B)
+    assert [list(row) for row in zip(*X)] == [F.solve(c) for c in zip(*B)], 'Failed test: LUFactorization.solve_many'
+    P, L, U = F.factors()
+    assert matmul(L, U) == matmul(P, A_init), 'Failed test: LUFactorization.factors'
+    PLUDeterminant(A, overwrite_a=True)
+    assert A != A_init, 'Failed test: PLUDeterminant (overwrite_a=True)'
+
     print('Passed all tests.')
\ No newline at end of file
@@ -7,6 +7,8 @@ Source:  https://en.m.wikipedia.org/wiki/LU_decomposition#C_code_example
 from .matrix import zeroes_square, matmul
 
 from copy import deepcopy
+from functools import reduce
+from operator import mul, sub
 
 def LUPDecompose(A, N, tolerance):
     '''Helper function for PLU decomposition
@@ -34,51 +36,117 @@ def LUPDecompose(A, N, tolerance):
     '''
     P = list(range(N + 1))
     for i in range(N):
-        maxA = 0.0
-        imax = i
-        for k in range(i, N):
-            absA = abs(A[k][i])
-            if absA > maxA:
-                maxA = absA
-                imax = k
+        col = [abs(A[k][i]) for k in range(i, N)]
+        maxA = max(col)
         if maxA < tolerance:
             return 0, P  # Failure, matrix is degenerate
+        imax = i + col.index(maxA)
         if imax != i:
             P[i], P[imax] = P[imax], P[i]
             A[i], A[imax] = A[imax], A[i]
             P[N] += 1
+        Ai = A[i]
+        pivot = Ai[i]
+        tail = Ai[i + 1:]
         for j in range(i + 1, N):
-            A[j][i] /= A[i][i]
-            for k in range(i + 1, N):
-                A[j][k] -= A[j][i] * A[i][k]
+            Aj = A[j]
+            f = Aj[i] / pivot
+            Aj[i] = f
+            Aj[i + 1:] = [x - f * y for x, y in zip(Aj[i + 1:], tail)]
+    return 1, P  # Decomposition done
+
+LU_BLOCK_SIZE = 32
+'''Panel width used by `LUPDecomposeBlocked`'''
+
+LU_BLOCKED_MIN_SIZE = 200
+'''Dimension from which `plu_decomposition` factors with `LUPDecomposeBlocked`'''
+
+def LUPDecomposeBlocked(A, N, tolerance, block_size=LU_BLOCK_SIZE):
+    '''Blocked variant of `LUPDecompose` for large `N`
+
+    Same input, output and side effects as `LUPDecompose`, including the
+    `P[N]` swap count. Columns are factored in panels of `block_size`; the
+    rest of the matrix is then updated once per panel, with each entry
+    reduced by a single `block_size`-long dot product instead of
+    `block_size` separate updates. Results may differ from `LUPDecompose`
+    in the last bits because of the different summation order.
+    '''
+    P = list(range(N + 1))
+    for k0 in range(0, N, block_size):
+        k1 = min(k0 + block_size, N)
+        # factor the panel of columns k0..k1-1
+        for i in range(k0, k1):
+            col = [abs(A[k][i]) for k in range(i, N)]
+            maxA = max(col)
+            if maxA < tolerance:
+                return 0, P  # Failure, matrix is degenerate
+            imax = i + col.index(maxA)
+            if imax != i:
+                P[i], P[imax] = P[imax], P[i]
+                A[i], A[imax] = A[imax], A[i]
+                P[N] += 1
+            Ai = A[i]
+            pivot = Ai[i]
+            tail = Ai[i + 1:k1]
+            for j in range(i + 1, N):
+                Aj = A[j]
+                f = Aj[i] / pivot
+                Aj[i] = f
+                Aj[i + 1:k1] = [x - f * y for x, y in zip(Aj[i + 1:k1], tail)]
+        if k1 == N:
+            break
+        # solve for the block row of U right of the panel
+        for i in range(k0 + 1, k1):
+            Ai = A[i]
+            row = Ai[k1:]
+            for t in range(k0, i):
+                f = Ai[t]
+                row = [x - f * y for x, y in zip(row, A[t][k1:])]
+            Ai[k1:] = row
+        # update the trailing submatrix with one dot product per entry
+        U = list(zip(*[A[t][k1:] for t in range(k0, k1)]))
+        for j in range(k1, N):
+            Aj = A[j]
+            l = Aj[k0:k1]
+            Aj[k1:] = [x - sum(map(mul, l, u)) for x, u in zip(Aj[k1:], U)]
     return 1, P  # Decomposition done
 
 def LUPSolve(A, P, b, N):
     '''Helper function for solving \\(A\\vec x = B\\) using PLU decomposition'''
     x = [0] * N
     for i in range(N):
-        x[i] = b[P[i]]
+        x[i] = reduce(sub, map(mul, A[i][:i], x), b[P[i]])
+    for i in range(N - 1, -1, -1):
+        Ai = A[i]
+        x[i] = reduce(sub, map(mul, Ai[i + 1:], x[i + 1:]), x[i]) / Ai[i]
+    return x
+
+def LUPSolveMany(A, P, B, N):
+    '''Helper function for solving \\(AX = B\\) for every column of `B` at once using PLU decomposition'''
+    X = []
+    for i in range(N):
+        row = list(B[P[i]])
+        Ai = A[i]
         for k in range(i):
-            x[i] -= A[i][k] * x[k]
+            a = Ai[k]
+            row = [x - a * y for x, y in zip(row, X[k])]
+        X.append(row)
     for i in range(N - 1, -1, -1):
+        row = X[i]
+        Ai = A[i]
         for k in range(i + 1, N):
-            x[i] -= A[i][k] * x[k]
-        x[i] /= A[i][i]
-    return x
+            a = Ai[k]
+            row = [x - a * y for x, y in zip(row, X[k])]
+        d = Ai[i]
+        X[i] = [x / d for x in row]
+    return X
 
 def LUPInvert(A, P, N):
     '''Helper function for inverting a matrix using PLU decomposition'''
-    IA = [[0] * N for _ in range(N)]
-    for j in range(N):
-        for i in range(N):
-            IA[i][j] = 1.0 if P[i] == j else 0.0
-            for k in range(i):
-                IA[i][j] -= A[i][k] * IA[k][j]
-        for i in range(N - 1, -1, -1):
-            for k in range(i + 1, N):
-                IA[i][j] -= A[i][k] * IA[k][j]
-            IA[i][j] /= A[i][i]
-    return IA
+    I = [[0.0] * N for _ in range(N)]
+    for i in range(N):
+        I[i][i] = 1.0
+    return LUPSolveMany(A, P, I, N)
 
 def extractLU(A, N):
     '''Extracts matrices `L` and `U` from `A`. 
@@ -122,6 +190,18 @@ if __name__ == "__main__":
     expected = [16.75, 3.2499999999999996, 5.500000000000001, -7.0]
     assert x == expected, 'Failed test: LUPSolve'
 
+    # test LUPDecomposeBlocked
+    B = deepcopy(A_init)
+    status, PB = LUPDecomposeBlocked(B, N, tolerance, block_size=3)
+    assert status == 1 and PB == P, 'Failed test: LUPDecomposeBlocked'
+    assert all(abs(x - y) < 1e-12 for r, s in zip(A, B) for x, y in zip(r, s)), 'Failed test: LUPDecomposeBlocked'
+    assert LUPDecomposeBlocked([[1, 2], [2, 4]], 2, tolerance)[0] == 0, 'Failed test: LUPDecomposeBlocked (degenerate)'
+
+    # test LUPSolveMany
+    X = LUPSolveMany(A, P, [[4, 0], [2, 1], [5, 0], [3, 0]], N)
+    assert [row[0] for row in X] == x, 'Failed test: LUPSolveMany'
+    assert [row[1] for row in X] == LUPSolve(A, P, [0, 1, 0, 0], N), 'Failed test: LUPSolveMany'
+
     # test LUPInvert
     IA = LUPInvert(A, P, N)
     expected = [
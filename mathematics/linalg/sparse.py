@@ -0,0 +1,379 @@
+'''
+Sparse matrix utilities.
+
+`COOMatrix` (coordinate list) is convenient for building a matrix entry by
+entry; `CSRMatrix` (compressed sparse rows) is the format the products and
+solves below run on. Both store only the nonzero entries: row/column indices
+are kept in `array('q')`s and values in a plain list, so exact integer values
+(e.g. path counts) never overflow. Memory scales with the number of nonzero
+entries rather than \\(n^2\\).
+'''
+
+from array import array
+from operator import mul
+
+class COOMatrix:
+    '''Sparse matrix in coordinate format
+
+    Entry `k` is `data[k]` at position `(rows[k], cols[k])`. Duplicate
+    positions are allowed and are summed on conversion.'''
+
+    __slots__ = ('rows', 'cols', 'data', 'shape')
+
+    def __init__(self, rows, cols, data, shape):
+        if not len(rows) == len(cols) == len(data):
+            raise ValueError('expected rows, cols and data of equal length, got {}, {}, {}'.format(len(rows), len(cols), len(data)))
+        n, m = shape
+        if n <= 0 or m <= 0: raise ValueError('expecting n >= 1 and m >= 1')
+        self.rows = array('q', rows)
+        self.cols = array('q', cols)
+        self.data = list(data)
+        self.shape = (n, m)
+
+    @classmethod
+    def from_dense(cls, A):
+        '''Nonzero entries of the nested list matrix `A`'''
+        rows, cols, data = array('q'), array('q'), []
+        for i, row in enumerate(A):
+            for j, x in enumerate(row):
+                if x:
+                    rows.append(i)
+                    cols.append(j)
+                    data.append(x)
+        return cls(rows, cols, data, (len(A), len(A[0])))
+
+    @property
+    def nnz(self):
+        '''Number of stored entries'''
+        return len(self.data)
+
+    def to_dense(self):
+        '''This matrix in nested list form'''
+        n, m = self.shape
+        A = [[0] * m for _ in range(n)]
+        for i, j, x in zip(self.rows, self.cols, self.data):
+            A[i][j] += x
+        return A
+
+    def to_csr(self):
+        '''This matrix in `CSRMatrix` form, with duplicate entries summed'''
+        n, m = self.shape
+        counts = [0] * (n + 1)
+        for i in self.rows:
+            counts[i + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        # counting sort by row, then merge duplicates within each row
+        order = [0] * len(self.data)
+        nxt = counts[:-1]
+        for k, i in enumerate(self.rows):
+            order[nxt[i]] = k
+            nxt[i] += 1
+        indptr, indices, data = array('q', [0]), array('q'), []
+        cols = self.cols
+        for i in range(n):
+            acc = {}
+            for k in order[counts[i]:counts[i + 1]]:
+                j = cols[k]
+                acc[j] = acc.get(j, 0) + self.data[k]
+            for j in sorted(acc):
+                indices.append(j)
+                data.append(acc[j])
+            indptr.append(len(indices))
+        return CSRMatrix(indptr, indices, data, (n, m))
+
+    def transpose(self):
+        '''Transpose of this matrix (shares no storage)'''
+        return COOMatrix(self.cols, self.rows, self.data, self.shape[::-1])
+
+    def __repr__(self):
+        return 'COOMatrix(shape={}, nnz={})'.format(self.shape, self.nnz)
+
+class CSRMatrix:
+    '''Sparse matrix in compressed sparse row format
+
+    The entries of row `i` are `data[indptr[i]:indptr[i+1]]`, in the columns
+    `indices[indptr[i]:indptr[i+1]]` (sorted ascending).'''
+
+    __slots__ = ('indptr', 'indices', 'data', 'shape')
+
+    def __init__(self, indptr, indices, data, shape):
+        n, m = shape
+        if n <= 0 or m <= 0: raise ValueError('expecting n >= 1 and m >= 1')
+        if len(indptr) != n + 1:
+            raise ValueError('expected indptr of length {}, got {}'.format(n + 1, len(indptr)))
+        if len(indices) != len(data) or indptr[n] != len(data):
+            raise ValueError('expected indices and data of length {}'.format(indptr[n]))
+        self.indptr = array('q', indptr)
+        self.indices = array('q', indices)
+        self.data = list(data)
+        self.shape = (n, m)
+
+    @classmethod
+    def from_dense(cls, A):
+        '''Nonzero entries of the nested list matrix `A`'''
+        indptr, indices, data = array('q', [0]), array('q'), []
+        for row in A:
+            for j, x in enumerate(row):
+                if x:
+                    indices.append(j)
+                    data.append(x)
+            indptr.append(len(indices))
+        return cls(indptr, indices, data, (len(A), len(A[0])))
+
+    @classmethod
+    def identity(cls, n):
+        '''An identity matrix of dimension \\(n\\times n\\)'''
+        return cls(range(n + 1), range(n), [1] * n, (n, n))
+
+    @property
+    def nnz(self):
+        '''Number of stored entries'''
+        return len(self.data)
+
+    def row(self, i):
+        '''Column indices and values of the entries in row `i`'''
+        s, e = self.indptr[i], self.indptr[i + 1]
+        return self.indices[s:e], self.data[s:e]
+
+    def to_dense(self):
+        '''This matrix in nested list form'''
+        n, m = self.shape
+        A = [[0] * m for _ in range(n)]
+        indptr, indices, data = self.indptr, self.indices, self.data
+        for i in range(n):
+            row = A[i]
+            for k in range(indptr[i], indptr[i + 1]):
+                row[indices[k]] = data[k]
+        return A
+
+    def to_coo(self):
+        '''This matrix in `COOMatrix` form'''
+        rows = array('q')
+        for i in range(self.shape[0]):
+            rows.extend([i] * (self.indptr[i + 1] - self.indptr[i]))
+        return COOMatrix(rows, self.indices, self.data, self.shape)
+
+    def transpose(self):
+        '''Transpose of this matrix, built with one counting sort over the entries'''
+        n, m = self.shape
+        indptr = [0] * (m + 1)
+        for j in self.indices:
+            indptr[j + 1] += 1
+        for j in range(m):
+            indptr[j + 1] += indptr[j]
+        nxt = indptr[:-1]
+        indices = array('q', bytes(8 * self.nnz))
+        data = [0] * self.nnz
+        for i in range(n):
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                j = self.indices[k]
+                indices[nxt[j]] = i
+                data[nxt[j]] = self.data[k]
+                nxt[j] += 1
+        return CSRMatrix(indptr, indices, data, (m, n))
+
+    def matvec(self, x, mod=None):
+        '''Product \\(A\\vec x\\) with a list (vector) `x`'''
+        return sparse_matvec(self, x, mod)
+
+    def matmul(self, B, mod=None):
+        '''Product with `B`, sparse if `B` is a `CSRMatrix` and dense (nested lists) otherwise'''
+        return sparse_matmul(self, B, mod)
+
+    def __matmul__(self, B):
+        return sparse_matmul(self, B)
+
+    def __repr__(self):
+        return 'CSRMatrix(shape={}, nnz={})'.format(self.shape, self.nnz)
+
+def _as_csr(A):
+    '''`A` as a `CSRMatrix`, converting from COO or nested lists if needed'''
+    if isinstance(A, CSRMatrix):
+        return A
+    if isinstance(A, COOMatrix):
+        return A.to_csr()
+    return CSRMatrix.from_dense(A)
+
+def sparse_matvec(A, x, mod=None):
+    '''Product \\(A\\vec x\\) of a sparse matrix `A` with a list (vector) `x`
+
+    Costs \\(O(\\text{nnz})\\), independent of the number of zero entries.'''
+    A = _as_csr(A)
+    if len(x) != A.shape[1]:
+        raise ValueError('expected x of length {}, got {}'.format(A.shape[1], len(x)))
+    indptr, indices, data = A.indptr, A.indices, A.data
+    get = x.__getitem__
+    y = [sum(map(mul, data[indptr[i]:indptr[i + 1]], map(get, indices[indptr[i]:indptr[i + 1]]))) for i in range(A.shape[0])]
+    if mod is not None:
+        return [v % mod for v in y]
+    return y
+
+def sparse_matmul(A, B, mod=None):
+    '''Product of a sparse matrix `A` with `B`
+
+    If `B` is sparse (`CSRMatrix` or `COOMatrix`) the product is a
+    `CSRMatrix`, computed row by row (Gustavson's algorithm) so that only
+    products of nonzero entries are formed. If `B` is a nested list matrix
+    the product is a nested list matrix, built from the rows of `B` selected
+    by the nonzero entries of `A`. With `mod`, entries are reduced modulo
+    `mod` and entries that become zero are dropped.'''
+    A = _as_csr(A)
+    n, m = A.shape
+    indptr, indices, data = A.indptr, A.indices, A.data
+    if not isinstance(B, (CSRMatrix, COOMatrix)):
+        if len(B) != m:
+            raise ValueError('unable to multiply matrices of dimensions ({}),({}): misaligned dimensions ({} != {})'.format((n, m), (len(B), len(B[0])), m, len(B)))
+        p = len(B[0])
+        C = []
+        for i in range(n):
+            row = [0] * p
+            for k in range(indptr[i], indptr[i + 1]):
+                a = data[k]
+                row = [c + a * b for c, b in zip(row, B[indices[k]])]
+            C.append(row if mod is None else [c % mod for c in row])
+        return C
+    B = _as_csr(B)
+    if B.shape[0] != m:
+        raise ValueError('unable to multiply matrices of dimensions ({}),({}): misaligned dimensions ({} != {})'.format((n, m), B.shape, m, B.shape[0]))
+    bptr, bind, bdata = B.indptr, B.indices, B.data
+    cptr, cind, cdata = array('q', [0]), array('q'), []
+    for i in range(n):
+        acc = {}
+        get = acc.get
+        for k in range(indptr[i], indptr[i + 1]):
+            a = data[k]
+            r = indices[k]
+            s, e = bptr[r], bptr[r + 1]
+            for j, b in zip(bind[s:e], bdata[s:e]):
+                acc[j] = get(j, 0) + a * b
+        for j in sorted(acc):
+            v = acc[j] if mod is None else acc[j] % mod
+            if v:
+                cind.append(j)
+                cdata.append(v)
+        cptr.append(len(cind))
+    return CSRMatrix(cptr, cind, cdata, (n, B.shape[1]))
+
+def sparse_matpow(A, n, mod=None):
+    '''Raise square sparse matrix `A` to integer power `n` (with \\(\\log(n)\\) sparse multiplications)'''
+    A = _as_csr(A)
+    if n < 0:
+        raise ValueError('expected n >= 0')
+    if int(n) != n:
+        raise ValueError('expected integer n, got {}'.format(n))
+    if A.shape[0] != A.shape[1]:
+        raise ValueError('expected square matrix, got dimensions {}'.format(A.shape))
+    n = int(n)
+    result = CSRMatrix.identity(A.shape[0])
+    if mod is not None:
+        A = sparse_matmul(result, A, mod)
+        # the identity reduced modulo mod, which is zero for mod = 1
+        result = sparse_matmul(result, result, mod)
+    while n:
+        if n & 1:
+            result = sparse_matmul(result, A, mod)
+        n >>= 1
+        if n:
+            A = sparse_matmul(A, A, mod)
+    return result
+
+def sparse_triangular_solve(A, b, lower=True, unit_diagonal=False):
+    '''Solution \\(\\vec x\\) to \\(A\\vec x = b\\) for a sparse triangular matrix `A`
+
+    Input:
+
+     - `A`: an \\(n \\times n\\) lower (or upper, if `lower` is `False`) triangular sparse matrix
+     - `b`: a list (vector) of length \\(n\\)
+     - `lower`: whether `A` is lower triangular. Defaults to `True`
+     - `unit_diagonal`: treat the diagonal of `A` as all ones (it need not be stored). Defaults to `False`
+
+    Output:
+
+     - `x`: solution vector to \\(A\\vec x = b\\)
+
+    Runs in \\(O(n + \\text{nnz})\\); entries on the wrong side of the
+    diagonal are ignored. If a diagonal entry is missing or zero this will throw.'''
+    A = _as_csr(A)
+    n = A.shape[0]
+    if n != A.shape[1]:
+        raise ValueError('expected a square matrix, got dimensions {}'.format(A.shape))
+    if len(b) != n:
+        raise ValueError('expected b of length {}, got {}'.format(n, len(b)))
+    indptr, indices, data = A.indptr, A.indices, A.data
+    x = [0] * n
+    for i in (range(n) if lower else range(n - 1, -1, -1)):
+        s = b[i]
+        d = 1 if unit_diagonal else 0
+        for k in range(indptr[i], indptr[i + 1]):
+            j = indices[k]
+            if j == i:
+                if not unit_diagonal:
+                    d = data[k]
+            elif (j < i) == lower:
+                s -= data[k] * x[j]
+        if d == 0:
+            raise ArithmeticError('degenerate matrix detected')
+        x[i] = s / d
+    return x
+
+if __name__ == '__main__':
+    from .matrix import matpow
+
+    # test COOMatrix
+    A = [
+        [0, 2, 0, 0],
+        [1, 0, 0, 3],
+        [0, 0, 0, 0],
+        [0, 4, 5, 0]
+    ]
+    coo = COOMatrix.from_dense(A)
+    assert coo.nnz == 5 and coo.to_dense() == A, 'Failed test: COOMatrix'
+    coo = COOMatrix([3, 0, 0, 1], [1, 1, 1, 0], [4, 1, 1, 1], (4, 4))
+    assert coo.to_csr().to_dense() == [[0, 2, 0, 0], [1, 0, 0, 0], [0, 0, 0, 0], [0, 4, 0, 0]], 'Failed test: COOMatrix.to_csr'
+
+    # test CSRMatrix
+    csr = CSRMatrix.from_dense(A)
+    assert list(csr.indptr) == [0, 1, 3, 3, 5] and csr.to_dense() == A, 'Failed test: CSRMatrix'
+    assert csr.to_coo().to_csr().to_dense() == A, 'Failed test: CSRMatrix.to_coo'
+    assert csr.transpose().to_dense() == [list(row) for row in zip(*A)], 'Failed test: CSRMatrix.transpose'
+
+    # test sparse_matvec
+    x = [1, 2, 3, 4]
+    assert sparse_matvec(csr, x) == [4, 13, 0, 23], 'Failed test: sparse_matvec'
+
+    # test sparse_matmul
+    B = [
+        [1, 3, 0],
+        [4, 2, 5],
+        [0, 6, 4],
+        [1, 0, 1]
+    ]
+    expected = [[sum(A[i][k] * B[k][j] for k in range(4)) for j in range(3)] for i in range(4)]
+    assert sparse_matmul(csr, B) == expected, 'Failed test: sparse_matmul (dense)'
+    assert sparse_matmul(csr, CSRMatrix.from_dense(B)).to_dense() == expected, 'Failed test: sparse_matmul (sparse)'
+    assert (csr @ csr).to_dense() == sparse_matmul(csr, A), 'Failed test: sparse_matmul (sparse)'
+
+    # test sparse_matpow
+    expected = A
+    for _ in range(6):
+        expected = sparse_matmul(csr, expected)
+    assert sparse_matpow(csr, 7).to_dense() == expected, 'Failed test: sparse_matpow'
+    assert sparse_matpow(csr, 7, mod=10).to_dense() == [[x % 10 for x in row] for row in expected], 'Failed test: sparse_matpow (mod)'
+    assert sparse_matpow(csr, 0).to_dense() == CSRMatrix.identity(4).to_dense(), 'Failed test: sparse_matpow (n = 0)'
+    assert sparse_matpow(csr, 1, mod=3).to_dense() == [[x % 3 for x in row] for row in A], 'Failed test: sparse_matpow (n = 1, mod)'
+    assert sparse_matpow(csr, 0, mod=1).to_dense() == matpow(A, 0, mod=1) == [[0] * 4 for _ in range(4)], 'Failed test: sparse_matpow (n = 0, mod)'
+
+    # test sparse_triangular_solve
+    L = [
+        [2, 0, 0],
+        [1, 4, 0],
+        [0, 3, 5]
+    ]
+    b = [2, 9, 20]
+    assert sparse_triangular_solve(L, b) == [1.0, 2.0, 2.8], 'Failed test: sparse_triangular_solve (lower)'
+    U = [list(row) for row in zip(*L)]
+    assert sparse_triangular_solve(U, [5, 7, 5], lower=False) == [2.0, 1.0, 1.0], 'Failed test: sparse_triangular_solve (upper)'
+    assert sparse_triangular_solve([[0, 0], [3, 0]], [1, 5], unit_diagonal=True) == [1.0, 2.0], 'Failed test: sparse_triangular_solve (unit diagonal)'
+
+    print('Passed all tests.')
@@ -1,18 +1,26 @@
 '''
 Vector utilities.
+
+The functions prefixed with `batch_` operate on a whole `VectorBatch` of
+same-dimension vectors per call, which avoids the per-call and per-vector
+overhead of the single-vector functions when processing many small (e.g. 2d
+or 3d) vectors.
 '''
 
 from math import sqrt, atan, pi
+from array import array
+from itertools import repeat
+from operator import add as _add, sub as _sub, mul as _mul
 
 def dot(u, v):
     '''Dot product of vectors `u` and `v`'''
     if len(u) != len(v):
         raise ValueError('u and v should have same length')
-    return sum(x*y for x,y in zip(u,v))
+    return sum(map(_mul, u, v))
 
 def norm(v):
     '''Euclidean norm of a vector `v`'''
-    return sqrt(sum(x*x for x in v))
+    return sqrt(sum(map(_mul, v, v)))
 
 def angle(u, v):
     '''Positive angle between 2d vectors `u` and `v` in the plane'''
@@ -58,6 +66,145 @@ def divide_scalar(u, s):
     '''Divide vector `u` by scalar `s`'''
     return [x/s for x in u]
 
+class VectorBatch:
+    '''Collection of vectors of the same dimension, stored as parallel columns
+
+    `columns[k]` is an `array('d')` holding the `k`th component of every
+    vector (structure of arrays), so a batch of \\(n\\) 3d vectors is three
+    flat arrays of \\(n\\) floats rather than \\(n\\) lists.'''
+
+    __slots__ = ('columns',)
+
+    def __init__(self, columns):
+        columns = [c if isinstance(c, array) and c.typecode == 'd' else array('d', c) for c in columns]
+        if not columns:
+            raise ValueError('expected at least one column')
+        if any(len(c) != len(columns[0]) for c in columns):
+            raise ValueError('expected columns of equal length')
+        self.columns = columns
+
+    @classmethod
+    def from_vectors(cls, vectors, dim=None):
+        '''Batch of the given list of vectors (`dim` is required if `vectors` is empty)'''
+        if dim is None:
+            dim = len(vectors[0])
+        if any(len(v) != dim for v in vectors):
+            raise ValueError('expected vectors of length {}'.format(dim))
+        return cls([array('d', [v[k] for v in vectors]) for k in range(dim)])
+
+    @classmethod
+    def zeroes(cls, n, dim):
+        '''Batch of `n` zero vectors of dimension `dim`'''
+        return cls([array('d', bytes(8 * n)) for _ in range(dim)])
+
+    @property
+    def dim(self):
+        '''Dimension of the vectors'''
+        return len(self.columns)
+
+    def tolist(self):
+        '''The vectors as a list of lists'''
+        return [list(v) for v in zip(*self.columns)]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, i):
+        return [c[i] for c in self.columns]
+
+def _check_batches(*batches):
+    '''Raise unless all `batches` hold the same number of vectors of the same dimension'''
+    n, dim = len(batches[0]), batches[0].dim
+    for b in batches[1:]:
+        if len(b) != n or b.dim != dim:
+            raise ValueError('expected batches of {} vectors of dimension {}, got {} of dimension {}'.format(n, dim, len(b), b.dim))
+
+def _scalars(s, n):
+    '''An iterable over `n` scalars: `s` repeated, or the per-vector values in `s`'''
+    if isinstance(s, (int, float)):
+        return repeat(s, n)
+    if len(s) != n:
+        raise ValueError('expected {} scalars, got {}'.format(n, len(s)))
+    return s
+
+def _store(out, values):
+    '''Write the array `values` into the array `out` (if given) and return the result'''
+    if out is None:
+        return values
+    if len(out) != len(values):
+        raise ValueError('expected out of length {}, got {}'.format(len(values), len(out)))
+    out[:] = values
+    return out
+
+def _batch_out(out, n, dim):
+    '''Batch `out` checked to hold `n` vectors of dimension `dim`, or a new zero batch'''
+    if out is None:
+        return VectorBatch.zeroes(n, dim)
+    if len(out) != n or out.dim != dim:
+        raise ValueError('expected out with {} vectors of dimension {}'.format(n, dim))
+    return out
+
+def batch_dot(U, V, out=None):
+    '''Pairwise dot products of the vectors in batches `U` and `V`, as an `array('d')` (written into `out`, if given)'''
+    _check_batches(U, V)
+    cols = zip(U.columns, V.columns)
+    u, v = next(cols)
+    acc = array('d', map(_mul, u, v))
+    for u, v in cols:
+        acc = array('d', map(_add, acc, map(_mul, u, v)))
+    return _store(out, acc)
+
+def batch_norm(U, out=None):
+    '''Euclidean norms of the vectors in batch `U`, as an `array('d')` (written into `out`, if given)'''
+    return _store(out, array('d', map(sqrt, batch_dot(U, U))))
+
+def batch_cross(U, V, out=None):
+    '''Pairwise cross products of the 3d vectors in batches `U` and `V` (written into batch `out`, if given)'''
+    _check_batches(U, V)
+    if U.dim != 3:
+        raise ValueError('expected vectors of length 3, got {}'.format(U.dim))
+    (ux, uy, uz), (vx, vy, vz) = U.columns, V.columns
+    out = _batch_out(out, len(U), 3)
+    x = array('d', map(_sub, map(_mul, uy, vz), map(_mul, uz, vy)))
+    y = array('d', map(_sub, map(_mul, uz, vx), map(_mul, ux, vz)))
+    z = array('d', map(_sub, map(_mul, ux, vy), map(_mul, uy, vx)))
+    out.columns[0][:], out.columns[1][:], out.columns[2][:] = x, y, z
+    return out
+
+def batch_add(U, V, out=None):
+    '''Pairwise sums of the vectors in batches `U` and `V` (written into batch `out`, if given)'''
+    _check_batches(U, V)
+    out = _batch_out(out, len(U), U.dim)
+    for o, u, v in zip(out.columns, U.columns, V.columns):
+        o[:] = array('d', map(_add, u, v))
+    return out
+
+def batch_subtract(U, V, out=None):
+    '''Pairwise differences of the vectors in batches `U` and `V` (written into batch `out`, if given)'''
+    _check_batches(U, V)
+    out = _batch_out(out, len(U), U.dim)
+    for o, u, v in zip(out.columns, U.columns, V.columns):
+        o[:] = array('d', map(_sub, u, v))
+    return out
+
+def batch_scale(U, s, out=None):
+    '''Vectors in batch `U` multiplied by scalar `s` (written into batch `out`, if given)
+
+    `s` is either one scalar for every vector, or a sequence with one scalar per vector.'''
+    out = _batch_out(out, len(U), U.dim)
+    for o, u in zip(out.columns, U.columns):
+        o[:] = array('d', map(_mul, u, _scalars(s, len(U))))
+    return out
+
+def batch_axpy(a, X, Y):
+    '''Update batch `Y` in place to \\(a X + Y\\), and return it
+
+    `a` is either one scalar for every vector, or a sequence with one scalar per vector.'''
+    _check_batches(X, Y)
+    for x, y in zip(X.columns, Y.columns):
+        y[:] = array('d', map(_add, map(_mul, _scalars(a, len(X)), x), y))
+    return Y
+
 if __name__ == '__main__':
     # test dot
     u = [2, 7, 1]
@@ -118,4 +265,35 @@ if __name__ == '__main__':
     expected = [1/4, 1/2, 3/4]
     assert divide_scalar(u, s) == expected, 'Failed test: divide_scalar'
 
+    # test VectorBatch
+    vectors = [[1, 2, 3], [4, 5, 6], [-9, -1, 3]]
+    U = VectorBatch.from_vectors(vectors)
+    assert len(U) == 3 and U.dim == 3 and U.tolist() == vectors and U[1] == [4, 5, 6], 'Failed test: VectorBatch'
+    V = VectorBatch.from_vectors([[4, 5, 6], [1, 2, 3], [3, -2, -7]])
+
+    # test batch_dot
+    assert list(batch_dot(U, V)) == [32, 32, -46], 'Failed test: batch_dot'
+    out = array('d', [0, 0, 0])
+    assert batch_dot(U, V, out=out) is out and list(out) == [32, 32, -46], 'Failed test: batch_dot (out)'
+
+    # test batch_norm
+    assert list(batch_norm(U)) == [norm(v) for v in vectors], 'Failed test: batch_norm'
+
+    # test batch_cross
+    assert batch_cross(U, V).tolist() == [cross(u, v) for u, v in zip(U.tolist(), V.tolist())], 'Failed test: batch_cross'
+
+    # test batch_add and batch_subtract
+    assert batch_add(U, V).tolist() == [add(u, v) for u, v in zip(U.tolist(), V.tolist())], 'Failed test: batch_add'
+    assert batch_subtract(U, V).tolist() == [subtract(u, v) for u, v in zip(U.tolist(), V.tolist())], 'Failed test: batch_subtract'
+
+    # test batch_scale
+    assert batch_scale(U, 2).tolist() == [multiply_scalar(v, 2) for v in vectors], 'Failed test: batch_scale'
+    assert batch_scale(U, [1, 0, -1]).tolist() == [[1, 2, 3], [0, 0, 0], [9, 1, -3]], 'Failed test: batch_scale (per vector)'
+
+    # test batch_axpy
+    W = VectorBatch.from_vectors(vectors)
+    columns = W.columns[0]
+    assert batch_axpy(2, V, W) is W and W.columns[0] is columns, 'Failed test: batch_axpy (in place)'
+    assert W.tolist() == [add(multiply_scalar(v, 2), u) for u, v in zip(U.tolist(), V.tolist())], 'Failed test: batch_axpy'
+
     print('Passed all tests.')
\ No newline at end of file
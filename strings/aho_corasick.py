@@ -0,0 +1,169 @@
+'''
+Multi-pattern string matching with the Aho-Corasick automaton.
+'''
+
+from array import array
+from collections import deque
+
+from .trie import DoubleArrayTrie
+
+CHUNK_SIZE = 1 << 16
+'''Bytes read at a time by `AhoCorasick.stream_file`'''
+
+class AhoCorasick:
+    '''Automaton finding every occurrence of any of `patterns` in one pass over a text
+
+    The goto function is a `trie.DoubleArrayTrie` of the patterns, and the
+    failure links, the pattern ending at each node and the links to the
+    nearest suffix node where a pattern ends are flat `array('i')`s indexed
+    like the trie's nodes.
+
+    Input:
+
+     - `patterns`: non-empty, distinct strings, or bytes-like objects.
+       Matches report a pattern by its position in `patterns`
+    '''
+
+    __slots__ = ('trie', 'fail', 'output', 'suffix', 'lengths')
+
+    def __init__(self, patterns):
+        patterns = list(patterns)
+        if not all(patterns):
+            raise ValueError('patterns must be non-empty')
+        order = sorted(range(len(patterns)), key=lambda i: patterns[i].encode() if isinstance(patterns[i], str) else bytes(patterns[i]))
+        for i, j in zip(order, order[1:]):
+            if patterns[i] == patterns[j]:
+                raise ValueError('duplicate pattern {!r}'.format(patterns[i]))
+        self.trie = trie = DoubleArrayTrie.build((patterns[i] for i in order), order)
+        self.lengths = array('i', (len(trie._encode(p)) for p in patterns))
+        size = len(trie.base)
+        base, check = trie.base, trie.check
+        self.fail = fail = array('i', bytes(4 * size))
+        self.output = output = array('i', [-1]) * size
+        self.suffix = suffix = array('i', [-1]) * size
+        # breadth-first, so that failure links point to nodes already done
+        queue = deque([0])
+        while queue:
+            s = queue.popleft()
+            for code, t in trie._children(s):
+                if not code:
+                    output[s] = base[t]
+                    continue
+                if s:
+                    # longest proper suffix of t's string that is in the trie
+                    f = fail[s]
+                    while check[base[f] + code] != f and f:
+                        f = fail[f]
+                    if check[base[f] + code] == f:
+                        fail[t] = base[f] + code
+                queue.append(t)
+            if s:
+                f = fail[s]
+                suffix[s] = f if output[f] >= 0 else suffix[f]
+
+    def _scan(self, data, s, offset):
+        '''Generator over `(pattern, end)` in the bytes `data` from state `s`, ends counted from `offset`; returns the final state'''
+        base, check, fail, output, suffix = self.trie.base, self.trie.check, self.fail, self.output, self.suffix
+        for i, byte in enumerate(data, offset + 1):
+            code = byte + 1
+            while True:
+                t = base[s] + code
+                if check[t] == s:
+                    s = t
+                    break
+                if not s:
+                    break
+                s = fail[s]
+            u = s if output[s] >= 0 else suffix[s]
+            while u > 0:
+                yield output[u], i
+                u = suffix[u]
+        return s
+
+    def stream(self, chunks):
+        '''Generator over `(pattern, end)` for every match in the concatenation of `chunks`
+
+        Input:
+
+         - `chunks`: iterable of strings if the patterns were strings, else of
+           bytes-like objects (`bytes`, `memoryview`, `mmap`, ...), which are
+           matched without copying or decoding. Matches spanning chunks are found
+
+        Output: yields the index of the pattern and the offset just past its
+        end (in characters for strings, else bytes), in order of end
+        '''
+        s = 0
+        offset = 0
+        text = self.trie.text
+        for chunk in chunks:
+            if not text:
+                s = yield from self._scan(chunk, s, offset)
+                offset += len(chunk)
+                continue
+            if not isinstance(chunk, str):
+                raise TypeError('expected string chunks')
+            data = chunk.encode()
+            if len(data) == len(chunk):
+                s = yield from self._scan(data, s, offset)
+            else:
+                # convert byte offsets to characters; matches end on character boundaries
+                position = characters = 0
+                matches = self._scan(data, s, 0)
+                while True:
+                    try:
+                        pattern, end = next(matches)
+                    except StopIteration as stop:
+                        s = stop.value
+                        break
+                    characters += len(data[position:end].decode())
+                    position = end
+                    yield pattern, offset + characters
+            offset += len(chunk)
+
+    def finditer(self, text):
+        '''Generator over `(pattern, end)` for every match in `text` (see `stream`)'''
+        return self.stream((text,))
+
+    def stream_file(self, f, chunk_size=CHUNK_SIZE):
+        '''Generator over `(pattern, end)` for every match in the binary file object `f`, read `chunk_size` bytes at a time'''
+        return self.stream(iter(lambda: f.read(chunk_size), b''))
+
+    def __len__(self):
+        return len(self.lengths)
+
+if __name__ == '__main__':
+    import io
+    import re
+    from random import Random
+
+    # test finditer
+    ac = AhoCorasick(['he', 'she', 'his', 'hers'])
+    assert list(ac.finditer('ushers')) == [(1, 4), (0, 4), (3, 6)], 'Failed test: finditer'
+    assert list(ac.finditer('')) == [] and len(ac) == 4, 'Failed test: finditer (empty)'
+
+    # test stream across chunk boundaries
+    assert list(ac.stream(['us', 'h', 'ers'])) == [(1, 4), (0, 4), (3, 6)], 'Failed test: stream'
+    assert list(AhoCorasick(['été', 'é']).stream(['ét', 'é x é'])) == [(1, 1), (0, 3), (1, 3), (1, 7)], 'Failed test: stream (unicode)'
+
+    # test bytes mode
+    binary = AhoCorasick([b'\x00\x01', b'\x01'])
+    assert list(binary.finditer(memoryview(b'\x00\x01\x01'))) == [(0, 2), (1, 2), (1, 3)], 'Failed test: finditer (bytes)'
+    assert list(binary.stream_file(io.BytesIO(b'\x00\x01' * 3), chunk_size=3)) == [(0, 2), (1, 2), (0, 4), (1, 4), (0, 6), (1, 6)], 'Failed test: stream_file'
+
+    # test against re on random text
+    rng = Random(8)
+    patterns = list({''.join(rng.choice('ab') for _ in range(rng.randrange(1, 6))) for _ in range(40)})
+    text = ''.join(rng.choice('abc') for _ in range(2000))
+    expected = sorted((i, m.start() + len(p)) for i, p in enumerate(patterns) for m in re.finditer('(?={})'.format(p), text))
+    ac = AhoCorasick(patterns)
+    assert sorted(ac.finditer(text)) == expected, 'Failed test: finditer (random)'
+    assert sorted(ac.stream(text[i:i + 7] for i in range(0, len(text), 7))) == expected, 'Failed test: stream (random)'
+
+    # test duplicate patterns
+    try:
+        AhoCorasick(['a', 'a'])
+        assert False, 'Failed test: AhoCorasick (duplicates)'
+    except ValueError:
+        pass
+
+    print('Passed all tests.')
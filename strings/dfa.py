@@ -1,3 +1,311 @@
 '''
 Utilities for deterministic finite automata (DFAs).
-'''
\ No newline at end of file
+
+Automata run over byte classes (see `nfa.NFA.byte_classes`): inputs are
+mapped to class ids with `bytes.translate`, and transitions are looked up
+in a flat `array` with one row of \\(k\\) entries per state. Entries hold
+the offset of the target's row, so a step is `s = table[s + c]`.
+'''
+
+from array import array
+
+from .nfa import NFA
+
+LAZY_MAX_STATES = 1 << 12
+'''States `LazyDFA` caches before discarding them and starting over'''
+
+_EMPTY = frozenset()
+
+def _state_classes(nfa, classes, k):
+    '''Classes of bytes each NFA state has a transition on'''
+    representatives = [classes.index(c) for c in range(k)]
+    return [[c for c, b in enumerate(representatives) if mask >> b & 1] if mask else () for mask in nfa.sets]
+
+def _move(nfa, state_classes, states, c):
+    '''Epsilon closure of the NFA states reached from `states` on byte class `c`'''
+    out = nfa.out
+    targets = [out[s] for s in states if c in state_classes[s]]
+    return nfa.closure(targets) if targets else _EMPTY
+
+def _data(data):
+    '''`data` as bytes: strings are encoded as UTF-8'''
+    return data.encode() if isinstance(data, str) else data
+
+class DFA:
+    '''DFA with a flat transition table over byte classes
+
+    Input:
+
+     - `classes`: `bytes` of length 256 mapping every byte to its class
+     - `k`: number of classes
+     - `table`: `array('i')` of \\(k\\) entries per state; the entry for state `s`
+       and class `c` is at `s * k + c` and holds `t * k` for the target state `t`
+     - `accepting`: `bytearray` flagging the accepting states
+
+    State 0 is the start. Use `from_pattern` or `from_nfa` rather than calling this directly.
+    '''
+
+    __slots__ = ('classes', 'k', 'table', 'accepting', 'dead', 'done')
+
+    def __init__(self, classes, k, table, accepting):
+        if len(table) != k * len(accepting):
+            raise ValueError('expected {} transitions, got {}'.format(k * len(accepting), len(table)))
+        self.classes = classes
+        self.k = k
+        self.table = table
+        self.accepting = accepting
+        # rows of states that can never be left, so matching can stop early
+        self.dead = self.done = -1
+        for s in range(len(accepting)):
+            row = s * k
+            if all(t == row for t in table[row:row + k]):
+                if accepting[s]:
+                    self.done = row
+                else:
+                    self.dead = row
+
+    @classmethod
+    def from_pattern(cls, pattern, search=False, minimize=True, max_states=None):
+        '''DFA of the regular expression `pattern` (see `nfa`; string patterns match like `re` with `re.ASCII`)
+
+        Input:
+
+         - `search`: whether to accept strings containing a match rather than only matches
+         - `minimize`: whether to minimize the DFA
+         - `max_states`: see `from_nfa`
+        '''
+        dfa = cls.from_nfa(NFA.from_pattern(pattern, search), max_states)
+        return dfa.minimize() if minimize else dfa
+
+    @classmethod
+    def from_nfa(cls, nfa, max_states=None):
+        '''DFA accepting the same strings as `nfa`, by subset construction
+
+        Raises `ValueError` once there would be more than `max_states` states
+        (use `LazyDFA` for such patterns).
+        '''
+        classes, k = nfa.byte_classes()
+        state_classes = _state_classes(nfa, classes, k)
+        start = nfa.closure((nfa.start,))
+        ids = {start: 0}
+        sets = [start]
+        table = array('i')
+        for S in sets:
+            for c in range(k):
+                T = _move(nfa, state_classes, S, c)
+                j = ids.get(T)
+                if j is None:
+                    j = ids[T] = len(sets)
+                    sets.append(T)
+                    if max_states is not None and len(sets) > max_states:
+                        raise ValueError('DFA has more than {} states'.format(max_states))
+                table.append(j * k)
+        return cls(classes, k, table, bytearray(nfa.accept in S for S in sets))
+
+    def minimize(self):
+        '''Equivalent DFA with the fewest states, by Hopcroft's algorithm'''
+        k, table = self.k, self.table
+        n = len(self)
+        inverse = [{} for _ in range(k)]
+        for s in range(n):
+            for c in range(k):
+                inverse[c].setdefault(table[s * k + c] // k, []).append(s)
+        accepting = {s for s in range(n) if self.accepting[s]}
+        blocks = [block for block in (accepting, set(range(n)) - accepting) if block]
+        block_of = array('i', bytes(4 * n))
+        for b, block in enumerate(blocks):
+            for s in block:
+                block_of[s] = b
+        smaller = min(range(len(blocks)), key=lambda b: len(blocks[b]))
+        waiting = {(smaller, c) for c in range(k)}
+        while waiting:
+            b, c = waiting.pop()
+            # states with a transition on c into block b, grouped by their block
+            touched = {}
+            for t in blocks[b]:
+                for s in inverse[c].get(t, ()):
+                    touched.setdefault(block_of[s], []).append(s)
+            for y, members in touched.items():
+                if len(members) == len(blocks[y]):
+                    continue
+                split = set(members)
+                blocks[y] -= split
+                z = len(blocks)
+                blocks.append(split)
+                for s in split:
+                    block_of[s] = z
+                for c2 in range(k):
+                    if (y, c2) in waiting:
+                        waiting.add((z, c2))
+                    else:
+                        waiting.add((z if len(split) <= len(blocks[y]) else y, c2))
+        # number the blocks in breadth-first order from the start
+        number = {block_of[0]: 0}
+        order = [block_of[0]]
+        new_table = array('i')
+        for b in order:
+            s = next(iter(blocks[b]))
+            for c in range(k):
+                target = block_of[table[s * k + c] // k]
+                if target not in number:
+                    number[target] = len(order)
+                    order.append(target)
+                new_table.append(number[target] * k)
+        return DFA(self.classes, k, new_table, bytearray(self.accepting[next(iter(blocks[b]))] for b in order))
+
+    def fullmatch(self, data):
+        '''Whether the DFA accepts all of the bytes (or UTF-8 encoded string) `data`'''
+        table, dead, done = self.table, self.dead, self.done
+        s = 0
+        for c in bytes(_data(data)).translate(self.classes):
+            s = table[s + c]
+            if s == dead or s == done:
+                break
+        return bool(self.accepting[s // self.k])
+
+    def match_many(self, inputs):
+        '''List of `fullmatch` for every item of `inputs`, with the lookups hoisted out of the loop'''
+        table, classes, accepting, k = self.table, self.classes, self.accepting, self.k
+        dead, done = self.dead, self.done
+        results = []
+        append = results.append
+        for data in inputs:
+            s = 0
+            for c in bytes(_data(data)).translate(classes):
+                s = table[s + c]
+                if s == dead or s == done:
+                    break
+            append(bool(accepting[s // k]))
+        return results
+
+    def __len__(self):
+        return len(self.accepting)
+
+class LazyDFA:
+    '''DFA of an NFA whose states are built on the fly as inputs need them
+
+    For patterns whose full DFA is too large, only the states reached by
+    actual inputs are built. At most `max_states` are kept; when the cache
+    is full it is discarded and rebuilt from the current state onwards.
+
+    Input:
+
+     - `nfa`: an `nfa.NFA`, or a pattern for `nfa.NFA.from_pattern`
+     - `max_states`: maximum number of cached states
+     - `search`: as for `nfa.NFA.from_pattern`, if `nfa` is a pattern
+    '''
+
+    __slots__ = ('nfa', 'classes', 'k', 'state_classes', 'ids', 'sets', 'table', 'accepting', 'max_states', 'flushes')
+
+    def __init__(self, nfa, max_states=LAZY_MAX_STATES, search=False):
+        if not isinstance(nfa, NFA):
+            nfa = NFA.from_pattern(nfa, search)
+        if max_states < 2:
+            raise ValueError('max_states must be at least 2')
+        self.nfa = nfa
+        self.classes, self.k = nfa.byte_classes()
+        self.state_classes = _state_classes(nfa, self.classes, self.k)
+        self.max_states = max_states
+        self.flushes = 0
+        self._flush()
+
+    def _flush(self):
+        '''Discard every state but the start'''
+        self.ids = {}
+        self.sets = []
+        self.table = array('i')
+        self.accepting = bytearray()
+        self._add(self.nfa.closure((self.nfa.start,)))
+
+    def _add(self, S):
+        '''Row of a new state for the set of NFA states `S`'''
+        j = self.ids[S] = len(self.sets)
+        self.sets.append(S)
+        self.table.extend(array('i', [-1]) * self.k)
+        self.accepting.append(self.nfa.accept in S)
+        return j * self.k
+
+    def _step(self, row, c):
+        '''Row of the target of the state at `row` on class `c`, building it if needed'''
+        T = _move(self.nfa, self.state_classes, self.sets[row // self.k], c)
+        j = self.ids.get(T)
+        if j is not None:
+            target = j * self.k
+        elif len(self.sets) < self.max_states:
+            target = self._add(T)
+        else:
+            self.flushes += 1
+            self._flush()
+            return self._add(T)
+        self.table[row + c] = target
+        return target
+
+    def fullmatch(self, data):
+        '''Whether the NFA accepts all of the bytes (or UTF-8 encoded string) `data`'''
+        table = self.table
+        s = 0
+        for c in bytes(_data(data)).translate(self.classes):
+            t = table[s + c]
+            if t < 0:
+                t = self._step(s, c)
+                table = self.table
+            s = t
+        return bool(self.accepting[s // self.k])
+
+    def match_many(self, inputs):
+        '''List of `fullmatch` for every item of `inputs`, sharing the cache'''
+        return [self.fullmatch(data) for data in inputs]
+
+    def __len__(self):
+        return len(self.sets)
+
+if __name__ == '__main__':
+    import re
+    from random import Random
+
+    # test from_pattern
+    dfa = DFA.from_pattern('(a|b)*abb', minimize=False)
+    assert dfa.fullmatch('babb') and not dfa.fullmatch('abba'), 'Failed test: from_pattern'
+
+    # test minimize
+    minimal = dfa.minimize()
+    assert len(minimal) == 5 and len(minimal) < len(dfa), 'Failed test: minimize'
+    assert minimal.match_many(['abb', 'aabb', 'ab', 'abbc', '']) == [True, True, False, False, False], 'Failed test: match_many'
+
+    # test search
+    search = DFA.from_pattern('\\d{3}-\\d{4}', search=True)
+    assert search.fullmatch('call 555-1234 now') and not search.fullmatch('555-12x4'), 'Failed test: fullmatch (search)'
+    assert search.done >= 0, 'Failed test: fullmatch (search sink)'
+
+    # test bytes
+    binary = DFA.from_pattern(b'\\x00[^\\x00]*\\x00')
+    assert binary.match_many([b'\x00\xff\x00', memoryview(b'\x00\x00'), b'\x00\x00\x00']) == [True, True, False], 'Failed test: match_many (bytes)'
+
+    # test against re
+    rng = Random(6)
+    patterns = ['(ab|a)*b?', 'a{2,3}(b|c)+', '[^a]x*\\d{1,}', '(a|b|c){3}', 'a.b', '\\w+\\s?\\W', '(x|1)*(xx|11)']
+    for pattern in patterns:
+        texts = [''.join(rng.choice('abcx1 .') for _ in range(rng.randrange(7))) for _ in range(300)]
+        expected = [bool(re.fullmatch(pattern, text)) for text in texts]
+        assert DFA.from_pattern(pattern).match_many(texts) == expected, 'Failed test: DFA ({})'.format(pattern)
+        assert DFA.from_pattern(pattern, minimize=False).match_many(texts) == expected, 'Failed test: DFA, not minimized ({})'.format(pattern)
+        assert LazyDFA(pattern, max_states=3).match_many(texts) == expected, 'Failed test: LazyDFA ({})'.format(pattern)
+    for pattern in ('é+', 'é{2}', 'a.b', '[^a]*\\W'):
+        texts = [''.join(rng.choice('aé€𝄞 ') for _ in range(rng.randrange(5))) for _ in range(300)]
+        expected = [bool(re.fullmatch(pattern, text, re.ASCII)) for text in texts]
+        assert DFA.from_pattern(pattern).match_many(texts) == expected, 'Failed test: DFA ({})'.format(pattern)
+        assert LazyDFA(pattern, max_states=3).match_many(texts) == expected, 'Failed test: LazyDFA ({})'.format(pattern)
+
+    # test a pattern whose DFA blows up
+    blowup = '(a|b)*a(a|b){12}'
+    try:
+        DFA.from_pattern(blowup, max_states=1000)
+        assert False, 'Failed test: from_nfa (max_states)'
+    except ValueError:
+        pass
+    lazy = LazyDFA(blowup, max_states=64)
+    texts = [''.join(rng.choice('ab') for _ in range(40)) for _ in range(50)]
+    assert lazy.match_many(texts) == [bool(re.fullmatch(blowup, text)) for text in texts], 'Failed test: LazyDFA (blowup)'
+    assert len(lazy) <= 64 and lazy.flushes > 0, 'Failed test: LazyDFA (flushes)'
+
+    print('Passed all tests.')
@@ -1,3 +1,357 @@
 '''
 Utilities for nondeterministic finite automata (NFAs).
-'''
\ No newline at end of file
+
+Patterns are regular expressions over bytes with the syntax: literals,
+`.` (anything but a newline), classes `[a-z]` and `[^...]`, the escapes
+`\\d \\w \\s \\D \\W \\S \\n \\t \\r \\f \\v \\xHH`, groups `(...)` and
+`(?:...)`, alternation `|` and the quantifiers `* + ? {m} {m,} {m,n}`.
+
+String patterns match UTF-8 encoded strings one character at a time, like
+`re` with the `re.ASCII` flag: literals are encoded as UTF-8, `.`, negated
+classes and `\\D \\W \\S` match any non-ASCII character, and classes may
+only hold ASCII characters. Bytes patterns match one byte at a time.
+'''
+
+ANY = (1 << 256) - 1
+'''Set of all 256 bytes as a bitmask'''
+
+def _mask(*ranges):
+    '''Bitmask of the bytes in the inclusive ranges `(lo, hi)`'''
+    mask = 0
+    for lo, hi in ranges:
+        mask |= ((1 << (hi - lo + 1)) - 1) << lo
+    return mask
+
+_ESCAPES = {
+    'd': _mask((48, 57)),
+    'w': _mask((48, 57), (65, 90), (95, 95), (97, 122)),
+    's': _mask((9, 13), (32, 32)),
+}
+_ESCAPES.update({c.upper(): ANY & ~mask for c, mask in _ESCAPES.items()})
+_LITERAL_ESCAPES = {'n': 10, 't': 9, 'r': 13, 'f': 12, 'v': 11}
+
+_ASCII = _mask((0, 127))
+_CONTINUATION = ('set', _mask((0x80, 0xbf)))
+_MULTIBYTE = ('alt', [
+    ('cat', [('set', _mask((0xc2, 0xdf))), _CONTINUATION]),
+    ('cat', [('set', _mask((0xe0, 0xef))), _CONTINUATION, _CONTINUATION]),
+    ('cat', [('set', _mask((0xf0, 0xf4))), _CONTINUATION, _CONTINUATION, _CONTINUATION]),
+])
+'''Syntax tree of any non-ASCII character encoded as UTF-8'''
+
+class _Parser:
+    '''Recursive descent parser from a pattern to a syntax tree of tuples:
+    `('set', mask)`, `('cat', items)`, `('alt', items)`, `('star', x)`, `('opt', x)`'''
+
+    __slots__ = ('pattern', 'binary', 'i')
+
+    def __init__(self, pattern):
+        self.binary = not isinstance(pattern, str)
+        self.pattern = bytes(pattern).decode('latin-1') if self.binary else pattern
+        self.i = 0
+
+    def error(self, message):
+        return ValueError('{} at position {} of pattern {!r}'.format(message, self.i, self.pattern))
+
+    def peek(self):
+        return self.pattern[self.i] if self.i < len(self.pattern) else None
+
+    def take(self):
+        ch = self.peek()
+        if ch is None:
+            raise self.error('unexpected end')
+        self.i += 1
+        return ch
+
+    def parse(self):
+        tree = self.alternation()
+        if self.peek() is not None:
+            raise self.error('unbalanced parenthesis')
+        return tree
+
+    def alternation(self):
+        items = [self.concatenation()]
+        while self.peek() == '|':
+            self.i += 1
+            items.append(self.concatenation())
+        return items[0] if len(items) == 1 else ('alt', items)
+
+    def concatenation(self):
+        items = []
+        while self.peek() not in (None, '|', ')'):
+            items.append(self.repetition())
+        return items[0] if len(items) == 1 else ('cat', items)
+
+    def repetition(self):
+        x = self.atom()
+        while self.peek() in ('*', '+', '?', '{'):
+            if self.peek() == '{':
+                start = self.i
+                bounds = self.bounds()
+                if bounds is None:
+                    self.i = start
+                    break
+            else:
+                bounds = {'*': (0, None), '+': (1, None), '?': (0, 1)}[self.take()]
+            if self.peek() == '?':
+                # lazy quantifiers match the same strings
+                self.i += 1
+            lo, hi = bounds
+            repeated = [x] * lo
+            if hi is None:
+                repeated.append(('star', x))
+            else:
+                repeated.extend([('opt', x)] * (hi - lo))
+            x = ('cat', repeated)
+        return x
+
+    def bounds(self):
+        '''`(m, n)` of a `{m,n}` quantifier, or `None` if the brace is a literal'''
+        end = self.pattern.find('}', self.i)
+        if end < 0:
+            return None
+        body = self.pattern[self.i + 1:end].split(',')
+        if len(body) > 2 or not body[0].isdigit() or (len(body) == 2 and body[1] and not body[1].isdigit()):
+            return None
+        self.i = end + 1
+        lo = int(body[0])
+        hi = lo if len(body) == 1 else int(body[1]) if body[1] else None
+        if hi is not None and hi < lo:
+            raise self.error('bad repetition bounds')
+        return lo, hi
+
+    def atom(self):
+        ch = self.take()
+        if ch == '(':
+            if self.pattern.startswith('?:', self.i):
+                self.i += 2
+            tree = self.alternation()
+            if self.take() != ')':
+                raise self.error('expected )')
+            return tree
+        if ch == '[':
+            return self.char(self.char_class())
+        if ch == '.':
+            return self.char(ANY & ~(1 << 10))
+        if ch in ('*', '+', '?', ')'):
+            raise self.error('nothing to repeat' if ch != ')' else 'unbalanced parenthesis')
+        if ch in ('^', '$'):
+            raise self.error('anchors are not supported')
+        if ch == '\\':
+            ch = self.escape()
+            if not isinstance(ch, str):
+                return self.char(ch)
+        data = ch.encode('latin-1') if self.binary else ch.encode()
+        if len(data) == 1:
+            return ('set', 1 << data[0])
+        return ('cat', [('set', 1 << b) for b in data])
+
+    def char(self, mask):
+        '''Syntax tree of one character in the bitmask `mask`, where in string patterns the non-ASCII bytes stand for all non-ASCII characters'''
+        if self.binary or not mask & ~_ASCII:
+            return ('set', mask)
+        return ('alt', [('set', mask & _ASCII), _MULTIBYTE])
+
+    def escape(self):
+        '''Bitmask of a class escape, or a single character escape as a string'''
+        ch = self.take()
+        if ch in _ESCAPES:
+            return _ESCAPES[ch]
+        if ch in _LITERAL_ESCAPES:
+            return chr(_LITERAL_ESCAPES[ch])
+        if ch == 'x':
+            digits = self.take() + self.take()
+            try:
+                return chr(int(digits, 16))
+            except ValueError:
+                raise self.error('bad escape \\x{}'.format(digits))
+        if ch.isalnum():
+            raise self.error('unknown escape \\{}'.format(ch))
+        return ch
+
+    def member(self):
+        '''Next member of a class as `(byte, mask)`, where `byte` is `None` for a class escape'''
+        ch = self.take()
+        if ch == '\\':
+            ch = self.escape()
+            if not isinstance(ch, str):
+                return None, ch
+        if ord(ch) >= (256 if self.binary else 128):
+            raise self.error('non-ASCII character {!r} in class'.format(ch))
+        return ord(ch), 1 << ord(ch)
+
+    def char_class(self):
+        negate = self.peek() == '^'
+        if negate:
+            self.i += 1
+        mask = 0
+        first = True
+        while first or self.peek() != ']':
+            first = False
+            lo, member = self.member()
+            if self.peek() == '-' and self.pattern[self.i + 1:self.i + 2] not in (']', ''):
+                self.i += 1
+                hi, _ = self.member()
+                if lo is None or hi is None or hi < lo:
+                    raise self.error('bad class range')
+                member = _mask((lo, hi))
+            mask |= member
+        self.i += 1
+        return ANY & ~mask if negate else mask
+
+def parse(pattern):
+    '''Syntax tree of the regular expression `pattern` (see the module documentation)'''
+    return _Parser(pattern).parse()
+
+class NFA:
+    '''Thompson NFA over bytes
+
+    Every state has either one transition on a set of bytes (`sets[s]`, a
+    256-bit mask, to `out[s]`) or only epsilon transitions (`eps[s]`).
+    There is one start and one accepting state.
+    '''
+
+    __slots__ = ('sets', 'out', 'eps', 'start', 'accept')
+
+    def __init__(self):
+        self.sets = []
+        self.out = []
+        self.eps = []
+        self.start = self.accept = None
+
+    @classmethod
+    def from_pattern(cls, pattern, search=False):
+        '''Thompson construction of the regular expression `pattern`
+
+        With `search`, the NFA accepts any string containing a match.'''
+        tree = parse(pattern)
+        if search:
+            tree = ('cat', [('star', ('set', ANY)), tree, ('star', ('set', ANY))])
+        nfa = cls()
+        nfa.start, nfa.accept = nfa._emit(tree)
+        return nfa
+
+    def _state(self, mask=0, out=-1):
+        self.sets.append(mask)
+        self.out.append(out)
+        self.eps.append([])
+        return len(self.sets) - 1
+
+    def _emit(self, tree):
+        '''States `(start, end)` of a fragment matching `tree`'''
+        kind = tree[0]
+        if kind == 'set':
+            end = self._state()
+            return self._state(tree[1], end), end
+        if kind == 'cat':
+            if not tree[1]:
+                s = self._state()
+                return s, s
+            start, end = self._emit(tree[1][0])
+            for item in tree[1][1:]:
+                a, b = self._emit(item)
+                self.eps[end].append(a)
+                end = b
+            return start, end
+        start, end = self._state(), self._state()
+        if kind == 'alt':
+            for item in tree[1]:
+                a, b = self._emit(item)
+                self.eps[start].append(a)
+                self.eps[b].append(end)
+            return start, end
+        a, b = self._emit(tree[1])
+        self.eps[start].append(a)
+        self.eps[b].append(end)
+        self.eps[start].append(end)
+        if kind == 'star':
+            self.eps[b].append(a)
+        return start, end
+
+    def closure(self, states):
+        '''Set of states reachable from `states` by epsilon transitions, as a `frozenset`'''
+        eps = self.eps
+        seen = set(states)
+        stack = list(seen)
+        while stack:
+            for t in eps[stack.pop()]:
+                if t not in seen:
+                    seen.add(t)
+                    stack.append(t)
+        return frozenset(seen)
+
+    def byte_classes(self):
+        '''Partition of the bytes into classes no transition tells apart
+
+        Output: `(classes, k)` where `classes` is a `bytes` of length 256 mapping
+        every byte to its class in `0..k-1` (usable with `bytes.translate`)
+        '''
+        masks = set(self.sets)
+        masks.discard(0)
+        masks = sorted(masks)
+        signatures = {}
+        classes = bytearray(256)
+        for b in range(256):
+            signature = 0
+            for j, mask in enumerate(masks):
+                if mask >> b & 1:
+                    signature |= 1 << j
+            classes[b] = signatures.setdefault(signature, len(signatures))
+        return bytes(classes), len(signatures)
+
+    def fullmatch(self, data):
+        '''Whether the NFA accepts all of `data`, by simulating it on sets of states'''
+        if isinstance(data, str):
+            data = data.encode()
+        sets, out = self.sets, self.out
+        current = self.closure((self.start,))
+        for b in data:
+            current = self.closure([out[s] for s in current if sets[s] >> b & 1])
+            if not current:
+                return False
+        return self.accept in current
+
+    def __len__(self):
+        return len(self.sets)
+
+if __name__ == '__main__':
+    import re
+    from random import Random
+
+    # test parse
+    assert parse('ab') == ('cat', [('set', 1 << 97), ('set', 1 << 98)]), 'Failed test: parse'
+    assert parse('[a-c]') == ('set', 0b111 << 97) and parse(b'[^\\x00-\\xff]') == ('set', 0), 'Failed test: parse (class)'
+    for bad in ('(a', 'a)', '*a', '[a', 'a{3,1}', '^a', '\\q'):
+        try:
+            parse(bad)
+            assert False, 'Failed test: parse ({})'.format(bad)
+        except ValueError:
+            pass
+
+    # test fullmatch
+    nfa = NFA.from_pattern('(a|b)*abb')
+    assert nfa.fullmatch('aababb') and not nfa.fullmatch('abab') and not nfa.fullmatch(''), 'Failed test: fullmatch'
+    assert NFA.from_pattern('é+', search=True).fullmatch('caféé!'), 'Failed test: fullmatch (utf-8)'
+    assert NFA.from_pattern(b'\\x00[\\x80-\\xff]{2}').fullmatch(b'\x00\x80\xff'), 'Failed test: fullmatch (bytes)'
+    assert all(NFA.from_pattern(p).fullmatch('éé') for p in ('é+', 'é{2}', '(?:é)*', '..', '[^a]{2}')), 'Failed test: fullmatch (quantified utf-8)'
+    assert NFA.from_pattern('a.b').fullmatch('a€b') and not NFA.from_pattern('a.b').fullmatch('aééb'), 'Failed test: fullmatch (utf-8 any)'
+
+    # test byte_classes
+    classes, k = NFA.from_pattern('[a-z]+[0-9]').byte_classes()
+    assert k == 3 and classes[ord('a')] == classes[ord('q')] != classes[ord('5')], 'Failed test: byte_classes'
+
+    # test against re
+    rng = Random(4)
+    patterns = ['(ab|a)*b?', 'a{2,3}(b|c)+', '[^a]x*\\d{1,}', '(a|b|c){3}', 'a.b', '\\w+\\s?\\W', 'x{0}a{2,}']
+    for pattern in patterns:
+        nfa = NFA.from_pattern(pattern)
+        for _ in range(300):
+            text = ''.join(rng.choice('abcx1 .') for _ in range(rng.randrange(6)))
+            assert nfa.fullmatch(text) == bool(re.fullmatch(pattern, text)), 'Failed test: fullmatch ({}, {!r})'.format(pattern, text)
+    for pattern in ('a.b', '[^a]+é?', '\\W\\w*', '(é|€)+\\S', '.{2,3}'):
+        nfa = NFA.from_pattern(pattern)
+        for _ in range(300):
+            text = ''.join(rng.choice('aé€𝄞 \n') for _ in range(rng.randrange(5)))
+            assert nfa.fullmatch(text) == bool(re.fullmatch(pattern, text, re.ASCII)), 'Failed test: fullmatch ({}, {!r})'.format(pattern, text)
+
+    print('Passed all tests.')
@@ -1,3 +1,215 @@
 '''
 Utilities for tokenizing strings.
-'''
\ No newline at end of file
+
+A `Tokenizer` compiles a specification of token kinds into one regular
+expression and yields tokens as `(kind, start, end)` offsets rather than
+substrings, over whole strings or buffers, chunked streams or files.
+'''
+
+import mmap
+import re
+
+CHUNK_SIZE = 1 << 16
+'''Characters (or bytes) read at a time by `Tokenizer.stream_file`'''
+
+HOLDBACK = 1 << 10
+'''Default number of characters (or bytes) kept back at the end of each chunk, see `Tokenizer`'''
+
+class Tokenizer:
+    '''Tokenizer for the token kinds in `spec`
+
+    Each step matches the kinds in the order given (as alternatives of
+    one master pattern) at the current position, and a step that matches no
+    kind raises `ValueError`.
+
+    Input:
+
+     - `spec`: dictionary or iterable of pairs `name`: `regex`, all strings
+       (text mode) or all bytes (bytes mode). No regex may match the empty
+       string. Since every regex becomes a group of the master pattern,
+       numeric backreferences such as `\\1` and inline global flags such as
+       `(?i)` are unsupported; use named groups and scoped flags `(?i:...)`
+     - `skip`: names of kinds to match but not yield, e.g. whitespace
+     - `holdback`: when streaming, a token is only matched once this many
+       characters follow its start, or the input has ended. Streams are
+       tokenized exactly as whole inputs if no token, with the lookahead its
+       regex needs, is longer than this; tokens reaching the end of the
+       data read so far are always deferred until more is read
+    '''
+
+    __slots__ = ('names', 'pattern', 'kinds', 'skip', 'holdback', 'binary')
+
+    def __init__(self, spec, skip=(), holdback=HOLDBACK):
+        spec = list(spec.items() if isinstance(spec, dict) else spec)
+        if not spec:
+            raise ValueError('expected at least one token kind')
+        self.binary = not isinstance(spec[0][1], str)
+        self.names = [name for name, _ in spec]
+        unknown = set(skip) - set(self.names)
+        if unknown:
+            raise ValueError('unknown kinds to skip {}'.format(sorted(unknown)))
+        # kind of each group number; the outer group of an alternative is its last to close
+        self.kinds = [None]
+        parts = []
+        for i, (name, regex) in enumerate(spec):
+            if isinstance(regex, str) == self.binary:
+                raise ValueError('token regexes must be all strings or all bytes')
+            compiled = re.compile(regex)
+            if compiled.match(b'' if self.binary else ''):
+                raise ValueError('token {!r} matches the empty string'.format(name))
+            self.kinds.extend([i] * (compiled.groups + 1))
+            parts.append((b'(%s)' if self.binary else '(%s)') % regex)
+        self.pattern = self._master(parts)
+        self.skip = bytearray(len(spec))
+        for name in skip:
+            self.skip[self.names.index(name)] = 1
+        self.holdback = holdback
+
+    def _master(self, parts):
+        '''Master pattern of the grouped kind regexes `parts`; raises `ValueError` naming the first kind that cannot be combined'''
+        bar = b'|' if self.binary else '|'
+        try:
+            return re.compile(bar.join(parts))
+        except re.error:
+            for i in range(len(parts)):
+                try:
+                    re.compile(bar.join(parts[:i + 1]))
+                except re.error as e:
+                    raise ValueError('token {!r} cannot be part of the master pattern: {}'.format(self.names[i], e)) from None
+            raise
+
+    def _scan(self, data, pos, final, offset):
+        '''Generator over the tokens of `data` from `pos`, with offsets shifted by `offset`; returns where it stopped
+
+        Unless `final`, stops at the first token starting within `holdback`
+        of the end of `data` or reaching it.'''
+        match, kinds, skip = self.pattern.match, self.kinds, self.skip
+        n = len(data)
+        limit = n if final else n - self.holdback
+        while pos < limit:
+            m = match(data, pos)
+            if m is None:
+                raise ValueError('no token matches at offset {}'.format(offset + pos))
+            end = m.end()
+            if end == n and not final:
+                break
+            kind = kinds[m.lastindex]
+            if end == pos:
+                raise ValueError('token {!r} matches the empty string at offset {}'.format(self.names[kind], offset + pos))
+            if not skip[kind]:
+                yield kind, offset + pos, offset + end
+            pos = end
+        return pos
+
+    def scan(self, data):
+        '''Generator over `(kind, start, end)` for the tokens of all of `data`
+
+        `data` may be a string, or in bytes mode any bytes-like object such as
+        an `mmap`, which is matched in place. `kind` indexes `names`.'''
+        return self._scan(data, 0, True, 0)
+
+    def stream(self, chunks):
+        '''Generator over `(kind, start, end)` for the tokens of the concatenation of `chunks`
+
+        Offsets are counted from the start of the first chunk, and tokens may
+        span chunks. Only the unfinished end of the data is kept between chunks.'''
+        buffer = b'' if self.binary else ''
+        offset = 0
+        for chunk in chunks:
+            buffer += chunk
+            pos = yield from self._scan(buffer, 0, False, offset)
+            buffer = buffer[pos:]
+            offset += pos
+        yield from self._scan(buffer, 0, True, offset)
+
+    def stream_file(self, f, chunk_size=CHUNK_SIZE):
+        '''Generator over `(kind, start, end)` for the tokens of the file object `f`, read `chunk_size` at a time
+
+        Read `f` in binary mode in bytes mode, and in text mode otherwise
+        (offsets then count characters).'''
+        empty = b'' if self.binary else ''
+        return self.stream(iter(lambda: f.read(chunk_size), empty))
+
+    def map_file(self, path):
+        '''Generator over `(kind, start, end)` for the tokens of the file `path`, memory-mapped (bytes mode only)'''
+        if not self.binary:
+            raise ValueError('memory-mapped files need a bytes mode tokenizer')
+        with open(path, 'rb') as f:
+            if not f.seek(0, 2):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from self.scan(data)
+
+    def __len__(self):
+        return len(self.names)
+
+if __name__ == '__main__':
+    import io
+    import os
+    import tempfile
+
+    spec = {'number': r'\d+(\.\d+)?', 'name': r'[A-Za-z_]\w*', 'op': r'[-+*/=()]', 'space': r'\s+'}
+    tokenizer = Tokenizer(spec, skip=['space'])
+    text = 'x1 = 3.25 * (y + 42)'
+    tokens = list(tokenizer.scan(text))
+
+    # test scan
+    assert [(tokenizer.names[k], text[s:e]) for k, s, e in tokens] == [
+        ('name', 'x1'), ('op', '='), ('number', '3.25'), ('op', '*'), ('op', '('),
+        ('name', 'y'), ('op', '+'), ('number', '42'), ('op', ')')
+    ], 'Failed test: scan'
+    try:
+        list(tokenizer.scan('a ? b'))
+        assert False, 'Failed test: scan (no match)'
+    except ValueError:
+        pass
+
+    # test stream across chunk boundaries
+    for size in (1, 2, 3, 7):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(Tokenizer(spec, ['space'], holdback=4).stream(chunks)) == tokens, 'Failed test: stream ({})'.format(size)
+    assert list(tokenizer.stream_file(io.StringIO(text), chunk_size=4)) == tokens, 'Failed test: stream_file'
+    long = 'a' * 5000 + ' 1'
+    assert list(tokenizer.stream(long[i:i + 100] for i in range(0, len(long), 100))) == [(1, 0, 5000), (0, 5001, 5002)], 'Failed test: stream (long token)'
+
+    # test bytes mode
+    binary = Tokenizer([('word', rb'[a-z]+'), ('gap', rb'[^a-z]+')])
+    data = b'abc, de\xff\x00f'
+    expected = [(0, 0, 3), (1, 3, 5), (0, 5, 7), (1, 7, 9), (0, 9, 10)]
+    assert list(binary.scan(memoryview(data))) == expected, 'Failed test: scan (bytes)'
+    assert list(binary.stream_file(io.BytesIO(data), chunk_size=2)) == expected, 'Failed test: stream_file (bytes)'
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'data')
+        with open(path, 'wb') as f:
+            f.write(data)
+        assert list(binary.map_file(path)) == expected, 'Failed test: map_file'
+
+    # test invalid specs
+    for bad in ({'empty': 'a*'}, {'mixed': 'a', 'bytes': b'b'}):
+        try:
+            Tokenizer(bad)
+            assert False, 'Failed test: Tokenizer ({})'.format(bad)
+        except ValueError:
+            pass
+    for bad in ({'q': '(["\']).*?\\1'}, {'a': 'a', 'b': '(?i)b'}):
+        try:
+            Tokenizer(bad)
+            assert False, 'Failed test: Tokenizer ({})'.format(bad)
+        except ValueError as e:
+            assert repr(list(bad)[-1]) in str(e), 'Failed test: Tokenizer (kind named, {})'.format(bad)
+    assert list(Tokenizer({'q': '(?P<quote>["\']).*?(?P=quote)', 'a': '(?i:a)'}).scan('A"x"')) == [(1, 0, 1), (0, 1, 4)], 'Failed test: Tokenizer (named backreference)'
+
+    # test zero-width matches
+    for zero in (r'\b', r'(?=a)'):
+        try:
+            list(Tokenizer({'zero': zero, 'a': 'a'}).scan('aa'))
+            assert False, 'Failed test: scan (zero-width {})'.format(zero)
+        except ValueError:
+            pass
+        try:
+            list(Tokenizer({'zero': zero, 'a': 'a'}, holdback=1).stream(['a', 'a', 'a']))
+            assert False, 'Failed test: stream (zero-width {})'.format(zero)
+        except ValueError:
+            pass
+
+    print('Passed all tests.')
@@ -1,3 +1,317 @@
 '''
 Utilities for prefix trees, a.k.a. trie data structures.
-'''
\ No newline at end of file
+'''
+
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+
+_HEADER = struct.Struct('<4sBBxxqq')
+'''Binary file header: magic, version, whether keys are strings, array length, key count'''
+
+_MAGIC = b'DATR'
+_VERSION = 1
+
+class DoubleArrayTrie:
+    '''Static trie of byte (or string) keys with integer values, stored as a double array
+
+    Nodes are positions in the two `array('i')`s `base` and `check`; the
+    root is 0. Key bytes are coded as 1..256, and 0 marks the end of a key.
+    The child of node `s` by code `c` is `t = base[s] + c`, which exists iff
+    `check[t] == s`. The end-of-key child of a node stores the key's value in
+    its `base`. This takes 8 bytes per node.
+
+    String keys are encoded as UTF-8; their byte order matches string order.
+
+    Use `build` or `load` rather than calling this directly.
+    '''
+
+    __slots__ = ('base', 'check', 'count', 'text', '_buffer')
+
+    def __init__(self, base, check, count, text):
+        if len(base) != len(check):
+            raise ValueError('base and check must have the same length')
+        self.base = base
+        self.check = check
+        self.count = count
+        self.text = text
+        self._buffer = None
+
+    @classmethod
+    def build(cls, keys, values=None):
+        '''Trie of the keys in the iterable `keys`
+
+        Input:
+
+         - `keys`: strings or bytes-like objects, all of one kind, sorted and without duplicates
+         - `values`: iterable of integers that fit in 32 bits, one for every key.
+           Defaults to the position of each key in `keys`
+
+        The keys are held in memory while building, but only the arrays are kept.
+        '''
+        keys = list(keys)
+        text = bool(keys) and isinstance(keys[0], str)
+        if any(isinstance(key, str) != text for key in keys):
+            raise ValueError('keys must be all strings or all bytes')
+        if text:
+            keys = [key.encode() for key in keys]
+        else:
+            keys = [bytes(key) for key in keys]
+        for i in range(1, len(keys)):
+            if keys[i - 1] >= keys[i]:
+                raise ValueError('keys must be sorted and unique, got {!r} before {!r}'.format(keys[i - 1], keys[i]))
+        values = range(len(keys)) if values is None else list(values)
+        if len(values) != len(keys):
+            raise ValueError('expected {} values, got {}'.format(len(keys), len(values)))
+
+        base = array('i', [0]) * 257
+        check = array('i', [-1]) * 257
+        used = bytearray(257)
+        used[0] = 1
+        free = 1
+        stack = [(0, 0, len(keys), 0)] if keys else []
+        while stack:
+            s, lo, hi, depth = stack.pop()
+            # children of s: the keys in lo..hi-1 grouped by their byte at depth
+            codes, groups = [], []
+            i = lo
+            if len(keys[i]) == depth:
+                codes.append(0)
+                groups.append((i, i + 1))
+                i += 1
+            prefix = keys[lo][:depth]
+            while i < hi:
+                byte = keys[i][depth]
+                end = hi if byte == 255 else bisect_left(keys, prefix + bytes((byte + 1,)), i, hi)
+                codes.append(byte + 1)
+                groups.append((i, end))
+                i = end
+            # lowest base at which every child's slot is free
+            free = used.find(0, free)
+            pos = free if free >= 0 else len(used)
+            while True:
+                b = pos - codes[0]
+                if len(used) < b + 257:
+                    grow = max(b + 257, 2 * len(used)) - len(used)
+                    used.extend(bytes(grow))
+                    base.extend(array('i', [0]) * grow)
+                    check.extend(array('i', [-1]) * grow)
+                if b >= 0 and not any(used[b + c] for c in codes):
+                    break
+                pos = used.find(0, pos + 1)
+                if pos < 0:
+                    pos = len(used)
+            base[s] = b
+            for c in codes:
+                used[b + c] = 1
+                check[b + c] = s
+            for c, (start, end) in reversed(list(zip(codes, groups))):
+                if c:
+                    stack.append((b + c, start, end, depth + 1))
+                else:
+                    base[b] = values[start]
+        # every transition lands below the last used slot plus 257
+        size = len(used.rstrip(b'\x00')) + 257
+        return cls(base[:size], check[:size], len(keys), text)
+
+    @classmethod
+    def load(cls, path):
+        '''Trie saved with `save` to the file `path`
+
+        The file is memory-mapped read-only and the arrays are `memoryview`s
+        into it, so loading takes constant time and memory regardless of
+        the trie size. Call `close` to release the file.'''
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, text, size, count = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or version != _VERSION:
+            buffer.close()
+            raise ValueError('{} is not a DoubleArrayTrie file'.format(path))
+        view = memoryview(buffer)
+        start = _HEADER.size
+        base = view[start:start + 4 * size].cast('i')
+        check = view[start + 4 * size:start + 8 * size].cast('i')
+        trie = cls(base, check, count, bool(text))
+        trie._buffer = buffer
+        return trie
+
+    def save(self, path):
+        '''Write the trie to the binary file `path`, to be opened with `load`'''
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, self.text, len(self.base), self.count))
+            f.write(memoryview(self.base).cast('B'))
+            f.write(memoryview(self.check).cast('B'))
+
+    def close(self):
+        '''Release the file of a trie opened with `load`'''
+        if self._buffer is not None:
+            self.base.release()
+            self.check.release()
+            self.base = self.check = None
+            self._buffer.close()
+            self._buffer = None
+
+    def _encode(self, key):
+        '''`key` as bytes'''
+        if isinstance(key, str):
+            if not self.text:
+                raise TypeError('expected a bytes-like key')
+            return key.encode()
+        return key
+
+    def _decode(self, key):
+        '''`key` as bytes in the type of the keys the trie was built from'''
+        return bytes(key).decode() if self.text else bytes(key)
+
+    def _walk(self, key):
+        '''Node reached from the root along the bytes of `key`, or -1'''
+        base, check = self.base, self.check
+        s = 0
+        for byte in key:
+            t = base[s] + byte + 1
+            if check[t] != s:
+                return -1
+            s = t
+        return s
+
+    def _children(self, s):
+        '''Codes and nodes of the children of node `s`, in order of code'''
+        b = self.base[s]
+        window = self.check[b:b + 257]
+        if not isinstance(window, array):
+            window = array('i', window.tobytes())
+        children = []
+        i = 0
+        while True:
+            try:
+                i = window.index(s, i)
+            except ValueError:
+                return children
+            children.append((i, b + i))
+            i += 1
+
+    def get(self, key, default=None):
+        '''Value of `key`, or `default` if it is not in the trie'''
+        s = self._walk(self._encode(key))
+        if s < 0:
+            return default
+        t = self.base[s]
+        return self.base[t] if self.check[t] == s else default
+
+    def prefixes(self, key):
+        '''Generator over `(prefix, value)` for every key in the trie that is a prefix of `key`, shortest first'''
+        data = self._encode(key)
+        base, check = self.base, self.check
+        s = 0
+        for i in range(len(data) + 1):
+            t = base[s]
+            if check[t] == s:
+                yield self._decode(data[:i]), base[t]
+            if i == len(data):
+                return
+            t = base[s] + data[i] + 1
+            if check[t] != s:
+                return
+            s = t
+
+    def longest_prefix(self, key):
+        '''`(prefix, value)` for the longest key in the trie that is a prefix of `key`, or `None`'''
+        match = None
+        for match in self.prefixes(key):
+            pass
+        return match
+
+    def items(self, prefix=''):
+        '''Generator over `(key, value)` for every key starting with `prefix`, in sorted order'''
+        prefix = self._encode(prefix) if prefix else b''
+        s = self._walk(prefix)
+        if s < 0:
+            return
+        base = self.base
+        stack = [(s, bytes(prefix))]
+        while stack:
+            s, key = stack.pop()
+            children = self._children(s)
+            for code, t in reversed(children):
+                if code:
+                    stack.append((t, key + bytes((code - 1,))))
+            if children and children[0][0] == 0:
+                yield self._decode(key), base[children[0][1]]
+
+    def keys(self, prefix=''):
+        '''Generator over every key starting with `prefix`, in sorted order'''
+        for key, _ in self.items(prefix):
+            yield key
+
+    def __getitem__(self, key):
+        s = self._walk(self._encode(key))
+        if s >= 0:
+            t = self.base[s]
+            if self.check[t] == s:
+                return self.base[t]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return 'DoubleArrayTrie(keys={}, size={})'.format(self.count, len(self.base))
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+    from random import Random
+
+    words = sorted(['a', 'an', 'and', 'ant', 'bee', 'been', 'beet', 'café', 'zebra', ''])
+    trie = DoubleArrayTrie.build(words)
+
+    # test get
+    assert all(trie[w] == i for i, w in enumerate(words)) and len(trie) == len(words), 'Failed test: get'
+    assert trie.get('be') is None and 'ants' not in trie and 'café' in trie, 'Failed test: get (missing)'
+
+    # test longest_prefix
+    assert trie.longest_prefix('antelope') == ('ant', words.index('ant')), 'Failed test: longest_prefix'
+    assert trie.longest_prefix('xyz') == ('', 0), 'Failed test: longest_prefix (empty key)'
+    assert [p for p, _ in trie.prefixes('beetle')] == ['', 'bee', 'beet'], 'Failed test: prefixes'
+
+    # test items
+    assert list(trie) == words, 'Failed test: keys'
+    assert list(trie.items('an')) == [(w, words.index(w)) for w in ('an', 'and', 'ant')], 'Failed test: items'
+    assert list(trie.keys('c')) == ['café'] and list(trie.keys('q')) == [], 'Failed test: keys (prefix)'
+
+    # test an empty trie
+    assert DoubleArrayTrie.build([]).get(b'abc') is None, 'Failed test: build (empty)'
+
+    # test bytes keys and values
+    binary = DoubleArrayTrie.build([b'\x00', b'\x00\xff', b'\xff'], values=[-5, 7, 2 ** 31 - 1])
+    assert binary[b'\x00\xff'] == 7 and binary.get(memoryview(b'\x00')) == -5, 'Failed test: build (bytes)'
+    assert binary.longest_prefix(b'\xff\x00') == (b'\xff', 2 ** 31 - 1), 'Failed test: longest_prefix (bytes)'
+    try:
+        DoubleArrayTrie.build(['b', 'a'])
+        assert False, 'Failed test: build (unsorted)'
+    except ValueError:
+        pass
+
+    # test against a dictionary
+    rng = Random(7)
+    keys = sorted({bytes(rng.randrange(97, 101) for _ in range(rng.randrange(1, 12))) for _ in range(5000)})
+    large = DoubleArrayTrie.build(keys)
+    assert all(large[k] == i for i, k in enumerate(keys)) and list(large) == keys, 'Failed test: build (random)'
+    assert all((k + b'z' in large) == False for k in keys[:100]), 'Failed test: build (random, missing)'
+
+    # test save and load
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'words.trie')
+        trie.save(path)
+        loaded = DoubleArrayTrie.load(path)
+        assert list(loaded.items()) == list(trie.items()) and loaded.longest_prefix('bees') == ('bee', words.index('bee')), 'Failed test: save/load'
+        loaded.close()
+
+    print('Passed all tests.')